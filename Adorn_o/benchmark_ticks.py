@@ -0,0 +1,117 @@
+"""
+Times the integer tick timings against the Fraction timings they
+replaced, for calculate_duration_for_notes_in_measure and
+calculate_bars_from_note_list. Run from the Adorn_o folder:
+
+    python benchmark_ticks.py
+
+The Fraction versions are the functions as they were before the
+ticks, they are checked to give the same results before timing.
+"""
+from timeit import repeat
+from fractions import Fraction
+
+import guitarpro
+
+from parser.API.get_functions import get_song_data
+from parser.API.datatypes import AdornedNote, Rest
+from parser.API.update_functions import (update_note_in_measure,
+                                         update_adorned_note)
+from parser.API.calculate_functions import (
+    calculate_duration_for_notes_in_measure, calculate_bars_from_note_list,
+    calculate_tied_note_durations, calculate_measure_endtime,
+    calculate_note_duration, calcuate_note_is_in_measure)
+
+gp5_files = [
+    "./gp5files/Listening-test-mono/c.gp5",
+    "./gp5files/Listening-test-mono/r.gp5",
+    "./gp5files/Listening-test-mono/h-official.gp5",
+    "./gp5files/Listening-test-mono/tol.gp5",
+    "./gp5files/Listening-test-mono/sd.gp5",
+    "./gp5files/Listening-test-mono/s.gp5",
+    "./gp5files/Listening-test-mono/wdytiw.gp5",
+]
+repeats = 5
+number = 3
+
+
+def fraction_duration_for_notes_in_measure(measure):
+    """calculate_duration_for_notes_in_measure with Fraction times"""
+    event_times = []
+    for note in measure.notes:
+        if isinstance(note, AdornedNote):
+            if note.note.start_time not in event_times:
+                event_times.append(note.note.start_time)
+        elif isinstance(note, Rest):
+            if note.start_time not in event_times:
+                event_times.append(note.start_time)
+
+    event_times.append(calculate_measure_endtime(measure))
+    event_times = sorted(event_times)
+
+    updated_measure = measure
+    for note in measure.notes:
+        if isinstance(note, AdornedNote):
+            event_num = event_times.index(note.note.start_time)
+            dur_note = calculate_note_duration(note.note,
+                                               event_times[event_num + 1])
+            if dur_note == Fraction(0, 1):
+                print("Duration 0")
+            update_note_in_measure(note,
+                                   update_adorned_note(note, note=dur_note),
+                                   updated_measure)
+        elif isinstance(note, Rest):
+            event_num = event_times.index(note.start_time)
+            dur_note = calculate_note_duration(note,
+                                               event_times[event_num + 1])
+            if dur_note == Fraction(0, 1):
+                print("Duration 0")
+            update_note_in_measure(note, dur_note, updated_measure)
+
+    return updated_measure
+
+
+def fraction_bars_from_note_list(note_list, song_data):
+    """calculate_bars_from_note_list checking every note
+    against every measure with Fraction times"""
+    return [[
+        adorned_note for adorned_note in note_list
+        if calcuate_note_is_in_measure(adorned_note, measure)
+    ] for measure in song_data.measures]
+
+
+def best_time(statement):
+    return min(repeat(statement, repeat=repeats, number=number)) / number
+
+
+songs = [
+    get_song_data(guitarpro.parse(gp5_file))[0] for gp5_file in gp5_files
+]
+measures = [measure for song in songs for measure in song.measures]
+note_lists = [calculate_tied_note_durations(song) for song in songs]
+
+# both versions give the same results:
+for measure in measures:
+    assert fraction_duration_for_notes_in_measure(
+        measure) == calculate_duration_for_notes_in_measure(measure)
+for song, note_list in zip(songs, note_lists):
+    assert fraction_bars_from_note_list(
+        note_list, song) == calculate_bars_from_note_list(note_list, song)
+
+print("%d songs, %d measures, %d notes" %
+      (len(songs), len(measures), sum([len(notes) for notes in note_lists])))
+print("%-45s %10s %10s %8s" % ("function", "fraction", "ticks", "speedup"))
+for name, fraction_statement, ticks_statement in [
+    ("calculate_duration_for_notes_in_measure",
+     lambda: [fraction_duration_for_notes_in_measure(m) for m in measures],
+     lambda: [calculate_duration_for_notes_in_measure(m) for m in measures]),
+    ("calculate_bars_from_note_list", lambda: [
+        fraction_bars_from_note_list(n, s) for s, n in zip(songs, note_lists)
+    ], lambda: [
+        calculate_bars_from_note_list(n, s) for s, n in zip(songs, note_lists)
+    ]),
+]:
+    fraction_time = best_time(fraction_statement)
+    ticks_time = best_time(ticks_statement)
+    print("%-45s %9.4fs %9.4fs %7.1fx" % (name, fraction_time, ticks_time,
+                                          fraction_time / ticks_time))
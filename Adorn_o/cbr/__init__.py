@@ -1,4 +1,5 @@
 from .database import Database
+from . import chunk_features
 from .retrieval import *
 from .reuse import reuse
 from . import reuse as reuse_module
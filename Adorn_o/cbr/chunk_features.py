@@ -0,0 +1,369 @@
+"""
+Features of the chunks of the adorned measures in the database.
+
+reuse matches the chunks of the unadorned measure (sequences of notes,
+see chunk_up_a_measure) with the most similar chunks of each
+adorned measure, using their FANTASTIC and SynPy features. The
+features of the chunks of every measure are calculated (in memory,
+with the NumPy FANTASTIC) when the measure is added to the database
+and saved in chunk_features.jsonl, keyed by a hash of the measure.
+So when a measure is reused its chunk features are looked up, and
+the most similar chunks are found with NumPy, without R or melconv.
+"""
+
+# Standard library imports
+import os
+import json
+from collections import namedtuple
+
+# 3rd party imports
+import numpy as np
+
+# Local application imports
+from ..parser.API.datatypes import Measure, AdornedNote, Rest
+from ..parser.API import calculate_functions as calculate
+from ..parser.API.complexity_cache import structure_key
+from .. import feature_analysis
+
+# The chunk sizes calculated for each measure when it is added to the database:
+default_max_chunk_size = 3
+
+# The features of the chunks of one size in a measure. values is a
+# (chunks x features) array, nan where the value is text or NA, and
+# text is True where the value is text. chunk_indexes are the indexes
+# in chunk_up_a_measure(measure, chunk_size) of the chunk of each row,
+# chunks that can't be analysed don't have a row.
+ChunkFeatures = namedtuple("ChunkFeatures", ["chunk_indexes", "values", "text"])
+
+
+def measure_key(measure):
+    """
+    A stable hash of the contents of the measure,
+    the key of its chunk features.
+    """
+    return structure_key("chunk_features", measure)
+
+
+def chunk_up_a_measure(measure_or_notes_from_measure, chunk_size=3):
+    """Break up a measure into chunks of AdornedNotes"""
+
+    if isinstance(measure_or_notes_from_measure, Measure):
+        # get all the notes and tie together tied notes:
+        notes = calculate.calculate_tied_note_durations(measure_or_notes_from_measure)
+
+    if isinstance(measure_or_notes_from_measure, list):
+        for n in measure_or_notes_from_measure:
+            assert isinstance(n, AdornedNote)
+        notes = measure_or_notes_from_measure
+
+    # break the adorned measure into smaller chunks
+    chunks = []
+    last_note_added_to_a_chunk = False
+    for note in notes:
+
+        # check the note is not a rest:
+        if isinstance(note, Rest):
+            # if so continue:
+            continue
+
+        if last_note_added_to_a_chunk:
+            # Reached the last note in the measure
+            # so break
+            break
+
+        # start a new chunk:
+        chunk = [note]
+
+        for next_note in notes[notes.index(note) : :]:
+            if len(chunk) >= chunk_size:
+                # start a new chunk:
+                chunks.append(chunk)
+                break
+            # check the note is not a rest:
+            if isinstance(next_note, Rest):
+                # if so continue:
+                continue
+
+            # skip the starting note of the chunk:
+            if next_note in chunk:
+                continue
+
+            chunk.append(next_note)
+
+            if next_note == notes[-1]:
+                last_note_added_to_a_chunk = True
+
+        if chunk not in chunks:
+            chunks.append(chunk)
+
+    return chunks
+
+
+def feature_vector(features):
+    """
+    The values of a list of features as a float array, nan for text
+    and None values, and a boolean array that is True for the text.
+    """
+    values = []
+    text = []
+    for value in features:
+        if isinstance(value, str):
+            try:
+                values.append(float(value))
+                text.append(False)
+            except ValueError:
+                values.append(np.nan)
+                text.append(value != "NA")
+        elif value is None:
+            values.append(np.nan)
+            text.append(False)
+        else:
+            values.append(float(value))
+            text.append(False)
+
+    return np.array(values, dtype=np.float64), np.array(text, dtype=bool)
+
+
+def calculate_chunk_features(chunks, measure, chunk_size):
+    """
+    Calculate the features of the chunks of the measure.
+
+    Chunks of 2 notes have the features of
+    combine_synpy_and_fantastic_features_for_two_notes, longer chunks
+    the FANTASTIC features followed by the SynPy features, the same
+    as match_up_unadorned_measure_chunks_with_adorned_measure_chunks
+    gets from the midi, mcsv and rhy files of the chunks.
+
+    Parameters
+    ---------
+    chunks : list of lists of AdornedNotes
+        the chunks of the measure, see chunk_up_a_measure
+
+    measure : Measure
+        the measure the chunks are from
+
+    chunk_size : int
+        the size the chunks were made with
+
+    Returns
+    -------
+    ChunkFeatures
+    """
+    assert isinstance(measure, Measure), "measure must be a Measure"
+
+    chunk_indexes = []
+    rows = []
+
+    if chunk_size == 2:
+        for chunk_index, chunk in enumerate(chunks):
+            if len(chunk) != 2:
+                continue
+            try:
+                rhy_lines = calculate.calculate_rhy_lines_for_measure(
+                    Measure(measure.meta_data, measure.start_time, chunk)
+                )
+            except ValueError:
+                print("Error analysing chunk")
+                continue
+
+            features = (
+                feature_analysis.combine_synpy_and_fantastic_features_for_two_notes(
+                    measure, chunk, rhy_lines, file_id=str(chunk_index)
+                )
+            )
+            chunk_indexes.append(chunk_index)
+            rows.append(features[1:])
+
+    else:
+        chunk_ids = []
+        note_tables = []
+        rhy_lines_list = []
+        for chunk_index, chunk in enumerate(chunks):
+            try:
+                rhy_lines = calculate.calculate_rhy_lines_for_measure(
+                    Measure(measure.meta_data, measure.start_time, chunk)
+                )
+            except ValueError:
+                print("Error analysing chunk")
+                continue
+
+            chunk_ids.append(str(chunk_index))
+            note_tables.append(
+                calculate.calculate_note_table_for_measure_note_list(chunk, measure)
+            )
+            rhy_lines_list.append(rhy_lines)
+
+        (
+            fantastic_features,
+            synpy_features,
+        ) = feature_analysis.compute_synpy_and_fantastic_features(
+            note_tables, rhy_lines_list, chunk_ids
+        )
+
+        # only the chunks with both sets of features have a row,
+        # as when the features are merged:
+        synpy_rows = {row[0]: row[1:] for row in synpy_features}
+        for row in fantastic_features:
+            if row[0] in synpy_rows:
+                chunk_indexes.append(int(row[0]))
+                rows.append(row[1:] + synpy_rows[row[0]])
+
+    vectors = [feature_vector(row) for row in rows]
+    return chunk_features_from_rows(
+        chunk_indexes,
+        [values for values, text in vectors],
+        [text for values, text in vectors],
+    )
+
+
+def chunk_features_from_rows(chunk_indexes, values, text):
+    """
+    Make ChunkFeatures from a row of values and text for each chunk.
+    """
+    if len(chunk_indexes) == 0:
+        return ChunkFeatures([], np.empty((0, 0)), np.empty((0, 0), dtype=bool))
+
+    return ChunkFeatures(
+        list(chunk_indexes),
+        np.array(values, dtype=np.float64).reshape(len(chunk_indexes), -1),
+        np.array(text, dtype=bool).reshape(len(chunk_indexes), -1),
+    )
+
+
+def calculate_measure_chunk_features(measure, max_chunk_size=default_max_chunk_size):
+    """
+    Calculate the features of the chunks of 2 to max_chunk_size notes
+    of the measure.
+
+    Returns
+    -------
+    dict
+        the ChunkFeatures for each chunk size
+    """
+    return {
+        chunk_size: calculate_chunk_features(
+            chunk_up_a_measure(measure, chunk_size),
+            measure,
+            chunk_size,
+        )
+        for chunk_size in range(2, max_chunk_size + 1)
+    }
+
+
+def most_similar_chunks(queries, chunk_features):
+    """
+    The chunk indexes of the most similar chunks to each of the
+    queries, the NumPy version of get.most.similar.adorned.chunk.
+
+    The (queries x chunks) similarities are worked out in one go
+    (see vector_similarity.similarity_matrix): each query is
+    z-transformed together with the chunk features, only the columns
+    without any text in them are standardised, and the chunks with
+    the largest similarity to the query are returned, in chunk order.
+
+    Parameters
+    ---------
+    queries : ChunkFeatures
+        the features of the chunks to match
+
+    chunk_features : ChunkFeatures
+        the features of the chunks to compare with
+
+    Returns
+    -------
+    list of lists of int
+        the matching chunk indexes for each row of queries,
+        empty if there are no features to compare
+    """
+    if len(queries.chunk_indexes) == 0:
+        return []
+    if len(chunk_features.chunk_indexes) == 0:
+        return [[] for chunk_index in queries.chunk_indexes]
+
+    numeric_columns = ~(queries.text | chunk_features.text.any(axis=0))
+
+    similarities = feature_analysis.vector_similarity.similarity_matrix(
+        queries.values,
+        chunk_features.values,
+        eucl_stand=True,
+        numeric_columns=numeric_columns,
+    )
+
+    return [
+        [int(chunk_features.chunk_indexes[row]) for row in rows]
+        for rows in feature_analysis.vector_similarity.most_similar_rows(
+            similarities, percent_match=0
+        )
+    ]
+
+
+class ChunkFeatureStore:
+    """The chunk features of the measures in the database, saved next
+    to it in chunk_features.jsonl.
+
+    Each line has the key of a measure (measure_key), a chunk size and
+    the ChunkFeatures of the chunks of that size. Measures with the
+    same contents have the same key, so they are only saved once.
+    """
+
+    def __init__(self, save_folder):
+        self.location = save_folder + "/chunk_features.jsonl"
+        self.measures = None
+
+    def load(self):
+        self.measures = {}
+        if os.path.isfile(self.location):
+            with open(self.location) as store_file:
+                for line in store_file:
+                    if line.strip() == "":
+                        continue
+                    record = json.loads(line)
+                    self.measures.setdefault(record["measure"], {})[
+                        record["chunk_size"]
+                    ] = chunk_features_from_rows(
+                        record["chunk_indexes"], record["values"], record["text"]
+                    )
+
+    def clear(self):
+        if os.path.isfile(self.location):
+            os.remove(self.location)
+        self.measures = None
+
+    def __contains__(self, key):
+        if self.measures is None:
+            self.load()
+        return key in self.measures
+
+    def get(self, measure):
+        """The ChunkFeatures of the measure for each chunk size,
+        or None if the measure isn't in the store.
+        """
+        if self.measures is None:
+            self.load()
+        return self.measures.get(measure_key(measure))
+
+    def add(self, measure_chunk_features):
+        """Add the chunk features of measures that aren't in the store,
+        measure_chunk_features is a dict of measure key: dict of the
+        ChunkFeatures for each chunk size.
+        """
+        if self.measures is None:
+            self.load()
+        with open(self.location, mode="a+") as store_file:
+            for key, chunk_features in measure_chunk_features.items():
+                if key in self.measures:
+                    continue
+                self.measures[key] = chunk_features
+                for chunk_size, features in chunk_features.items():
+                    store_file.write(
+                        json.dumps(
+                            {
+                                "measure": key,
+                                "chunk_size": chunk_size,
+                                "chunk_indexes": features.chunk_indexes,
+                                "values": features.values.tolist(),
+                                "text": features.text.tolist(),
+                            }
+                        )
+                        + "\n"
+                    )
@@ -1,13 +1,16 @@
 import os
 import csv
 import uuid
+import hashlib
 from collections import namedtuple
 import re
 import shutil
 import json
 from fractions import Fraction
+from concurrent.futures import ProcessPoolExecutor
 
 # 3rd party imports
+import numpy as np
 import rpy2.robjects as robjects
 import guitarpro
 
@@ -20,14 +23,31 @@ from ..parser.API.calculate_functions import (
     calculate_grace_note_possitions,
     calculate_midi_file_for_measure_note_list,
     calculate_rhy_file_for_measure,
-    calculate_playing_complexity,
+    calculate_rhy_lines_for_measure,
+    calculate_note_table_for_measure_note_list,
+    calculate_mcsv_file_for_note_table,
     calculate_heuristic,
 )
-from ..parser.utilities import run_melconv
+from ..parser.API.complexity_arrays import calculate_playing_complexity_for_measures
+from ..parser.API.complexity_cache import cached_playing_complexity
 from .. import feature_analysis
 from ..evaluation import musiplectics
 
 from .. import cbr
+from .storage import (
+    storage_backends,
+    DuplicateIndex,
+    BuildManifest,
+    file_hash,
+    entry_hash,
+)
+from .similarity_index import SimilarityIndex
+from .chunk_features import (
+    ChunkFeatureStore,
+    calculate_measure_chunk_features,
+    measure_key,
+    default_max_chunk_size,
+)
 
 accepted_time_sigs = []
 
@@ -41,6 +61,41 @@ retieved = namedtuple("Retrieved", ["id", "measure"])
 modified_notes = namedtuple(
     "ModifiedNotes", ["measure", "total_modified", "proportion"]
 )
+# The features of a measure that is compared with the database,
+# index is the position of the measure in find_most_similar_many:
+SimilarityQuery = namedtuple(
+    "SimilarityQuery", ["index", "feature_names", "vector", "text"]
+)
+
+# The most values in the (queries x entries) similarity matrices
+# that find_most_similar_many works out at once:
+max_similarity_matrix_size = 2**24
+
+IngestionTask = namedtuple(
+    "IngestionTask",
+    [
+        "gp5_file",
+        "load_location",
+        "json_file",
+        "save_folder",
+        "weight_set",
+        "process_tied_notes_in_json",
+        "save_feature_files",
+        "artist_and_title_from_file_name",
+        "max_chunk_size",
+    ],
+)
+TrackEntry = namedtuple(
+    "TrackEntry",
+    [
+        "track_id",
+        "song_entry_info",
+        "fantastic_features",
+        "synpy_features",
+        "extra_rows",
+        "chunk_features",
+    ],
+)
 
 remove_bad_chars = re.compile("[^a-zA-Z]")
 
@@ -48,8 +103,35 @@ remove_bad_chars = re.compile("[^a-zA-Z]")
 class Database:
     """ """
 
-    def __init__(self, save_folder="./", new_database=False, weight_set="GMS"):
-        """ """
+    def __init__(
+        self,
+        save_folder="./",
+        new_database=False,
+        weight_set="GMS",
+        storage="csv",
+        similarity_index=False,
+        max_chunk_size=default_max_chunk_size,
+    ):
+        """
+
+        Parameters:
+        ----------
+        storage : str
+            how the database table is saved, either "csv" for
+            database.csv or "columnar" for memory-mapped .npy
+            files, one per column, in the columns folder.
+
+        similarity_index : bool or dict
+            set True to use an approximate nearest neighbour index
+            to find the most similar measures, or a dict of the
+            SimilarityIndex parameters (min_size, neighbours, eps...)
+            to set how it trades recall for speed.
+
+        max_chunk_size : int
+            the features of the chunks of 2 to max_chunk_size notes
+            of each measure are calculated when it is added and saved
+            in chunk_features.jsonl, for reuse to match chunks with.
+        """
         if "." != save_folder.split("/")[0]:
             save_folder = "./" + save_folder
         self.data_location = save_folder + "/" + "database.csv"
@@ -59,6 +141,7 @@ class Database:
         self.last_processed_file = None
         self.data = None
         self.weight_set = weight_set
+        self.max_chunk_size = max_chunk_size
         self.header = [
             "file.id",
             "file.location",
@@ -121,12 +204,28 @@ class Database:
             "WNBD.mean_syncopation_per_bar",
         ]
 
+        assert storage in storage_backends, "%s is not a storage backend: %s" % (
+            storage,
+            list(storage_backends.keys()),
+        )
+        self.storage = storage_backends[storage](self.save_folder, self.header)
+        self.duplicate_index = DuplicateIndex(
+            self.storage, self.header.index("complexity")
+        )
+        self.build_manifest = BuildManifest(self.save_folder)
+        self.chunk_features = ChunkFeatureStore(self.save_folder)
+        self.similarity_index = None
+        if similarity_index is True:
+            self.similarity_index = SimilarityIndex(self.storage)
+        elif isinstance(similarity_index, dict):
+            self.similarity_index = SimilarityIndex(self.storage, **similarity_index)
+
         # Load r related things:
         feature_analysis.fantastic_interface.load()
 
         if new_database is False:
             # if the file doesn't exist - make it
-            if not os.path.isfile(self.data_location):
+            if not self.storage.exists():
                 self.make_new_database()
         else:
             self.make_new_database()
@@ -178,13 +277,18 @@ class Database:
             print("Creation of the directory %s failed" % self.data_location)
             return
 
-        with open(self.data_location, mode="w") as data_base_file:
-            data_base_updater = csv.writer(data_base_file)
-            data_base_updater.writerow(self.header)
+        self.storage.create()
+        self.duplicate_index.clear()
+        self.build_manifest.clear()
+        self.chunk_features.clear()
+        self.clear_sort_orders()
+        if self.similarity_index is not None:
+            self.similarity_index.clear()
         with open(self.save_folder + "/sorted.txt", mode="w") as sorted_savefile:
             sorted_savefile.write("")
 
-    def load_gp_file(self, gp5_file):
+    @staticmethod
+    def load_gp_file(gp5_file):
         try:
             print("Loading %s" % gp5_file)
             gp5song = guitarpro.parse(gp5_file)
@@ -194,7 +298,8 @@ class Database:
             print("Unable to load %s" % gp5_file)
             return False
 
-    def load_json_file(self, json_file):
+    @staticmethod
+    def load_json_file(json_file):
         try:
             with open(json_file) as read_file:
                 json_data = json.load(read_file)
@@ -215,10 +320,12 @@ class Database:
 
         return song
 
-    def track_id(self, song_title, track):
+    @staticmethod
+    def track_id(song_title, track):
         return str(song_title) + "_track_" + str(track)
 
-    def measure_id(self, track_id, measure_number):
+    @staticmethod
+    def measure_id(track_id, measure_number):
         return track_id + "_bar_" + str(measure_number)
 
     def add_entries_from_list_of_gp5_files(
@@ -229,18 +336,121 @@ class Database:
         remove_duplicates=True,
         save_feature_files=False,
         artist_and_title_from_file_name=True,
+        workers=1,
+        retry_failed=False,
     ):
+        """
+        Add entries to the database from the gp5 files in list_of_gp5_files
+
+        Files that the build manifest (build_manifest.jsonl) has as
+        added, or failed, that haven't changed since are skipped,
+        so an interrupted build can be re-run with the same list.
+
+        Parameters
+        ---------
+        retry_failed : bool
+            try to add the files that failed again,
+            even if they haven't changed.
+
+        workers : int
+            number of processes used to load the files and calculate the
+            complexities and features of their measures. The entries are
+            written to the database by this process in the order of
+            list_of_gp5_files, so the database (and last_processed_file.txt)
+            is the same as when the files are added one at a time.
+        """
         assert isinstance(list_of_gp5_files, list), "list_of_gp5_files is not a list"
+
+        files_to_add = []
         for gp5_file in list_of_gp5_files:
+            if self.build_manifest.is_done(gp5_file, retry_failed):
+                print("%s has already been processed, skipping..." % gp5_file)
+            else:
+                files_to_add.append(gp5_file)
+
+        if workers > 1:
+            self.add_entries_from_list_of_gp5_files_in_parallel(
+                files_to_add,
+                workers,
+                convert_to_json=convert_to_json,
+                move_tabs=move_tabs,
+                remove_duplicates=remove_duplicates,
+                save_feature_files=save_feature_files,
+                artist_and_title_from_file_name=artist_and_title_from_file_name,
+            )
+            return
+
+        for gp5_file in files_to_add:
             print("Adding measures in %s to database..." % gp5_file)
             self.add_entries_from_gp5_file(
                 gp5_file,
+                convert_to_json=convert_to_json,
                 move_tabs=move_tabs,
                 remove_duplicates=remove_duplicates,
                 save_feature_files=save_feature_files,
                 artist_and_title_from_file_name=artist_and_title_from_file_name,
             )
 
+    def add_entries_from_list_of_gp5_files_in_parallel(
+        self,
+        list_of_gp5_files,
+        workers,
+        convert_to_json=True,
+        move_tabs=True,
+        remove_duplicates=True,
+        save_feature_files=False,
+        artist_and_title_from_file_name=True,
+    ):
+        """
+        Add entries from the gp5 files using a pool of worker processes,
+        see add_entries_from_list_of_gp5_files.
+
+        The workers run process_gp5_file, which doesn't change the
+        database, and this process writes the entries of each file
+        as soon as it and the files before it are done.
+        """
+        json_files = set()
+        file_hashes = [file_hash(gp5_file) for gp5_file in list_of_gp5_files]
+        tasks = [
+            self.ingestion_task(
+                gp5_file,
+                convert_to_json=convert_to_json,
+                move_tabs=move_tabs,
+                save_feature_files=save_feature_files,
+                artist_and_title_from_file_name=artist_and_title_from_file_name,
+                reserved_json_files=json_files,
+            )
+            for gp5_file in list_of_gp5_files
+        ]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            processed = [executor.submit(process_gp5_file, task) for task in tasks]
+
+            for gp5_file, tab_hash, task, result in zip(
+                list_of_gp5_files, file_hashes, tasks, processed
+            ):
+                print("Adding measures in %s to database..." % gp5_file)
+                # the worker loads the tab from where it is,
+                # so it is only moved once the worker is done:
+                try:
+                    track_entries = result.result()
+                except Exception as error:
+                    track_entries = error
+
+                if task.gp5_file != gp5_file:
+                    # move the tab
+                    shutil.move(gp5_file, self.gpfiles_location)
+                    # update the tab location, as add_entries_from_gp5_file:
+                    task = task._replace(
+                        load_location=self.save_folder + "/" + task.gp5_file
+                    )
+
+                self.save_last_processed_file(task.gp5_file)
+
+                self.add_processed_gp5_file(
+                    gp5_file, tab_hash, task, track_entries, remove_duplicates
+                )
+
     def add_entries_from_gp5_file(
         self,
         gp5_file,
@@ -254,30 +464,124 @@ class Database:
         """
         Add entries to the database from the gp5_file
         '"""
-        if move_tabs:
+        tab_hash = file_hash(gp5_file)
+        task = self.ingestion_task(
+            gp5_file,
+            convert_to_json=convert_to_json,
+            process_tied_notes_in_json=process_tied_notes_in_json,
+            move_tabs=move_tabs,
+            save_feature_files=save_feature_files,
+            artist_and_title_from_file_name=artist_and_title_from_file_name,
+        )
+        if task.gp5_file != gp5_file:
             # move the tab
+            shutil.move(gp5_file, self.gpfiles_location)
+            # update the tab location to be loaded.
+            task = task._replace(load_location=self.save_folder + "/" + task.gp5_file)
+
+        self.save_last_processed_file(task.gp5_file)
+
+        try:
+            track_entries = process_gp5_file(task)
+        except Exception as error:
+            track_entries = error
+
+        self.add_processed_gp5_file(
+            gp5_file, tab_hash, task, track_entries, remove_duplicates
+        )
+
+        return
+
+    def add_processed_gp5_file(
+        self, gp5_file, tab_hash, task, track_entries, remove_duplicates=True
+    ):
+        """
+        Write the track_entries from process_gp5_file for the tab to the
+        database and record it in the build manifest. track_entries is
+        False if the tab couldn't be loaded, or the exception that was
+        raised when processing it, then the tab is recorded as failed.
+        """
+        tab_location = task.gp5_file
+        if not os.path.isfile(tab_location):
+            tab_location = self.save_folder + "/" + task.gp5_file
+
+        if track_entries is False or isinstance(track_entries, Exception):
+            print("unable to add entry for %s" % task.gp5_file)
+            if track_entries is False:
+                error = "unable to load %s" % task.load_location
+            else:
+                error = "%s: %s" % (type(track_entries).__name__, track_entries)
+            self.build_manifest.fail(gp5_file, tab_hash, error, tab_location)
+            return
+
+        first_row = self.storage.row_count()
+        try:
+            self.write_track_entries(track_entries, remove_duplicates)
+        except Exception as error:
+            print("unable to add entry for %s" % task.gp5_file)
+            self.build_manifest.fail(
+                gp5_file,
+                tab_hash,
+                "%s: %s" % (type(error).__name__, error),
+                tab_location,
+            )
+            return
+
+        self.build_manifest.complete(
+            gp5_file, tab_hash, first_row, self.storage.row_count()
+        )
+
+    def ingestion_task(
+        self,
+        gp5_file,
+        convert_to_json=True,
+        process_tied_notes_in_json=True,
+        move_tabs=True,
+        save_feature_files=False,
+        artist_and_title_from_file_name=True,
+        reserved_json_files=None,
+    ):
+        """
+        The IngestionTask for adding gp5_file to the database with
+        process_gp5_file, with the locations the tab and its json file
+        will have in the database. The tab isn't moved.
+
+        reserved_json_files is a set of the json files of other tabs
+        that are being added, that haven't been written yet.
+        """
+        load_location = gp5_file
+        if move_tabs:
             if not os.path.isfile(self.gpfiles_location + "/" + gp5_file):
-                shutil.move(gp5_file, self.gpfiles_location)
-                # update the tab location to be loaded.
                 gp5_file = "gpfiles/" + gp5_file.split("/")[-1]
             else:
                 print("File already in database gpfiles folder")
+                load_location = self.save_folder + "/" + gp5_file
 
-        # save a record of the last processed file:
-        last_processed_file = open(
-            self.save_folder + "/" + "last_processed_file.txt", "w"
+        json_file = None
+        if convert_to_json:
+            json_file = self.json_file_name(gp5_file, reserved_json_files)
+
+        return IngestionTask(
+            gp5_file=gp5_file,
+            load_location=load_location,
+            json_file=json_file,
+            save_folder=self.save_folder,
+            weight_set=self.weight_set,
+            process_tied_notes_in_json=process_tied_notes_in_json,
+            save_feature_files=save_feature_files,
+            artist_and_title_from_file_name=artist_and_title_from_file_name,
+            max_chunk_size=self.max_chunk_size,
         )
-        last_processed_file.write(gp5_file)
-        last_processed_file.close()
-
-        if move_tabs:
-            api_song_data = self.load_gp_file(self.save_folder + "/" + gp5_file)
-        else:
-            api_song_data = self.load_gp_file(gp5_file)
 
-        if api_song_data is False:
-            print("unable to add entry for %s" % gp5_file)
-            return
+    def json_file_name(self, gp5_file, reserved_json_files=None):
+        """
+        The location in the database for the json file of gp5_file.
+        If the json file already exists a suffix made from gp5_file
+        is added, so the same tab gets the same json file name
+        (and song title) every time the database is built.
+        """
+        if reserved_json_files is None:
+            reserved_json_files = set()
 
         # Strip out the file extension, but keep any '.' in the sone name:
         song_file_name_no_path_no_ext = ""
@@ -289,107 +593,33 @@ class Database:
             ):
                 song_file_name_no_path_no_ext += "."
 
-        json_file = None
-        if convert_to_json:
-
-            if process_tied_notes_in_json:
-                api_processed_tied_notes = []
-
-                for track in api_song_data:
-                    note_list = calculate_tied_note_durations(track)
-                    notes_in_measure = calculate_bars_from_note_list(note_list, track)
-
-                    measures_with_processed_tied_notes = []
-                    for measure in track.measures:
-                        measures_with_processed_tied_notes.append(
-                            Measure(
-                                meta_data=measure.meta_data,
-                                start_time=measure.start_time,
-                                notes=notes_in_measure[measure.meta_data.number - 1],
-                            )
-                        )
-
-                    api_processed_tied_notes.append(
-                        Song(
-                            meta_data=track.meta_data,
-                            measures=measures_with_processed_tied_notes,
-                        )
-                    )
-
-                api_song_data = api_processed_tied_notes
-
-            json_data, json_dict = write_functions.api_to_json(api_song_data)
-            json_file = "json/" + song_file_name_no_path_no_ext + ".json"
-
-            if os.path.isfile(
-                self.save_folder + "/json/" + song_file_name_no_path_no_ext + ".json"
-            ):
-
-                json_file = str(
-                    "json/"
-                    + song_file_name_no_path_no_ext
-                    + " "
-                    + str(uuid.uuid4())[:8]
-                    + ".json"
-                )
+        json_file = "json/" + song_file_name_no_path_no_ext + ".json"
 
-            with open(self.save_folder + "/" + json_file, "w") as write_file:
-                json.dump(
-                    json_dict,
-                    write_file,
-                    indent=4,
-                )
+        suffix_seed = gp5_file
+        while (
+            os.path.isfile(self.save_folder + "/" + json_file)
+            or json_file in reserved_json_files
+        ):
+            json_file = str(
+                "json/"
+                + song_file_name_no_path_no_ext
+                + " "
+                + hashlib.sha1(suffix_seed.encode("utf-8")).hexdigest()[:8]
+                + ".json"
+            )
+            suffix_seed += "/"
 
-            # Check the JSON file:
-            json_api_song_data = self.load_file(self.save_folder + "/" + json_file)
-
-            assert json_api_song_data == api_song_data
-            """
-            # test code to debug if assert json_api_song_data == api_song_data fails
-            for j_song_data, a_song_data in zip(json_api_song_data, api_song_data):
-                assert j_song_data.meta_data == a_song_data.meta_data
-                for m1, m2 in zip(j_song_data.measures, a_song_data.measures):
-                    assert m1.meta_data == m2.meta_data
-                    assert m1.start_time == m2.start_time
-                    for n1, n2 in zip(m1.notes, m2.notes):
-
-                        assert type(n1) == type(n2)
-                        if isinstance(n1, AdornedNote):
-
-                            assert n1.note.note_number == n2.note.note_number
-                            assert n1.note.pitch == n2.note.pitch
-                            assert n1.note.fret_number == n2.note.fret_number
-                            assert n1.note.string_number == n2.note.string_number
-                            assert n1.note.string_tuning == n2.note.string_tuning
-                            assert n1.note.start_time == n2.note.start_time
-                            assert n1.note.duration == n2.note.duration
-                            assert n1.note.dynamic == n2.note.dynamic
-
-                            print(n1.adornment.plucking)
-                            print(n2.adornment.plucking)
-                            assert n1.adornment.plucking == n2.adornment.plucking
-                            assert n1.adornment.fretting == n2.adornment.fretting
-
-                        elif isinstance(n1, Rest):
-                            assert n1.note_number == n2.note_number
-                            assert n1.start_time == n2.start_time
-                            assert n1.duration == n2.duration
-            """
-
-        if json_file is None:
-            file_name = gp5_file
-        else:
-            file_name = json_file
+        reserved_json_files.add(json_file)
+        return json_file
 
-        self.add_entries(
-            api_song_data=api_song_data,
-            file_name=file_name,
-            remove_duplicates=remove_duplicates,
-            save_feature_files=save_feature_files,
-            artist_and_title_from_file_name=artist_and_title_from_file_name,
+    def save_last_processed_file(self, file_location):
+        # save a record of the last processed file:
+        last_processed_file = open(
+            self.save_folder + "/" + "last_processed_file.txt", "w"
         )
-
-        return
+        last_processed_file.write(file_location)
+        last_processed_file.close()
+        self.last_processed_file = file_location
 
     def add_entries_from_list_of_json_files(
         self,
@@ -429,12 +659,7 @@ class Database:
                 print("File with that name is in database json folder")
                 return
 
-        # save a record of the last processed file:
-        last_processed_file = open(
-            self.save_folder + "/" + "last_processed_file.txt", "w"
-        )
-        last_processed_file.write(json_file)
-        last_processed_file.close()
+        self.save_last_processed_file(json_file)
 
         if move_tabs:
             api_song_data = self.load_json_file(self.save_folder + "/" + json_file)
@@ -464,467 +689,114 @@ class Database:
         artist_and_title_from_file_name=True,
     ):
 
-        # just a catch for when single Song, not in track format
-        # is added as an entry.
-        if isinstance(api_song_data, Song):
-            api_song_data = [api_song_data]
+        track_entries = calculate_track_entries(
+            api_song_data,
+            file_name,
+            weight_set=self.weight_set,
+            save_folder=self.save_folder,
+            save_feature_files=save_feature_files,
+            artist_and_title_from_file_name=artist_and_title_from_file_name,
+            max_chunk_size=self.max_chunk_size,
+        )
+        self.write_track_entries(track_entries, remove_duplicates)
 
-        assert isinstance(api_song_data, list)
+        return
 
+    def write_track_entries(self, track_entries, remove_duplicates=True):
+        """
+        Merge the features of the track_entries (see
+        calculate_track_entries) into song entry tables
+        and add them to the database.
+        """
         song_entry_tables = []
 
-        for track in range(0, len(api_song_data)):
-
-            artist = api_song_data[track].meta_data.artist
-            if artist == "":
-                artist = "unknown"
-
-            song_title = api_song_data[track].meta_data.title
-
-            if artist_and_title_from_file_name:
-                # patterns to get artist and title from the file name
-                # of tabs downloaded from Ultimate Guitar.
-                artist_from_file_name = re.compile("[\S*\s]*-")
-                title_from_file_name = re.compile("-\s[\S*\s*].*")
-
-                artist_from_file_name = artist_from_file_name.search(
-                    file_name.split("/")[-1]
-                )
-                song = title_from_file_name.search(file_name)
-
-                if artist_from_file_name is not None:
-                    artist = artist_from_file_name.group().replace(" -", "")
-                if song is not None:
-                    song_title = song.group().replace("- ", "").split(".")[0]
-
-            # remove problematic characters:
-            artist = remove_bad_chars.sub("", artist)
-            song_title = remove_bad_chars.sub("", song_title)
-
-            # track_id = str(song_title) + '_track_' + str(track)
-            track_id = self.track_id(song_title, track)
-
-            song_entry_info = []
-            song_entry_info.append(
-                [
-                    "file.id",
-                    "file.location",
-                    "artist",
-                    "song.title",
-                    "track",
-                    "measure.number",
-                    "complexity",
-                    "perceived.difficulty",
-                    "unadorned.complexity",
-                    "unadorned.perceived.difficulty",
-                    "single.note",
-                    "single.note.pitch",
-                    "single.note.fret.number",
-                    "single.note.string.number",
-                    "single.note.duration",
-                ]
-            )
-
-            # Combine tied notes and sort the list back into bars:
-            note_list = calculate_tied_note_durations(api_song_data[track])
-            notes_in_measure = calculate_bars_from_note_list(
-                note_list, api_song_data[track]
-            )
-
-            rhy_files = []
-            midi_files = []
-            mcsv_files = []
-            two_note_features = []
-
-            for measure in api_song_data[track].measures:
-                measure_number = measure.meta_data.number - 1
-
-                # measure_id = track_id + '_bar_' + str(measure.meta_data.number)
-                measure_id = self.measure_id(track_id, measure.meta_data.number)
-
-                if not self.valid_measure(
-                    measure=measure, notes_in_measure=notes_in_measure[measure_number]
-                ):
-                    continue
-
-                single_note = False
-                note_pitch = 0
-                note_fret_number = -1
-                note_string_number = 0
-                note_duration = 0
-                if len(notes_in_measure[measure_number]) == 1:
-                    print("single note measure")
-                    single_note = True
-                    note_pitch = notes_in_measure[measure_number][0].note.pitch
-                    note_fret_number = notes_in_measure[measure_number][
-                        0
-                    ].note.fret_number
-                    note_string_number = notes_in_measure[measure_number][
-                        0
-                    ].note.string_number
-                    note_duration = float(
-                        notes_in_measure[measure_number][0].note.duration
-                    )
-
-                # Calculate the complexites for the measure:
-                complexity_note_list = calculate_grace_note_possitions(
-                    notes_in_measure[measure_number]
-                )
-                measure_complexities = calculate_playing_complexity(
-                    complexity_note_list,
-                    api_song_data[track],
-                    by_bar=[measure_number],
-                    weight_set=self.weight_set,
-                    unadorned_value=True,
-                )
-
-                print(measure_complexities)
-                if (
-                    measure_complexities.adorned == {}
-                    or measure_complexities.adorned is None
-                ):
-                    print("No complexity could be calculated for %s" % measure_id)
-                    continue
-
-                database_file_location = file_name
-                # if convert_to_json and json_file is not None:
-                #    database_file_location = json_file
-
-                song_entry_info.append(
-                    [
-                        measure_id,
-                        database_file_location,
-                        artist,
-                        song_title,
-                        track,
-                        measure.meta_data.number,
-                        measure_complexities.adorned[measure.meta_data.number].BGM,
-                        measure_complexities.adorned[measure.meta_data.number].EVC,
-                        measure_complexities.unadorned[measure.meta_data.number].BGM,
-                        measure_complexities.unadorned[measure.meta_data.number].EVC,
-                        single_note,
-                        note_pitch,
-                        note_fret_number,
-                        note_string_number,
-                        note_duration,
-                    ]
-                )
-
-                # calculate the RHY file for the measure:
-                try:
-                    rhy_file = str(
-                        calculate_rhy_file_for_measure(
-                            measure, rhy_file_name=measure_id + ".rhy"
-                        )
-                    )
-                except ValueError:
-                    print("Error making RHY file for %s" % measure_id)
-                    continue
-
-                # append the rhy_file to the rhy_file list:
-                rhy_files.append(rhy_file)
-
-                # see if the measure only has 2 notes:
-                if len(notes_in_measure[measure_number]) == 2:
-                    tn_features = feature_analysis.combine_synpy_and_fantastic_features_for_two_notes(
-                        measure,
-                        notes_in_measure[measure_number],
-                        rhy_file,
-                        r_data_frame=False,
-                        save_table=False,
-                    )
-                    two_note_features.append(tn_features)
-
-                # calculate the midi file for the measure:
-                midi_file = calculate_midi_file_for_measure_note_list(
-                    notes_in_measure[measure_number], measure, midi_file_name=measure_id
-                )
-                mcsv_file = run_melconv(midi_file, midi_file.split(".")[0] + ".csv")
-
-                midi_files.append(midi_file)
-                if os.path.isfile(mcsv_file):
-                    mcsv_files.append(mcsv_file)
-
-            # Then need to do feature analysis:
+        for track_entry in track_entries:
 
-            # format the mcsv list to be accepted by FANTASTIC:
-            mcvs_formated = []
-            for file in mcsv_files:
-                mcvs_formated.append(file.split(os.getcwd() + "/")[-1])
-
-            # Load r related things:
-            feature_analysis.fantastic_interface.load()
-
-            feature_df = feature_analysis.merge_synpy_and_fantastic_features(
-                mcvs_formated,
-                rhy_files,
-                rhy_table_output="_rhy_features.csv",
-                save_location="_all_features.csv",
+            feature_df = feature_analysis.merge_feature_rows(
+                track_entry.fantastic_features, track_entry.synpy_features
             )
 
             # set song_entry_file_location:
-            song_entry_file_location = "./" + track_id + ".csv"
+            song_entry_file_location = (
+                self.save_folder + "/raw_entry_tables/" + track_entry.track_id + ".csv"
+            )
 
             if feature_df is not False:
-                song_entry_file = open(song_entry_file_location, "w")
-                with song_entry_file:
-                    writer = csv.writer(song_entry_file)
-                    for row in song_entry_info:
-                        writer.writerow(row)
-
-                # merge features into the database:
-                db_entry = robjects.r["merge"](
-                    feature_analysis.read_in_feature_dataframe(
-                        song_entry_file_location
-                    ),
-                    feature_df,
-                )
-
-                # write out the data_base:
-                robjects.r["write.table"](
-                    x=db_entry, file=song_entry_file_location, sep=",", row_names=False
+                # merge features into the database, writing the
+                # numbers and NA values the same way as R's write.table:
+                feature_analysis.feature_dataframe(
+                    track_entry.song_entry_info[0], track_entry.song_entry_info[1:]
+                ).merge(feature_df, on="file.id", sort=True).to_csv(
+                    song_entry_file_location,
+                    index=False,
+                    float_format="%.15g",
+                    na_rep="NA",
                 )
             else:
                 # just write out the header to the song_entry_file_location
-                song_entry_file_location = "./" + track_id + ".csv"
                 song_entry_file = open(song_entry_file_location, "w")
                 with song_entry_file:
                     writer = csv.writer(song_entry_file)
                     # write the header:
                     writer.writerow(self.header)
 
-            # then check for single and two note measures:
+            # then add the single and two note measures:
             song_entry_file = open(song_entry_file_location, "a+")
             with song_entry_file:
                 writer = csv.writer(song_entry_file)
-                for row in song_entry_info:
-                    if row == [
-                        "file.id",
-                        "file.location",
-                        "artist",
-                        "song.title",
-                        "track",
-                        "measure.number",
-                        "complexity",
-                        "perceived.difficulty",
-                        "unadorned.complexity",
-                        "unadorned.perceived.difficulty",
-                        "single.note",
-                        "single.note.pitch",
-                        "single.note.fret.number",
-                        "single.note.string.number",
-                        "single.note.duration",
-                    ]:
-                        continue
-                    elif row[10] is True:
-                        print("single_note")
-                        track_id = self.track_id(song_title, row[4])
-                        measure_id = self.measure_id(track_id, row[5])
-                        print(row[0])
-
-                        # make some dummy fantastic data:
-                        dummy_fantastic_data = []
-                        for fantastic_feature in [
-                            "mean.entropy",
-                            "mean.productivity",
-                            "mean.Simpsons.D",
-                            "mean.Yules.K",
-                            "mean.Sichels.S",
-                            "mean.Honores.H",
-                            "p.range",
-                            "p.entropy",
-                            "p.std",
-                            "i.abs.range",
-                            "i.abs.mean",
-                            "i.abs.std",
-                            "i.mode",
-                            "i.entropy",
-                            "d.range",
-                            "d.median",
-                            "d.mode",
-                            "d.entropy",
-                            "d.eq.trans",
-                            "d.half.trans",
-                            "d.dotted.trans",
-                            "len",
-                            "glob.duration",
-                            "note.dens",
-                            "tonalness",
-                            "tonal.clarity",
-                            "tonal.spike",
-                            "int.cont.grad.mean",
-                            "int.cont.grad.std",
-                            "int.cont.dir.change",
-                            "step.cont.glob.var",
-                            "step.cont.glob.dir",
-                            "step.cont.loc.var",
-                            "mode",
-                            "h.contour",
-                            "int.cont.glob.dir",
-                            "int.contour.class",
-                        ]:
-                            if fantastic_feature == "len":
-                                dummy_fantastic_data.append(1)
-                            elif fantastic_feature == "d.mode":
-                                dummy_fantastic_data.append(row[-1])
-                            elif fantastic_feature == "d.median":
-                                dummy_fantastic_data.append(row[-1])
-                            else:
-                                dummy_fantastic_data.append(0)
-
-                        if row[0] + ".rhy" in rhy_files:
-                            print("rhy file exists")
-                            synpy_data = (
-                                feature_analysis.synpy_interface.compute_features(
-                                    row[0] + ".rhy"
-                                )[1:]
-                            )
-                            print(song_entry_info[0])
-                            print(row + dummy_fantastic_data + synpy_data)
-                            assert len(row + dummy_fantastic_data + synpy_data) == len(
-                                self.header
-                            )
-                            writer.writerow(row + dummy_fantastic_data + synpy_data)
-                    else:
-                        print("Two note measure...")
-                        # get a list of all file.ids of the measures
-                        # with 2 notes:
-                        two_note_measures = [x[0] for x in two_note_features]
-                        if row[0] in two_note_measures:
-                            # its a two note measure
-                            tn_index = two_note_measures.index(row[0])
-                            tn_data = two_note_features[tn_index]
-                            # make some dummy fantastic data:
-                            dummy_fantastic_data = []
-                            for fantastic_feature in [
-                                "mean.entropy",
-                                "mean.productivity",
-                                "mean.Simpsons.D",
-                                "mean.Yules.K",
-                                "mean.Sichels.S",
-                                "mean.Honores.H",
-                                "p.range",
-                                "p.entropy",
-                                "p.std",
-                                "i.abs.range",
-                                "i.abs.mean",
-                                "i.abs.std",
-                                "i.mode",
-                                "i.entropy",
-                                "d.range",
-                                "d.median",
-                                "d.mode",
-                                "d.entropy",
-                                "d.eq.trans",
-                                "d.half.trans",
-                                "d.dotted.trans",
-                                "len",
-                                "glob.duration",
-                                "note.dens",
-                                "tonalness",
-                                "tonal.clarity",
-                                "tonal.spike",
-                                "int.cont.grad.mean",
-                                "int.cont.grad.std",
-                                "int.cont.dir.change",
-                                "step.cont.glob.var",
-                                "step.cont.glob.dir",
-                                "step.cont.loc.var",
-                                "mode",
-                                "h.contour",
-                                "int.cont.glob.dir",
-                                "int.contour.class",
-                            ]:
-                                if fantastic_feature == "p.range":
-                                    dummy_fantastic_data.append(tn_data[1])
-                                elif fantastic_feature == "p.entropy":
-                                    dummy_fantastic_data.append(tn_data[2])
-                                elif fantastic_feature == "p.std":
-                                    dummy_fantastic_data.append(tn_data[3])
-                                elif fantastic_feature == "i.abs.mean":
-                                    dummy_fantastic_data.append(tn_data[4])
-                                elif fantastic_feature == "i.abs.std":
-                                    dummy_fantastic_data.append(tn_data[5])
-                                elif fantastic_feature == "i.mode":
-                                    dummy_fantastic_data.append(tn_data[6])
-                                elif fantastic_feature == "i.entropy":
-                                    dummy_fantastic_data.append(tn_data[7])
-                                elif fantastic_feature == "d.range":
-                                    dummy_fantastic_data.append(tn_data[8])
-                                elif fantastic_feature == "d.median":
-                                    dummy_fantastic_data.append(tn_data[9])
-                                elif fantastic_feature == "d.mode":
-                                    dummy_fantastic_data.append(tn_data[10])
-                                elif fantastic_feature == "d.entropy":
-                                    dummy_fantastic_data.append(tn_data[11])
-                                elif fantastic_feature == "len":
-                                    dummy_fantastic_data.append(tn_data[12])
-                                elif fantastic_feature == "glob.duration":
-                                    dummy_fantastic_data.append(tn_data[13])
-                                elif fantastic_feature == "note.dens":
-                                    dummy_fantastic_data.append(tn_data[14])
-                                else:
-                                    dummy_fantastic_data.append(0)
-                            print(row + dummy_fantastic_data + tn_data[-7:])
-                            writer.writerow(row + dummy_fantastic_data + tn_data[-7:])
+                for row in track_entry.extra_rows:
+                    assert len(row) == len(self.header)
+                    writer.writerow(row)
 
             # save the song_entry_table location
             song_entry_tables.append(song_entry_file_location)
 
-            if save_feature_files is False:
-                # delete all the mid, mcsv and rhy files
-                print("Deleting feature files....")
-                for fname in midi_files:
-                    if os.path.isfile(fname):
-                        os.remove(fname)
-
-                for rhy_file in rhy_files:
-                    if os.path.isfile(rhy_file):
-                        os.remove(rhy_file)
-
-                for mcsv_file in mcsv_files:
-                    if os.path.isfile(os.path.basename(mcsv_file)):
-                        os.remove(os.path.basename(mcsv_file))
-            else:
-                if not os.path.isdir(self.save_folder + "/midi_files/" + track_id):
-                    os.makedirs(self.save_folder + "/midi_files/" + track_id)
-
-                if not os.path.isdir(self.save_folder + "/rhy_files/" + track_id):
-                    os.makedirs(self.save_folder + "/rhy_files/" + track_id)
-
-                if not os.path.isdir(self.save_folder + "/csv_files/" + track_id):
-                    os.makedirs(self.save_folder + "/csv_files/" + track_id)
-
-                for fname in midi_files:
-                    if os.path.isfile(fname):
-                        shutil.move(fname, self.save_folder + "/midi_files/" + track_id)
-
-                for rhy_file in rhy_files:
-                    if os.path.isfile(rhy_file):
-                        shutil.move(
-                            rhy_file, self.save_folder + "/rhy_files/" + track_id
-                        )
-
-                for mcsv_file in mcsv_files:
-                    if os.path.isfile(os.path.basename(mcsv_file)):
-                        shutil.move(
-                            os.path.basename(mcsv_file),
-                            self.save_folder + "/csv_files/" + track_id,
-                        )
+            self.chunk_features.add(track_entry.chunk_features)
 
         for entry in song_entry_tables:
             self.add_entry(entry, remove_duplicates)
-            try:
-                shutil.move(entry, self.save_folder + "/raw_entry_tables")
-            except:
-                shutil.copy2(entry, self.save_folder + "/raw_entry_tables")
-                os.remove(entry)
 
         self.clean_up_extra_temp_files()
 
-        return
+    @staticmethod
+    def save_feature_files(
+        save_folder, track_id, measure_id, measure, notes_in_measure, note_table
+    ):
+        """Save the midi, rhy and mcsv files for the measure in the
+        midi_files, rhy_files and csv_files folders of the database
+        in save_folder.
+        """
+        for feature_folder in ["midi_files", "rhy_files", "csv_files"]:
+            if not os.path.isdir(save_folder + "/" + feature_folder + "/" + track_id):
+                os.makedirs(save_folder + "/" + feature_folder + "/" + track_id)
+
+        calculate_midi_file_for_measure_note_list(
+            notes_in_measure,
+            measure,
+            midi_file_name=save_folder + "/midi_files/" + track_id + "/" + measure_id,
+        )
+        calculate_rhy_file_for_measure(
+            measure,
+            rhy_file_name=save_folder
+            + "/rhy_files/"
+            + track_id
+            + "/"
+            + measure_id
+            + ".rhy",
+        )
+        calculate_mcsv_file_for_note_table(
+            note_table,
+            measure,
+            mcsv_file_name=save_folder
+            + "/csv_files/"
+            + track_id
+            + "/"
+            + measure_id
+            + ".csv",
+        )
 
-    def valid_measure(self, measure, notes_in_measure):
+    @staticmethod
+    def valid_measure(measure, notes_in_measure, weight_set="GMS"):
 
         # Preliminary check to see if the measure
         # can be processed:
@@ -960,7 +832,9 @@ class Database:
             "12/8",
             "12/16",
         ]
-        valid_time_sigs += list(musiplectics.time_sig_weights().keys())
+        valid_time_sigs += list(
+            musiplectics.load_weight_set(weight_set).time_sig.keys()
+        )
 
         if measure.meta_data.time_signature not in set(valid_time_sigs):
             print(
@@ -986,11 +860,11 @@ class Database:
             "%s is not a valid file location" % song_entry_file_location
         )
 
-        # load the database for duplicate testing:
-        if remove_duplicates:
-            self.load()
-
-        duplicate_test = []
+        # hashes of the features of the bars in the song and the
+        # identified database duplicates:
+        duplicate_test = set()
+        new_entries = []
+        first_row = self.storage.row_count()
 
         # read in song_entry_file_location
         with open(str(song_entry_file_location)) as song_entry_file:
@@ -1006,49 +880,55 @@ class Database:
                         self.save_folder + "/" + entry[1]
                     ) or os.path.isfile(entry[1]):
 
-                        # if is does add to the database:
-                        unique_id = str(uuid.uuid4())
-                        entry[0] = unique_id
+                        # if is does add to the database, with an id
+                        # made from the entry and the row it is added to,
+                        # so the ids are the same every time:
+                        entry[0] = self.entry_id(entry, first_row + len(new_entries))
                     if remove_duplicates:
                         print("remove duplicates")
                         # check if bar is a duplicate of any
                         # previous bar in the song or an identified
                         # database duplicate:
-                        duplicate = False
-                        if entry[self.header.index("complexity") :] in duplicate_test:
+                        features_hash = entry_hash(
+                            entry[self.header.index("complexity") :]
+                        )
+                        if features_hash in duplicate_test:
                             print("duplicate found!")
-                            duplicate = True
                             continue
 
                         # check to see if the bar is a duplicate
                         # in the database:
-                        for entry_id in list(self.data.keys()):
-                            if (
-                                entry[self.header.index("complexity") :]
-                                == self.data[entry_id][
-                                    self.header.index("complexity") - 1 :
-                                ]
-                            ):
-                                print("duplicate found!")
-                                duplicate = True
-                                duplicate_test.append(
-                                    entry[self.header.index("complexity") :]
-                                )
-
-                        if not duplicate:
-                            with open(self.data_location, mode="a+") as data_base_file:
-                                data_base_updater = csv.writer(data_base_file)
-                                data_base_updater.writerow(entry)
-                            duplicate_test.append(
-                                entry[self.header.index("complexity") :]
-                            )
+                        if (
+                            entry[self.header.index("complexity") :]
+                            in self.duplicate_index
+                        ):
+                            print("duplicate found!")
+                            duplicate_test.add(features_hash)
+                            continue
+
+                        new_entries.append(entry)
+                        duplicate_test.add(features_hash)
                     else:
-                        with open(self.data_location, mode="a+") as data_base_file:
-                            data_base_updater = csv.writer(data_base_file)
-                            data_base_updater.writerow(entry)
+                        new_entries.append(entry)
 
                     line_count += 1
 
+        # write all the new entries to the database in one go:
+        self.storage.append_rows(new_entries)
+        self.duplicate_index.add(new_entries)
+        if self.similarity_index is not None:
+            self.similarity_index.add(new_entries)
+
+    @staticmethod
+    def entry_id(entry, row):
+        """
+        A unique id for the entry added at the row of the database,
+        from its file.location and measure (track and bar) id.
+        """
+        return str(
+            uuid.uuid5(uuid.NAMESPACE_URL, "%s/%s/%d" % (entry[1], entry[0], row))
+        )
+
     def consolidate_multiple_entries_from_same_files(self, entry_ids):
         files_to_load = {}
         for entry_id in entry_ids:
@@ -1196,7 +1076,7 @@ class Database:
 
     def load(self):
         """
-        load the database data from self.data_location
+        load the database data from self.storage
 
         code was based off:
             https://stackoverflow.com/questions/6740918/creating-a-dictionary-from-a-csv-file
@@ -1207,25 +1087,45 @@ class Database:
 
         # strip out the header from the csv file:
         # data = csv_list[1:]
-        data = self.load_data_as_lists()[1:]
-
         # make a dict of entries
-        csv_dict = {row[0]: row[1:] for row in data}
-        self.data = csv_dict
+        self.data = self.storage.load()
 
     def load_data_as_lists(self):
-        with open(self.data_location) as f:
-            csv_list = [[val.strip() for val in r.split(",")] for r in f.readlines()]
+        return self.storage.read_rows()
+
+    def export_csv(self, csv_location):
+        """Write the database table out to a csv file"""
+        with open(csv_location, mode="w") as database_csv:
+            database_writer = csv.writer(database_csv)
+            for row in self.load_data_as_lists():
+                database_writer.writerow(row)
+
+    def import_csv(self, csv_location):
+        """Replace the database table with the entries in a
+        database csv file (such as one made with export_csv).
+        """
+        with open(csv_location) as database_csv:
+            rows = [row for row in csv.reader(database_csv, delimiter=",")]
 
-        return csv_list
+        assert rows[0] == self.header, (
+            "%s does not have the database header" % csv_location
+        )
+        self.storage.write_rows([[val.strip() for val in row] for row in rows[1:]])
+        self.duplicate_index.clear()
+        self.build_manifest.clear()
+        self.clear_sort_orders()
+        if self.similarity_index is not None:
+            self.similarity_index.clear()
+        self.data = None
 
     def sort(self, complexity_weight=1, difficulty_weight=1, adorned=True, save=True):
         """Sort the database by the huerisitics determined by
         complexity_weight and difficulty_weight
 
+        The database table is not re-written, the order is saved in
+        the sort order cache and sorted.txt is set to it when save is True.
         """
         data = self.load_data_as_lists()
-        sorted_data = []
 
         if complexity_weight == 0 and difficulty_weight == 0:
             print(
@@ -1239,49 +1139,16 @@ class Database:
             and difficulty_weight == self.sorted.difficulty_weight
         ):
             print("Already sorted!... returning")
-            return data[1:]
+        else:
+            print(
+                "Sorting database by complexity weight %d, difficulty_weight %d..."
+                % (complexity_weight, difficulty_weight)
+            )
 
-        print(
-            "Sorting database by complexity weight %d, difficulty_weight %d This can take a few minutes!..."
-            % (complexity_weight, difficulty_weight)
-        )
-
-        if adorned:
-            complexity_header = "complexity"
-            difficulty_header = "perceived.difficulty"
-        else:
-            complexity_header = "unadorned.complexity"
-            difficulty_header = "unadorned.perceived.difficulty"
-
-        for row in data[1:]:
-            sorted_index = 0
-            for sorted_row in sorted_data:
-                heuristic = calculate_heuristic(
-                    float(row[self.header.index(complexity_header)]),
-                    float(sorted_row[self.header.index(complexity_header)]),
-                    float(row[self.header.index(difficulty_header)]),
-                    float(sorted_row[self.header.index(difficulty_header)]),
-                    complexity_weight,
-                    difficulty_weight,
-                )
-                if heuristic >= 0:
-                    break
-                sorted_index += 1
-            sorted_data.insert(sorted_index, row)
+        order = self.sort_order(complexity_weight, difficulty_weight, adorned)
+        sorted_data = [data[1:][row] for row in order]
 
         if save:
-            print("saving the database....")
-            with open(self.data_location, mode="w") as database_csv:
-                database_writer = csv.writer(
-                    database_csv,
-                    delimiter=",",
-                    quotechar="|",
-                    quoting=csv.QUOTE_MINIMAL,
-                )
-                database_writer.writerow(data[0])
-                for row in sorted_data:
-                    database_writer.writerow(row)
-
             with open(
                 self.save_folder + "/" + "sorted.txt", mode="w"
             ) as sorted_savefile:
@@ -1294,7 +1161,53 @@ class Database:
 
         return sorted_data
 
-    def subset(
+    def sort_order(self, complexity_weight=1, difficulty_weight=1, adorned=True):
+        """The order of the database rows sorted by the heuristic
+        (largest first), as an array of row numbers.
+
+        The heuristic is linear so each row gets a score of
+        complexity * complexity_weight + difficulty * difficulty_weight
+        and the rows are sorted by it, rows with the same score are in
+        reverse order, the same as the insertion sort this replaced.
+        The orders are cached in sort_orders/ for each set of weights.
+        """
+        if adorned:
+            complexity_header = "complexity"
+            difficulty_header = "perceived.difficulty"
+        else:
+            complexity_header = "unadorned.complexity"
+            difficulty_header = "unadorned.perceived.difficulty"
+
+        order_location = "%s/sort_orders/%s_%s_%s.npy" % (
+            self.save_folder,
+            str(adorned),
+            str(float(complexity_weight)),
+            str(float(difficulty_weight)),
+        )
+        database_size = self.storage.row_count()
+
+        if os.path.isfile(order_location):
+            order = np.load(order_location)
+            if len(order) == database_size:
+                return order
+
+        values, text = self.storage.feature_matrix(
+            [complexity_header, difficulty_header]
+        )
+        scores = values[:, 0] * complexity_weight + values[:, 1] * difficulty_weight
+        order = np.lexsort((-np.arange(database_size), -scores))
+
+        if not os.path.isdir(self.save_folder + "/sort_orders"):
+            os.makedirs(self.save_folder + "/sort_orders")
+        np.save(order_location, order)
+
+        return order
+
+    def clear_sort_orders(self):
+        if os.path.isdir(self.save_folder + "/sort_orders"):
+            shutil.rmtree(self.save_folder + "/sort_orders")
+
+    def subset_rows(
         self,
         complexity_weight=1,
         difficulty_weight=1,
@@ -1305,11 +1218,15 @@ class Database:
         exclude_artists=["none"],
         exclude_files=["none"],
     ):
-        """
+        """Work out which rows of the database are in the subset.
 
         Parameters:
         ----------
         percentile_range : list, number
+
+        Returns:
+        -------
+        list of the row numbers (0 is the first entry after the header)
         """
 
         lower_percentile = min(percentile_range)
@@ -1319,7 +1236,7 @@ class Database:
             # check if the database has been sorted:
             if self.sorted.adorned is None:
                 # then sort the database:
-                self.sort(complexity_weight, difficulty_weight)
+                self.sort(complexity_weight, difficulty_weight, adorned)
 
             elif (
                 self.sorted.complexity_weight != complexity_weight
@@ -1328,64 +1245,84 @@ class Database:
             ):
                 # database is sorted wrong:
                 # sort the database:
-                self.sort(complexity_weight, difficulty_weight)
+                self.sort(complexity_weight, difficulty_weight, adorned)
 
-        # Need to change this to work on row numbers
-        subset_database = robjects.r(
-            """
-            subset.db <- function(database,
-                                    lower.percentile=0,
-                                    upper.percentile=100,
-                                    artists,
-                                    files){
+        database_size = self.storage.row_count()
 
-                lower.percentile.row <- round(length(database$file.id)/100 * (101-lower.percentile))
-                upper.percentile.row <- round(length(database$file.id)/100 * (101-upper.percentile))
+        # percentile rows are worked out the same as the
+        # original R subset (1 based and inclusive):
+        lower_percentile_row = round(database_size / 100 * (101 - lower_percentile))
+        upper_percentile_row = round(database_size / 100 * (101 - upper_percentile))
+        rows = range(
+            max(upper_percentile_row, 1) - 1, min(lower_percentile_row, database_size)
+        )
 
+        # use the order the database is sorted in:
+        if self.sorted.adorned is not None:
+            order = self.sort_order(
+                self.sorted.complexity_weight,
+                self.sorted.difficulty_weight,
+                self.sorted.adorned,
+            )
+            rows = [int(order[row]) for row in rows]
+
+        if artists != "all" or exclude_artists != ["none"]:
+            if artists == "all":
+                artists = self.storage.column_values("artist")
+            elif not isinstance(artists, list):
+                artists = [artists]
+            artists = set(
+                [artist for artist in artists if artist not in exclude_artists]
+            )
+            artist_column = self.storage.column_values("artist")
+            rows = [row for row in rows if artist_column[row] in artists]
 
-                database <- database[upper.percentile.row:lower.percentile.row,]
-                database <- database[
-                        database$artist %in% artists,
-                        ]
-                database <- database[
-                        database$file.location %in% files,
-                        ]
-            }
+        if files != "all" or exclude_files != ["none"]:
+            if files == "all":
+                files = self.storage.column_values("file.location")
+            elif not isinstance(files, list):
+                files = [files]
+            files = set([file for file in files if file not in exclude_files])
+            file_column = self.storage.column_values("file.location")
+            rows = [row for row in rows if file_column[row] in files]
+
+        return list(rows)
+
+    def subset(
+        self,
+        complexity_weight=1,
+        difficulty_weight=1,
+        percentile_range=[0, 100],
+        adorned=True,
+        artists="all",
+        files="all",
+        exclude_artists=["none"],
+        exclude_files=["none"],
+    ):
+        """Returns the subset of the database as an R dataframe
+
+        Parameters:
+        ----------
+        percentile_range : list, number
         """
+
+        rows = self.subset_rows(
+            complexity_weight=complexity_weight,
+            difficulty_weight=difficulty_weight,
+            percentile_range=percentile_range,
+            adorned=adorned,
+            artists=artists,
+            files=files,
+            exclude_artists=exclude_artists,
+            exclude_files=exclude_files,
         )
 
         database_features = feature_analysis.read_in_feature_dataframe(
-            self.data_location
+            self.storage.as_csv()
         )
 
-        self.load()
-
-        if artists == "all":
-            artists = [
-                d[self.header.index("artist") - 1] for d in list(self.data.values())
-            ]
-            artists = list(set(artists))
-        elif not isinstance(artists, list):
-            artists = [artists]
-
-        if files == "all":
-            files = [
-                d[self.header.index("file.location") - 1]
-                for d in list(self.data.values())
-            ]
-            files = list(set(files))
-        elif not isinstance(files, list):
-            files = [files]
-
-        artists = [artist for artist in artists if artist not in exclude_artists]
-        files = [file for file in files if file not in exclude_files]
-
-        return subset_database(
-            database_features,
-            lower_percentile,
-            upper_percentile,
-            robjects.vectors.StrVector(artists),
-            robjects.vectors.StrVector(files),
+        return database_features.rx(
+            robjects.vectors.IntVector([row + 1 for row in rows]), True
         )
 
     def find_most_similar(
@@ -1396,9 +1333,52 @@ class Database:
         difficulty_weight=1,
         **subset_parameters
     ):
-        """ """
+        """Find the ids of the database entries most similar to the
+        measure, see find_most_similar_many.
+        """
+        return self.find_most_similar_many(
+            [measure],
+            [notes_in_measure],
+            complexity_weight=complexity_weight,
+            difficulty_weight=difficulty_weight,
+            **subset_parameters
+        )[0]
 
-        print("subset_parameters:", subset_parameters)
+    def find_most_similar_many(
+        self,
+        measures,
+        notes_per_measure=None,
+        complexity_weight=1,
+        difficulty_weight=1,
+        **subset_parameters
+    ):
+        """Find the ids of the database entries most similar to each
+        of the measures.
+
+        The features of all the measures are worked out first, then the
+        database is subset and its features are read once, and the
+        similarities of the measures (that have the same features) to
+        the subset are worked out together in a
+        (measures x entries) similarity matrix.
+
+        Parameters
+        ---------
+        measures : list of Measure
+
+        notes_per_measure : list, optional
+            the notes_in_measure of each measure, [] (the default)
+            uses the tied notes of the measure
+
+        similarity_threshold, percentile_range, adorned, artists,
+        files, exclude_artists, exclude_files :
+            the subset_parameters, see cbr.retrieval
+
+        Returns
+        -------
+        list of lists
+            the candidate set (ids) for each measure, empty for
+            measures that aren't valid
+        """
 
         # sort out the subset parameters:
         similarity_threshold = 100 - subset_parameters.get("similarity_threshold", 100)
@@ -1409,74 +1389,66 @@ class Database:
         exclude_artists = subset_parameters.get("exclude_artists", ["none"])
         exclude_files = subset_parameters.get("exclude_files", ["none"])
 
-        assert isinstance(measure, Measure)
-        assert isinstance(notes_in_measure, list) or isinstance(
-            notes_in_measure, AdornedNote
-        )
-
-        if notes_in_measure == []:
-            notes_in_measure = calculate_tied_note_durations(measure)
-        else:
-            # if the input is a list make sure they only contain
-            # adorned notes:
-            if isinstance(notes_in_measure, list):
-                for note in notes_in_measure:
-                    assert isinstance(note, AdornedNote)
-            # if its a single note (as might be the case:)
-            # make it a list:
-            if isinstance(notes_in_measure, AdornedNote):
-                notes_in_measure = [notes_in_measure]
+        if notes_per_measure is None:
+            notes_per_measure = [[] for measure in measures]
+        assert len(notes_per_measure) == len(
+            measures
+        ), "there must be notes_in_measure for each measure"
 
         # Load r related things:
         feature_analysis.fantastic_interface.load()
-        if self.get_similarity_features_for_measure(measure, notes_in_measure) is None:
-            return []
-
-        measure_id, measure_features = self.get_similarity_features_for_measure(
-            measure, notes_in_measure
-        )
-
-        mix_features = robjects.r(
-            """
-                    mix.features <- function(df1, df2){
-                    rbind(df1, df2[, names(df1)])
-                    }
-                """
-        )
-
-        get_candidate_set = robjects.r(
-            """
-                    get.candidate.set <- function(measure.database.df, eucl.stand=TRUE, percent.match=1){
-
-                        if(eucl.stand==TRUE){measure.database.df <- ztransform(measure.database.df)}
-
-                        # get the features from the measure
-                        features<-colnames(measure.database.df[,c(-1)])
-
-                        rows <- measure.database.df$file.id[c(-1)]
-
-                        database.df <- measure.database.df[c(-1),features]
-                        rownames(database.df) <- rows
-                        colnames(database.df) <- features
-
-                        measure.df <- measure.database.df[1,features]
-                        rownames(measure.df) <-  measure.database.df[1,1]
-
-                        sim <- apply(database.df, 1, function(x)exp(-dist(rbind(x, measure.df))/length(features)))
 
-                        sim.df <- data.frame(sim)
-                        sim.df$file.id <- rownames(sim.df)
+        queries = []
+        for index, (measure, notes_in_measure) in enumerate(
+            zip(measures, notes_per_measure)
+        ):
+            assert isinstance(measure, Measure)
+            assert isinstance(notes_in_measure, list) or isinstance(
+                notes_in_measure, AdornedNote
+            )
 
-                        similarity.range <- max(sim.df$sim) - min(sim.df$sim)
-                        out <- as.character(sim.df$file.id[which(sim.df$sim >= max(sim.df$sim)-percent.match*similarity.range/100)])
+            if notes_in_measure == []:
+                notes_in_measure = calculate_tied_note_durations(measure)
+            else:
+                # if the input is a list make sure they only contain
+                # adorned notes:
+                if isinstance(notes_in_measure, list):
+                    for note in notes_in_measure:
+                        assert isinstance(note, AdornedNote)
+                # if its a single note (as might be the case:)
+                # make it a list:
+                if isinstance(notes_in_measure, AdornedNote):
+                    notes_in_measure = [notes_in_measure]
+
+            similarity_features = self.get_similarity_features_for_measure(
+                measure, notes_in_measure
+            )
+            if similarity_features is None:
+                continue
+
+            measure_id, measure_features = similarity_features
+            if measure_features is False:
+                print("Unable to analyse %s, skipping..." % measure_id)
+                continue
+
+            # the first column is the file.id:
+            (
+                feature_names,
+                measure_vector,
+                measure_text,
+            ) = feature_analysis.features_from_dataframe(measure_features)
+            queries.append(
+                SimilarityQuery(
+                    index, feature_names[1:], measure_vector[1:], measure_text[1:]
+                )
+            )
 
-                        out
-                        }
-                """
-        )
+        candidate_sets = [[] for measure in measures]
+        if queries == []:
+            return candidate_sets
 
         # subset the database:
-        database_features_subset = self.subset(
+        rows = self.subset_rows(
             complexity_weight=complexity_weight,
             difficulty_weight=difficulty_weight,
             percentile_range=percentile_range,
@@ -1487,28 +1459,168 @@ class Database:
             exclude_files=exclude_files,
         )
 
-        df = mix_features(measure_features, database_features_subset)
-        """
-        note_list = calculate_tied_note_durations(measure)
-        single_note = False
-        if len(note_list) == 1:
-            single_note = True
-        """
-
         print("Finding most similar measures....")
-        candidate_set = get_candidate_set(df, True, similarity_threshold)
+        if self.similarity_index is not None:
+            row_mask = np.zeros(self.similarity_index.row_count(), dtype=bool)
+            row_mask[rows] = True
+
+        # the queries with the same features are compared together:
+        query_groups = {}
+        for query in queries:
+            candidate_set = None
+            if self.similarity_index is not None:
+                candidate_set = self.similarity_index.get_candidate_set(
+                    query.feature_names,
+                    query.vector,
+                    query.text,
+                    row_mask,
+                    percent_match=similarity_threshold,
+                )
+
+            if candidate_set is None:
+                query_groups.setdefault(tuple(query.feature_names), []).append(query)
+            else:
+                candidate_sets[query.index] = candidate_set
+
+        # exact similarity to all the entries in the subset:
+        if query_groups != {} and rows != []:
+            database_ids = self.storage.column_values("file.id")
+            ids = [database_ids[row] for row in rows]
+
+        for feature_names, query_group in query_groups.items():
+            if rows == []:
+                continue
+
+            database_features, database_text = self.storage.feature_matrix(
+                list(feature_names)
+            )
+            database_features = database_features[rows]
+            database_text = database_text[rows].any(axis=0)
+
+            # the queries are compared with the subset in batches, so
+            # the (queries x entries) similarity matrices stay small:
+            batch_size = max(1, max_similarity_matrix_size // len(rows))
+            for start in range(0, len(query_group), batch_size):
+                batch = query_group[start : start + batch_size]
+
+                # only columns without any text in them are standardised:
+                numeric_columns = ~(
+                    np.array([query.text for query in batch]) | database_text
+                )
+
+                similarities = feature_analysis.vector_similarity.similarity_matrix(
+                    np.array([query.vector for query in batch]),
+                    database_features,
+                    eucl_stand=True,
+                    numeric_columns=numeric_columns,
+                )
+
+                for query, matches in zip(
+                    batch,
+                    feature_analysis.vector_similarity.most_similar_rows(
+                        similarities, percent_match=similarity_threshold
+                    ),
+                ):
+                    candidate_sets[query.index] = [str(ids[row]) for row in matches]
 
         self.clean_up_extra_temp_files()
 
-        return candidate_set
+        return candidate_sets
+
+    def retrieve_many(
+        self,
+        measures,
+        notes_per_measure,
+        complexity_weight,
+        difficulty_weight,
+        **retrieval_parameters
+    ):
+        """Retrieve the database entries that closest match each of the
+        measures, as cbr.retrieval does for one measure, but the
+        candidate sets of all the measures are found with one
+        similarity query (see find_most_similar_many).
+
+        Parameters
+        ---------
+        measures : list of Measure
+
+        notes_per_measure : list
+            the notes in each of the measures
+
+        complexity_weight, difficulty_weight : {-1.0 - 1.0}
+
+        method, similarity_threshold, percentile_range, adorned,
+        artists, files, exclude_artists, exclude_files :
+            the retrieval_parameters, see cbr.retrieval
+
+        Returns
+        -------
+        list
+            the list of Retrieved tuples for each measure, None for
+            the measures where nothing can be retrieved
+        """
+        candidate_sets = self.find_most_similar_many(
+            measures,
+            notes_per_measure,
+            complexity_weight=complexity_weight,
+            difficulty_weight=difficulty_weight,
+            similarity_threshold=retrieval_parameters.get("similarity_threshold", 100),
+            percentile_range=retrieval_parameters.get("percentile_range", [0, 100]),
+            adorned=retrieval_parameters.get("adorned", True),
+            artists=retrieval_parameters.get("artists", "all"),
+            files=retrieval_parameters.get("files", "all"),
+            exclude_artists=retrieval_parameters.get("exclude_artists", ["none"]),
+            exclude_files=retrieval_parameters.get("exclude_files", ["none"]),
+        )
+
+        # the database is loaded once for all the candidate sets:
+        self.load()
+        return [
+            cbr.select_candidates(
+                candidate_set,
+                self,
+                complexity_weight,
+                difficulty_weight,
+                retrieval_parameters.get("method", "all"),
+                reload=False,
+            )
+            for candidate_set in candidate_sets
+        ]
 
     def sort_candidate_set(
-        self, candidate_set, complexity_weight, difficulty_weight, adorned=True
+        self,
+        candidate_set,
+        complexity_weight,
+        difficulty_weight,
+        adorned=True,
+        reload=True,
     ):
-        sorted_candidates = []
+        complexities, difficulties = self.candidate_complexities(
+            candidate_set, adorned, reload
+        )
+
+        # sort the candidate ids by the heuristic:
+        return cbr.sort_candidates(
+            list(candidate_set),
+            complexities,
+            difficulties,
+            complexity_weight,
+            difficulty_weight,
+        )
 
+    def candidate_complexities(self, candidate_set, adorned=True, reload=True):
+        """Returns numpy arrays of the complexity and
+        difficulty of each of the candidate ids.
+
+        Parameters
+        ---------
+        reload : bool
+            load the database first, set False when it has
+            already been loaded for a batch of candidate sets.
+        """
         # load the database:
-        self.load()
+        if reload:
+            self.load()
         if adorned:
             complexity_index = self.header.index("complexity") - 1
             difficulty_index = self.header.index("perceived.difficulty") - 1
@@ -1516,33 +1628,17 @@ class Database:
             complexity_index = self.header.index("unadorned.complexity") - 1
             difficulty_index = self.header.index("unadorned.perceived.difficulty") - 1
 
-        # sort the candidate ids by the heuristic:
-        for candidate_id in candidate_set:
-            candidate_entry = self.data.get(candidate_id)
-
-            index = 0
-            for sorted_candidate in sorted_candidates:
-                heuristic = calculate_heuristic(
-                    float(candidate_entry[complexity_index]),
-                    float(sorted_candidate.complexity),
-                    float(candidate_entry[difficulty_index]),
-                    float(sorted_candidate.difficulty),
-                    complexity_weight,
-                    difficulty_weight,
-                )
-                if heuristic >= 0:
-                    break
-                index += 1
-            sorted_candidates.insert(
-                index,
-                candidate(
-                    complexity=float(candidate_entry[complexity_index]),
-                    difficulty=float(candidate_entry[difficulty_index]),
-                    id=candidate_id,
-                ),
-            )
+        candidate_entries = [self.data.get(c) for c in candidate_set]
+        complexities = np.array(
+            [float(entry[complexity_index]) for entry in candidate_entries],
+            dtype=np.float64,
+        )
+        difficulties = np.array(
+            [float(entry[difficulty_index]) for entry in candidate_entries],
+            dtype=np.float64,
+        )
 
-        return sorted_candidates
+        return complexities, difficulties
 
     def get_similarity_features_for_measure(self, measure, notes_in_measure=[]):
         """ """
@@ -1557,92 +1653,75 @@ class Database:
         song_title = remove_bad_chars.sub("", measure.meta_data.title)
         measure_id = song_title + "_measure_" + str(measure.meta_data.number)
 
-        if not self.valid_measure(measure=measure, notes_in_measure=notes_in_measure):
+        if not self.valid_measure(
+            measure=measure,
+            notes_in_measure=notes_in_measure,
+            weight_set=self.weight_set,
+        ):
             return None
 
-        # calculate the RHY file for the measure:
-        rhy_file = str(
-            calculate_rhy_file_for_measure(measure, rhy_file_name=measure_id + ".rhy")
+        # calculate the RHY file lines and note table for the measure:
+        rhy_lines = calculate_rhy_lines_for_measure(measure)
+        note_table = calculate_note_table_for_measure_note_list(
+            notes_in_measure, measure
         )
 
-        # calculate the midi file for the measure:
-        midi_file = calculate_midi_file_for_measure_note_list(
-            notes_in_measure, measure, midi_file_name=measure_id
-        )
-
-        mcsv_file = run_melconv(midi_file, midi_file.split(".")[0] + ".csv")
-
-        # format the mcsv list to be accepted by FANTASTIC:
-        mcvs_formated = mcsv_file.split(os.getcwd() + "/")[-1]
-
-        # Load r related things:
-        feature_analysis.fantastic_interface.load()
-
-        feature_df = feature_analysis.merge_synpy_and_fantastic_features(
-            [mcvs_formated], [rhy_file], save_table=False
+        feature_df = feature_analysis.merge_synpy_and_fantastic_features_for_measures(
+            [note_table], [rhy_lines], [measure_id]
         )
 
         # work out the information for
         if len(notes_in_measure) == 1:
             print("single note measure")
-            # Make a csv file with the synpy features calculated
-            feature_analysis.synpy_interface.make_feature_table(
-                [rhy_file], output="rhy_features.csv"
-            )
-
-            # Make a quick function to read the synpy features
-            # into r as a dataframe so it can 'merge' with the
-            # fantastic features
-            get_synpy_data = robjects.r(
-                """
-                    synpy.data <- function(file = 'synpy_features.csv' ){
-                    data.frame(read.csv(file))
-                    }
-                """
-            )
-
-            single_note_features = robjects.r(
-                """
-                    single.note.features <- function(measure.id, pitch, fret, string, duration){
-                    data.frame('file.id'=measure.id,
-                    'single.note.pitch'=pitch,
-                    'single.note.fret.number'=fret,
-                    'single.note.string.number'=string,
-                    single.note.duration=duration,
-                    "d.mode"=duration,
-                    "d.median"=duration,
-                    "len"=1)
-                    }
-                """
+            single_note = notes_in_measure[0].note
+            fantastic_features = feature_analysis.feature_dataframe(
+                [
+                    "file.id",
+                    "single.note.pitch",
+                    "single.note.fret.number",
+                    "single.note.string.number",
+                    "single.note.duration",
+                    "d.mode",
+                    "d.median",
+                    "len",
+                ],
+                [
+                    [
+                        measure_id,
+                        single_note.pitch,
+                        single_note.fret_number,
+                        single_note.string_number,
+                        float(single_note.duration),
+                        float(single_note.duration),
+                        float(single_note.duration),
+                        1,
+                    ]
+                ],
             )
-
-            fantastic_features = single_note_features(
-                measure_id,
-                notes_in_measure[0].note.pitch,
-                notes_in_measure[0].note.fret_number,
-                notes_in_measure[0].note.string_number,
-                float(notes_in_measure[0].note.duration),
+            # the synpy features as a dataframe so it can 'merge'
+            # with the fantastic features
+            synpy_features = feature_analysis.feature_dataframe(
+                feature_analysis.synpy_interface.feature_table_header(),
+                [
+                    feature_analysis.synpy_interface.compute_features_for_rhy_lines(
+                        rhy_lines, measure_id
+                    )
+                ],
             )
-            synpy_features = get_synpy_data("rhy_features.csv")
-            feature_df = robjects.r["merge"](fantastic_features, synpy_features)
+            feature_df = fantastic_features.merge(synpy_features, on="file.id")
 
         if len(notes_in_measure) == 2:
             print("Two note measure")
             feature_df = (
                 feature_analysis.combine_synpy_and_fantastic_features_for_two_notes(
-                    measure, notes_in_measure, rhy_file, r_data_frame=True
+                    measure,
+                    notes_in_measure,
+                    rhy_lines,
+                    r_data_frame=True,
+                    file_id=measure_id,
                 )
             )
 
-        if os.path.isfile(midi_file):
-            os.remove(midi_file)
-        if os.path.isfile(rhy_file):
-            os.remove(rhy_file)
-        if os.path.isfile("rhy_features.csv"):
-            os.remove("rhy_features.csv")
-        if os.path.isfile(os.path.basename(mcsv_file)):
-            os.remove(os.path.basename(mcsv_file))
-
         return measure_id, feature_df
 
     def general_virtuosity_threshold(
@@ -1728,16 +1807,101 @@ class Database:
                 exclude_files=exclude_files,
             )
 
-        print("sorting...")
-        sorted_set = self.sort_candidate_set(
-            most_similar_ids, complexity_weight, difficulty_weight, adorned
+        return self.virtuosity_threshold_for_candidates(
+            most_similar_ids,
+            complexity_weight,
+            difficulty_weight,
+            adorned,
+            virtuosity_percentile,
+        )
+
+    def virtuosity_thresholds(
+        self,
+        complexity_weight,
+        difficulty_weight,
+        measures,
+        notes_per_measure=None,
+        virtuosity_type="performance",
+        virtuosity_percentile=99,
+        similarity_threshold=0,
+        **other_similarity_parameters
+    ):
+        """The virtuosity_threshold of each of the measures, the
+        most similar measures to all of them are found with one
+        similarity query (see find_most_similar_many).
+
+        Returns
+        -------
+        list
+            the VirtuosityThreshold for each measure, None for the
+            measures without any similar measures
+        """
+
+        assert (
+            virtuosity_type == "performance" or virtuosity_type == "musical"
+        ), "virtuosity_type must be set to 'performance' or 'musical'"
+        adorned = virtuosity_type == "performance"
+
+        self.load()
+        candidate_sets = self.find_most_similar_many(
+            measures,
+            notes_per_measure,
+            complexity_weight=complexity_weight,
+            difficulty_weight=difficulty_weight,
+            similarity_threshold=similarity_threshold,
+            percentile_range=other_similarity_parameters.get(
+                "percentile_range", [0, 100]
+            ),
+            adorned=adorned,
+            artists=other_similarity_parameters.get("artists", "all"),
+            files=other_similarity_parameters.get("files", "all"),
+            exclude_artists=other_similarity_parameters.get(
+                "exclude_artists", ["none"]
+            ),
+            exclude_files=other_similarity_parameters.get("exclude_files", ["none"]),
         )
 
-        if sorted_set == []:
+        return [
+            self.virtuosity_threshold_for_candidates(
+                most_similar_ids,
+                complexity_weight,
+                difficulty_weight,
+                adorned,
+                virtuosity_percentile,
+            )
+            for most_similar_ids in candidate_sets
+        ]
+
+    def virtuosity_threshold_for_candidates(
+        self,
+        most_similar_ids,
+        complexity_weight,
+        difficulty_weight,
+        adorned=True,
+        virtuosity_percentile=99,
+    ):
+        """The VirtuosityThreshold of a set of candidate ids, the
+        complexity and difficulty at the virtuosity_percentile of the
+        candidates, see virtuosity_threshold. The database must
+        have been loaded.
+        """
+        if len(most_similar_ids) == 0:
             return None
 
+        print("sorting...")
+        complexities, difficulties = self.candidate_complexities(
+            most_similar_ids, adorned, reload=False
+        )
+        order = cbr.rank_candidates(
+            complexities, difficulties, complexity_weight, difficulty_weight
+        )
+
         print("consolidating...")
-        consolidated = cbr.consolidate_same_complexity_difficulty(sorted_set)
+        consolidated = cbr.consolidate_sorted_candidates(
+            complexities[order],
+            difficulties[order],
+            [most_similar_ids[i] for i in order],
+        )
 
         percentile_index = int(
             round(len(consolidated) / 100 * (100 - virtuosity_percentile))
@@ -1863,7 +2027,7 @@ class Database:
         track_count = 0
         for input_track, output_track in zip(input_song, output_song):
 
-            input_song_complexity = calculate_playing_complexity(
+            input_song_complexity = cached_playing_complexity(
                 input_track,
                 song=input_track,
                 by_bar=False,
@@ -1871,7 +2035,7 @@ class Database:
                 unadorned_value=unadorned_input_song,
             )
 
-            output_song_complexity = calculate_playing_complexity(
+            output_song_complexity = cached_playing_complexity(
                 output_track,
                 song=output_track,
                 by_bar=False,
@@ -1992,7 +2156,7 @@ class Database:
                     input_complexity_note_list = calculate_grace_note_possitions(
                         input_notes_in_measure[measure_index]
                     )
-                    input_song_bar_complexities = calculate_playing_complexity(
+                    input_song_bar_complexities = cached_playing_complexity(
                         input_complexity_note_list,
                         input_track,
                         by_bar=[measure_index],
@@ -2003,7 +2167,7 @@ class Database:
                     output_complexity_note_list = calculate_grace_note_possitions(
                         output_notes_in_measure[measure_index]
                     )
-                    output_song_bar_complexities = calculate_playing_complexity(
+                    output_song_bar_complexities = cached_playing_complexity(
                         output_complexity_note_list,
                         output_track,
                         by_bar=[measure_index],
@@ -2082,3 +2246,370 @@ class Database:
                 report_writer.writerow(row)
 
         return report_data
+
+
+def process_gp5_file(task):
+    """
+    Load the tab of an IngestionTask, write its json file and calculate
+    the entries for its measures, see calculate_track_entries.
+    This doesn't change the database or use R, so it can be run in
+    worker processes.
+
+    Returns
+    ------
+    list of TrackEntries, or False if the tab couldn't be loaded
+    """
+    api_song_data = Database.load_gp_file(task.load_location)
+
+    if api_song_data is False:
+        return False
+
+    file_name = task.gp5_file
+    if task.json_file is not None:
+
+        if task.process_tied_notes_in_json:
+            api_processed_tied_notes = []
+
+            for track in api_song_data:
+                note_list = calculate_tied_note_durations(track)
+                notes_in_measure = calculate_bars_from_note_list(note_list, track)
+
+                measures_with_processed_tied_notes = []
+                for measure in track.measures:
+                    measures_with_processed_tied_notes.append(
+                        Measure(
+                            meta_data=measure.meta_data,
+                            start_time=measure.start_time,
+                            notes=notes_in_measure[measure.meta_data.number - 1],
+                        )
+                    )
+
+                api_processed_tied_notes.append(
+                    Song(
+                        meta_data=track.meta_data,
+                        measures=measures_with_processed_tied_notes,
+                    )
+                )
+
+            api_song_data = api_processed_tied_notes
+
+        json_data, json_dict = write_functions.api_to_json(api_song_data)
+
+        with open(task.save_folder + "/" + task.json_file, "w") as write_file:
+            json.dump(
+                json_dict,
+                write_file,
+                indent=4,
+            )
+
+        # Check the JSON file:
+        json_api_song_data = Database.load_json_file(
+            task.save_folder + "/" + task.json_file
+        )
+
+        assert json_api_song_data == api_song_data
+
+        file_name = task.json_file
+
+    return calculate_track_entries(
+        api_song_data,
+        file_name,
+        weight_set=task.weight_set,
+        save_folder=task.save_folder,
+        save_feature_files=task.save_feature_files,
+        artist_and_title_from_file_name=task.artist_and_title_from_file_name,
+        max_chunk_size=task.max_chunk_size,
+    )
+
+
+def calculate_track_entries(
+    api_song_data,
+    file_name,
+    weight_set="GMS",
+    save_folder="./",
+    save_feature_files=False,
+    artist_and_title_from_file_name=True,
+    max_chunk_size=default_max_chunk_size,
+):
+    """
+    Calculate the database entries for the measures in each track of
+    api_song_data: the complexities, FANTASTIC and SynPy features,
+    and the features of the chunks of 2 to max_chunk_size notes
+    of the measures (see cbr.chunk_features).
+    This doesn't change the database or use R, see
+    Database.write_track_entries for adding the entries.
+
+    Returns
+    ------
+    list of TrackEntries
+    """
+
+    # just a catch for when single Song, not in track format
+    # is added as an entry.
+    if isinstance(api_song_data, Song):
+        api_song_data = [api_song_data]
+
+    assert isinstance(api_song_data, list)
+
+    track_entries = []
+
+    for track in range(0, len(api_song_data)):
+        artist = api_song_data[track].meta_data.artist
+        if artist == "":
+            artist = "unknown"
+
+        song_title = api_song_data[track].meta_data.title
+
+        if artist_and_title_from_file_name:
+            # patterns to get artist and title from the file name
+            # of tabs downloaded from Ultimate Guitar.
+            artist_from_file_name = re.compile("[\S*\s]*-")
+            title_from_file_name = re.compile("-\s[\S*\s*].*")
+
+            artist_from_file_name = artist_from_file_name.search(
+                file_name.split("/")[-1]
+            )
+            song = title_from_file_name.search(file_name)
+
+            if artist_from_file_name is not None:
+                artist = artist_from_file_name.group().replace(" -", "")
+            if song is not None:
+                song_title = song.group().replace("- ", "").split(".")[0]
+
+        # remove problematic characters:
+        artist = remove_bad_chars.sub("", artist)
+        song_title = remove_bad_chars.sub("", song_title)
+
+        # track_id = str(song_title) + '_track_' + str(track)
+        track_id = Database.track_id(song_title, track)
+
+        song_entry_info = []
+        song_entry_info.append(
+            [
+                "file.id",
+                "file.location",
+                "artist",
+                "song.title",
+                "track",
+                "measure.number",
+                "complexity",
+                "perceived.difficulty",
+                "unadorned.complexity",
+                "unadorned.perceived.difficulty",
+                "single.note",
+                "single.note.pitch",
+                "single.note.fret.number",
+                "single.note.string.number",
+                "single.note.duration",
+            ]
+        )
+
+        # Combine tied notes and sort the list back into bars:
+        note_list = calculate_tied_note_durations(api_song_data[track])
+        notes_in_measure = calculate_bars_from_note_list(
+            note_list, api_song_data[track]
+        )
+
+        # the features are calculated from the rhy file
+        # lines and note tables in memory:
+        feature_ids = []
+        measure_rhy_lines = {}
+        note_tables = []
+        two_note_features = []
+        chunk_features = {}
+
+        # Calculate the complexities for all the measures in the track:
+        track_complexities = calculate_playing_complexity_for_measures(
+            notes_in_measure,
+            api_song_data[track],
+            weight_set=weight_set,
+            unadorned_value=True,
+        )
+
+        for measure in api_song_data[track].measures:
+            measure_number = measure.meta_data.number - 1
+
+            # measure_id = track_id + '_bar_' + str(measure.meta_data.number)
+            measure_id = Database.measure_id(track_id, measure.meta_data.number)
+
+            if not Database.valid_measure(
+                measure=measure,
+                notes_in_measure=notes_in_measure[measure_number],
+                weight_set=weight_set,
+            ):
+                continue
+
+            single_note = False
+            note_pitch = 0
+            note_fret_number = -1
+            note_string_number = 0
+            note_duration = 0
+            if len(notes_in_measure[measure_number]) == 1:
+                print("single note measure")
+                single_note = True
+                note_pitch = notes_in_measure[measure_number][0].note.pitch
+                note_fret_number = notes_in_measure[measure_number][0].note.fret_number
+                note_string_number = notes_in_measure[measure_number][
+                    0
+                ].note.string_number
+                note_duration = float(notes_in_measure[measure_number][0].note.duration)
+
+            # The complexites for the measure:
+            if measure.meta_data.number not in track_complexities.adorned:
+                print("No complexity could be calculated for %s" % measure_id)
+                continue
+
+            database_file_location = file_name
+            # if convert_to_json and json_file is not None:
+            #    database_file_location = json_file
+
+            song_entry_info.append(
+                [
+                    measure_id,
+                    database_file_location,
+                    artist,
+                    song_title,
+                    track,
+                    measure.meta_data.number,
+                    track_complexities.adorned[measure.meta_data.number].BGM,
+                    track_complexities.adorned[measure.meta_data.number].EVC,
+                    track_complexities.unadorned[measure.meta_data.number].BGM,
+                    track_complexities.unadorned[measure.meta_data.number].EVC,
+                    single_note,
+                    note_pitch,
+                    note_fret_number,
+                    note_string_number,
+                    note_duration,
+                ]
+            )
+
+            # calculate the RHY file lines for the measure:
+            try:
+                rhy_lines = calculate_rhy_lines_for_measure(measure)
+            except ValueError:
+                print("Error making RHY file for %s" % measure_id)
+                continue
+
+            measure_rhy_lines[measure_id] = rhy_lines
+
+            # the features of the chunks of the measure for reuse:
+            chunk_features[measure_key(measure)] = calculate_measure_chunk_features(
+                measure, max_chunk_size
+            )
+
+            # see if the measure only has 2 notes:
+            if len(notes_in_measure[measure_number]) == 2:
+                tn_features = (
+                    feature_analysis.combine_synpy_and_fantastic_features_for_two_notes(
+                        measure,
+                        notes_in_measure[measure_number],
+                        rhy_lines,
+                        r_data_frame=False,
+                        save_table=False,
+                        file_id=measure_id,
+                    )
+                )
+                two_note_features.append(tn_features)
+
+            # calculate the note table FANTASTIC analyses for the measure:
+            note_table = calculate_note_table_for_measure_note_list(
+                notes_in_measure[measure_number], measure
+            )
+
+            feature_ids.append(measure_id)
+            note_tables.append(note_table)
+
+            if save_feature_files:
+                Database.save_feature_files(
+                    save_folder,
+                    track_id,
+                    measure_id,
+                    measure,
+                    notes_in_measure[measure_number],
+                    note_table,
+                )
+
+        # Then need to do feature analysis:
+        (
+            fantastic_features,
+            synpy_features,
+        ) = feature_analysis.compute_synpy_and_fantastic_features(
+            note_tables,
+            [measure_rhy_lines[feature_id] for feature_id in feature_ids],
+            feature_ids,
+        )
+
+        # then make the rows for the single and two note measures:
+        extra_rows = []
+        two_note_measures = [x[0] for x in two_note_features]
+        for row in song_entry_info[1:]:
+            if row[10] is True:
+                print("single_note")
+                print(row[0])
+
+                # make some dummy fantastic data:
+                dummy_fantastic_data = []
+                for fantastic_feature in feature_analysis.fantastic.feature_names:
+                    if fantastic_feature == "len":
+                        dummy_fantastic_data.append(1)
+                    elif fantastic_feature == "d.mode":
+                        dummy_fantastic_data.append(row[-1])
+                    elif fantastic_feature == "d.median":
+                        dummy_fantastic_data.append(row[-1])
+                    else:
+                        dummy_fantastic_data.append(0)
+
+                if row[0] in measure_rhy_lines:
+                    print("rhy file exists")
+                    synpy_data = (
+                        feature_analysis.synpy_interface.compute_features_for_rhy_lines(
+                            measure_rhy_lines[row[0]], row[0]
+                        )[1:]
+                    )
+                    extra_rows.append(row + dummy_fantastic_data + synpy_data)
+
+            elif row[0] in two_note_measures:
+                print("Two note measure...")
+                # its a two note measure
+                tn_data = two_note_features[two_note_measures.index(row[0])]
+                two_note_fantastic_features = [
+                    "p.range",
+                    "p.entropy",
+                    "p.std",
+                    "i.abs.mean",
+                    "i.abs.std",
+                    "i.mode",
+                    "i.entropy",
+                    "d.range",
+                    "d.median",
+                    "d.mode",
+                    "d.entropy",
+                    "len",
+                    "glob.duration",
+                    "note.dens",
+                ]
+                # make some dummy fantastic data:
+                dummy_fantastic_data = []
+                for fantastic_feature in feature_analysis.fantastic.feature_names:
+                    if fantastic_feature in two_note_fantastic_features:
+                        dummy_fantastic_data.append(
+                            tn_data[
+                                two_note_fantastic_features.index(fantastic_feature) + 1
+                            ]
+                        )
+                    else:
+                        dummy_fantastic_data.append(0)
+                extra_rows.append(row + dummy_fantastic_data + tn_data[-7:])
+
+        track_entries.append(
+            TrackEntry(
+                track_id=track_id,
+                song_entry_info=song_entry_info,
+                fantastic_features=fantastic_features,
+                synpy_features=synpy_features,
+                extra_rows=extra_rows,
+                chunk_features=chunk_features,
+            )
+        )
+
+    return track_entries
@@ -1,6 +1,9 @@
 from collections import namedtuple
 import warnings
 
+# 3rd party imports
+import numpy as np
+
 from ..parser.API.datatypes import Measure, AdornedNote
 from ..parser.API.calculate_functions import calculate_heuristic
 
@@ -18,6 +21,8 @@ def retrieval(
     **retrieval_parameters
 ):
     """Retrieve the database entry that closest matches the measure input.
+    To retrieve the entries for all the measures of a song with one
+    similarity query use Database.retrieve_many.
 
     Parameters
     ---------
@@ -84,8 +89,30 @@ def retrieval(
         exclude_files=retrieval_parameters.get("exclude_files", ["none"]),
     )
 
+    return select_candidates(
+        candidate_set, database, complexity_weight, difficulty_weight, method
+    )
+
+
+def select_candidates(
+    candidate_set,
+    database,
+    complexity_weight,
+    difficulty_weight,
+    method="all",
+    reload=True,
+):
+    """Sort the candidate_set and retrieve the selected candidates,
+    see retrieval for the method. Set reload False if the database
+    has already been loaded, see Database.candidate_complexities.
+
+    Returns
+    ------
+    list of namedtuples
+        a list of Retrieved tuples, or None if there are no candidates
+    """
     sorted_candidates = database.sort_candidate_set(
-        candidate_set, complexity_weight, difficulty_weight
+        candidate_set, complexity_weight, difficulty_weight, reload=reload
     )
 
     # check there are candidates:
@@ -142,41 +169,110 @@ def retrieve_candidate_data(selected_candidates, database):
     return retrieved_measures
 
 
-"""
-def sort_candidate_set(candidate_set, database, complexity_weight,
-                       difficulty_weight):
-    sorted_candidates = []
+def sort_candidate_set(
+    candidate_set, database, complexity_weight, difficulty_weight, adorned=True
+):
+    """Sort the candidate ids by the heuristic, see
+    Database.sort_candidate_set
+    """
+    return database.sort_candidate_set(
+        candidate_set, complexity_weight, difficulty_weight, adorned
+    )
 
-    # load the database:
-    database.load()
 
-    complexity_index = database.header.index('complexity')
-    difficulty_index = database.header.index("perceived.difficulty")
+def rank_candidates(complexities, difficulties, complexity_weight, difficulty_weight):
+    """Order the candidates by the heuristic, largest first, in the
+    same order as the old insertion sort with calculate_heuristic.
 
-    # sort the candidate ids by the heuristic:
-    for candidate_id in candidate_set:
-        candidate_entry = database.data.get(candidate_id)
+    calculate_heuristic is linear, so each candidate gets the score
+    complexity * complexity_weight + difficulty * difficulty_weight
+    and the scores are sorted. Candidates with the same score are put
+    in reverse order, which is the order the insertion sort gave.
+    Scores that are closer than their rounding error can compare
+    differently to calculate_heuristic, so the runs of them are
+    re-sorted with the insertion sort.
 
-        index = 0
-        for sorted_candidate in sorted_candidates:
-            heuristic = calculate_heuristic(
-                float(candidate_entry[complexity_index]),
-                float(sorted_candidate.complexity),
-                float(candidate_entry[difficulty_index]),
-                float(sorted_candidate.difficulty), complexity_weight,
-                difficulty_weight)
-            if heuristic >= 0:
-                break
-            index += 1
-        sorted_candidates.insert(
-            index,
-            candidate(
-                complexity=float(candidate_entry[complexity_index]),
-                difficulty=float(candidate_entry[difficulty_index]),
-                id=candidate_id))
+    Parameters
+    ---------
+    complexities, difficulties : lists or numpy arrays of floats
 
-    return sorted_candidates
-"""
+    complexity_weight, difficulty_weight : {-1.0 - 1.0}
+
+    Returns
+    ------
+    numpy array
+        the indexes of the candidates in sorted order
+    """
+    complexities = np.asarray(complexities, dtype=np.float64)
+    difficulties = np.asarray(difficulties, dtype=np.float64)
+    scores = complexities * complexity_weight + difficulties * difficulty_weight
+
+    order = np.lexsort((-np.arange(len(scores)), -scores))
+
+    # candidates whose scores are further apart than this compare
+    # the same with calculate_heuristic as with the scores:
+    tolerance = (
+        8
+        * np.finfo(np.float64).eps
+        * np.max(
+            np.abs(complexities * complexity_weight)
+            + np.abs(difficulties * difficulty_weight),
+            initial=0,
+        )
+    )
+    close = np.diff(scores[order]) >= -tolerance
+    complexity_list = complexities.tolist()
+    difficulty_list = difficulties.tolist()
+
+    start = 0
+    while start < len(close):
+        if not close[start]:
+            start += 1
+            continue
+        end = start
+        while end < len(close) and close[end]:
+            end += 1
+
+        # insertion sort the run, in the order the candidates were given:
+        run = []
+        for index in sorted(order[start : end + 1]):
+            position = 0
+            for ranked_index in run:
+                if (
+                    calculate_heuristic(
+                        complexity_list[index],
+                        complexity_list[ranked_index],
+                        difficulty_list[index],
+                        difficulty_list[ranked_index],
+                        complexity_weight,
+                        difficulty_weight,
+                    )
+                    >= 0
+                ):
+                    break
+                position += 1
+            run.insert(position, index)
+        order[start : end + 1] = run
+        start = end + 1
+
+    return order
+
+
+def sort_candidates(
+    candidate_ids, complexities, difficulties, complexity_weight, difficulty_weight
+):
+    """Returns a list of candidate tuples sorted by the heuristic"""
+    order = rank_candidates(
+        complexities, difficulties, complexity_weight, difficulty_weight
+    )
+    return [
+        candidate(
+            complexity=float(complexities[i]),
+            difficulty=float(difficulties[i]),
+            id=candidate_ids[i],
+        )
+        for i in order
+    ]
 
 
 def pick_top_candidate_ids(sorted_candidates, top_n):
@@ -188,27 +284,58 @@ def pick_top_candidate_ids(sorted_candidates, top_n):
 
 def consolidate_same_complexity_difficulty(sorted_candidates):
 
-    top_candidates = [
+    return consolidate_sorted_candidates(
+        [s_c.complexity for s_c in sorted_candidates],
+        [s_c.difficulty for s_c in sorted_candidates],
+        [s_c.id for s_c in sorted_candidates],
+    )
+
+
+def consolidate_sorted_candidates(complexities, difficulties, candidate_ids):
+    """Group runs of sorted candidates that have the same
+    complexity and difficulty into one candidate with a list of ids.
+
+    Parameters
+    ---------
+    complexities, difficulties : lists or numpy arrays of floats
+        in sorted order
+
+    candidate_ids : list
+        the ids of the candidates, in the same order
+
+    Returns
+    ------
+    list of candidate tuples
+    """
+    if len(candidate_ids) == 0:
+        return []
+
+    complexity_values = list(complexities)
+    difficulty_values = list(difficulties)
+    complexities = np.asarray(complexities, dtype=np.float64)
+    difficulties = np.asarray(difficulties, dtype=np.float64)
+
+    # the first candidate in each group:
+    group_starts = np.flatnonzero(
+        np.concatenate(
+            [
+                [True],
+                (complexities[1:] != complexities[:-1])
+                | (difficulties[1:] != difficulties[:-1]),
+            ]
+        )
+    )
+    group_ends = np.append(group_starts[1:], len(complexities))
+
+    return [
         candidate(
-            sorted_candidates[0].complexity,
-            sorted_candidates[0].difficulty,
-            [sorted_candidates[0].id],
+            complexity_values[start],
+            difficulty_values[start],
+            [candidate_ids[i] for i in range(start, end)],
         )
+        for start, end in zip(group_starts, group_ends)
     ]
 
-    top_count = 0
-    for s_c in sorted_candidates[1:]:
-
-        if (
-            s_c.complexity == top_candidates[top_count].complexity
-            and s_c.difficulty == top_candidates[top_count].difficulty
-        ):
-            top_candidates[top_count].id.append(s_c.id)
-        else:
-            top_candidates.append(candidate(s_c.complexity, s_c.difficulty, [s_c.id]))
-            top_count += 1
-    return top_candidates
-
 
 def select_top_n_consolidated(consolidated_candidates, top_n):
 
@@ -18,11 +18,15 @@ from ..parser.API import calculate_functions as calculate
 from ..parser.API.read_functions import read_basic_note_data
 from ..parser.API.datatypes import *
 from ..parser.API import update_functions as update
+from ..parser.API import incremental_complexity
 from ..parser import utilities
 from .. import feature_analysis
 from ..evaluation import musiplectics
 from .. import cbr
-from functools import reduce
+from . import chunk_features
+from .chunk_features import chunk_up_a_measure
+from functools import reduce, partial
+from concurrent.futures import ProcessPoolExecutor
 
 SelectedAdornedMeasure = namedtuple("SelectedAdornedMeasure",
                                     ['measure', 'complexity'])
@@ -34,7 +38,9 @@ def reuse(unadorned_measure,
           complexity_weight,
           difficulty_weight,
           weight_set='RD',
-          gp5_wellformedness=True):
+          gp5_wellformedness=True,
+          workers=1,
+          chunk_feature_store=None):
     """ Apply the adornments from the adorned measure
     to the unadorned measure
 
@@ -51,11 +57,25 @@ def reuse(unadorned_measure,
         +ve numbers mean the value is maximised.
         -ve the value is minimised.
 
+    weight_set : str or musiplectics.WeightSet
+        The musiplectics weight set used to calculate the complexity
+        of the possible adornments.
+
     gp5_wellformedness : boolean
         Set True to restrict the adornments to be wellformed for gp5
         file format. Set False to allow for any possible combination
         following the bass playing ontology.
 
+    workers : int
+        number of processes used to make the newly adorned measures
+        from the adorned_measures, see reuse_measures. The measure is
+        selected from them in the same order either way, so the same
+        measure is selected (ties go to the later measure).
+
+    chunk_feature_store : cbr.chunk_features.ChunkFeatureStore, optional
+        the chunk features of the database measures
+        (database.chunk_features), see reuse_measures.
+
     Returns
     ------
     new_adorned_measure : SelectedAdornedMeasure
@@ -75,29 +95,37 @@ def reuse(unadorned_measure,
         complexity_weight=complexity_weight,
         difficulty_weight=difficulty_weight,
         weight_set=weight_set,
-        chunk_size=3)
+        chunk_size=3,
+        workers=workers,
+        chunk_feature_store=chunk_feature_store)
 
     #print("possible measures:", len(new_adorned_measures))
 
     print("selecting_measure...")
+
+    # The measures only differ in the adornments of their notes,
+    # so the complexity is updated from one measure to the next,
+    # only working out the weights of the notes that have changed:
+    measure_complexity = None
+
     selected_newly_adorned_measure = None
     for measure in new_adorned_measures:
 
         assert len(measure.notes) == len(unadorned_measure_notes)
 
-        if selected_newly_adorned_measure is None:
-            measure_complexities = calculate.calculate_playing_complexity(
-                measure, song=None, by_bar=False, weight_set=weight_set)
+        if measure_complexity is None:
+            measure_complexity = incremental_complexity.IncrementalComplexity(
+                measure, weight_set=weight_set)
+        else:
+            measure_complexity.update(measure)
+        measure_complexities = measure_complexity.complexity()
 
+        if selected_newly_adorned_measure is None:
             selected_newly_adorned_measure = SelectedAdornedMeasure(
                 measure, measure_complexities)
         else:
             #print('comparing heuristics...')
 
-            # Calculate the complexites for the measure:
-            measure_complexities = calculate.calculate_playing_complexity(
-                measure, song=None, by_bar=False, weight_set=weight_set)
-
             #print(measure_complexities)
 
             assert measure_complexities is not None, "No measure complexities calculated"
@@ -154,81 +182,168 @@ def reuse_measures(unadorned_measure,
                    difficulty_weight,
                    weight_set,
                    chunk_size=3,
-                   gp5_wellformedness=True):
+                   gp5_wellformedness=True,
+                   workers=1,
+                   chunk_feature_store=None):
+    """ Make a newly adorned measure from each of the adorned_measures,
+    see reuse_adorned_measure.
+
+    Parameters
+    ---------
+    workers : int
+        number of processes used to make the newly adorned measures,
+        each process makes the measures of some of the adorned_measures.
+        The measures are returned in the order of adorned_measures
+        either way, so the result is the same as with one process.
+        The workers only match the chunks in memory (see
+        match_up_unadorned_measure_chunks_with_adorned_chunk_features),
+        they don't use R or write any files, so they can't clash.
+
+    chunk_feature_store : cbr.chunk_features.ChunkFeatureStore, optional
+        the chunk features of the database measures, the features of
+        the chunks of adorned_measures that are in it are looked up,
+        the rest are calculated.
+
+    Returns
+    ------
+    new_measures : list of Measure
+        The different newly adorned measures, in the order of
+        the adorned_measures they were made from.
+    """
+
+    reuse_measure = partial(
+        reuse_adorned_measure,
+        unadorned_measure,
+        unadorned_measure_notes,
+        complexity_weight=complexity_weight,
+        difficulty_weight=difficulty_weight,
+        weight_set=weight_set,
+        chunk_size=chunk_size,
+        gp5_wellformedness=gp5_wellformedness)
+
+    adorned_measures = list(adorned_measures)
+    if chunk_feature_store is None:
+        adorned_chunk_features = [None] * len(adorned_measures)
+    else:
+        adorned_chunk_features = [
+            chunk_feature_store.get(adorned_measure)
+            for adorned_measure in adorned_measures
+        ]
 
     new_measures = []
 
-    for adorned_measure in adorned_measures:
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for new_measure in executor.map(
+                    reuse_measure,
+                    adorned_measures,
+                    adorned_chunk_features,
+                    chunksize=max(1, len(adorned_measures) // (4 * workers))):
+                if new_measure not in new_measures:
+                    new_measures.append(new_measure)
+        return new_measures
+
+    for adorned_measure, measure_chunk_features in zip(
+            adorned_measures, adorned_chunk_features):
+        new_measure = reuse_measure(adorned_measure, measure_chunk_features)
+
+        if new_measure not in new_measures:
+            new_measures.append(new_measure)
+
+        del new_measure
 
-        chunks = match_up_unadorned_measure_chunks_with_adorned_measure_chunks(
-            unadorned_measure=unadorned_measure,
-            unadorned_measure_notes=unadorned_measure_notes,
-            adorned_measure=adorned_measure,
-            chunk_size=chunk_size)
+    return new_measures
 
-        assert len(chunks) == 2
 
-        matches = consolidate_note_sequnces_matches_to_note_matches(
-            chunks[0], chunks[1])
+def reuse_adorned_measure(unadorned_measure,
+                          unadorned_measure_notes,
+                          adorned_measure,
+                          adorned_chunk_features,
+                          complexity_weight,
+                          difficulty_weight,
+                          weight_set,
+                          chunk_size=3,
+                          gp5_wellformedness=True):
+    """ Adorn the notes of the unadorned_measure with the best
+    adornments from the matching notes of the adorned_measure,
+    this is run by the worker processes in reuse_measures.
+
+    Parameters
+    ---------
+    adorned_chunk_features : dict or None
+        the ChunkFeatures of the adorned_measure for each chunk size,
+        the features are calculated if None, see
+        match_up_unadorned_measure_chunks_with_adorned_chunk_features.
+
+    Returns
+    ------
+    new_measure : Measure
+        The revised newly adorned measure.
+    """
 
-        best_note_newly_adorned_notes = []
-        for matched in matches:
+    chunks = match_up_unadorned_measure_chunks_with_adorned_chunk_features(
+        unadorned_measure=unadorned_measure,
+        unadorned_measure_notes=unadorned_measure_notes,
+        adorned_measure=adorned_measure,
+        adorned_chunk_features=adorned_chunk_features,
+        chunk_size=chunk_size)
 
-            #print(matched.unadorned_note)
-            #print(len(matched.adorned_notes))
-            print(unadorned_measure.meta_data.number)
-            print(matched.unadorned_note.note.note_number)
+    assert len(chunks) == 2
 
-            adornments = find_all_possible_adornements(
-                matched.unadorned_note, matched.adorned_notes,
-                unadorned_measure, adorned_measure)
+    matches = consolidate_note_sequnces_matches_to_note_matches(
+        chunks[0], chunks[1])
 
-            pos_adornments = make_all_possible_adornments(
-                adornments.plucking_accents, adornments.fretting_accents,
-                adornments.plucking_techniques,
-                adornments.plucking_modifications_ah,
-                adornments.plucking_modifications_palm_mute,
-                adornments.fretting_techniques,
-                adornments.fretting_modifications_type,
-                adornments.fretting_modifications_let_ring,
-                adornments.fretting_modulations_bend,
-                adornments.fretting_modulations_trill,
-                adornments.fretting_modulations_vib,
-                adornments.fretting_modulations_slide, adornments.grace_notes,
-                adornments.ghost_notes, complexity_weight, difficulty_weight,
-                gp5_wellformedness)
+    best_note_newly_adorned_notes = []
+    for matched in matches:
 
-            best_note = select_best_adornment_for_unadorned_note(
-                matched.unadorned_note, pos_adornments, adornments.dynamics,
-                unadorned_measure, complexity_weight, difficulty_weight,
-                weight_set)
+        #print(matched.unadorned_note)
+        #print(len(matched.adorned_notes))
+        print(unadorned_measure.meta_data.number)
+        print(matched.unadorned_note.note.note_number)
 
-            best_note_newly_adorned_notes.append(best_note)
+        adornments = find_all_possible_adornements(
+            matched.unadorned_note, matched.adorned_notes, unadorned_measure,
+            adorned_measure)
 
-            # Delete the adornments:
-            del adornments, best_note
+        pos_adornments = partial(
+            generate_possible_adornments,
+            adornments.plucking_accents, adornments.fretting_accents,
+            adornments.plucking_techniques,
+            adornments.plucking_modifications_ah,
+            adornments.plucking_modifications_palm_mute,
+            adornments.fretting_techniques,
+            adornments.fretting_modifications_type,
+            adornments.fretting_modifications_let_ring,
+            adornments.fretting_modulations_bend,
+            adornments.fretting_modulations_trill,
+            adornments.fretting_modulations_vib,
+            adornments.fretting_modulations_slide, adornments.grace_notes,
+            adornments.ghost_notes, complexity_weight, difficulty_weight,
+            gp5_wellformedness)
 
-        #assert len(best_note_newly_adorned_notes) == len(
-        #    calculate.calculate_tied_note_durations(unadorned_measure))
+        best_note = select_best_adornment_for_unadorned_note(
+            matched.unadorned_note, pos_adornments, adornments.dynamics,
+            unadorned_measure, complexity_weight, difficulty_weight,
+            weight_set)
 
-        assert  len(best_note_newly_adorned_notes) == len(unadorned_measure_notes)
+        best_note_newly_adorned_notes.append(best_note)
 
-        # put the best newly adorned notes back in the measure:
-        new_measure = Measure(
-            meta_data=unadorned_measure.meta_data,
-            start_time=unadorned_measure.start_time,
-            notes=best_note_newly_adorned_notes)
+        # Delete the adornments:
+        del adornments, best_note
 
-        # revise the measure:
-        new_measure = cbr.revise(
-            new_measure, revise_for_gp5=gp5_wellformedness)
+    #assert len(best_note_newly_adorned_notes) == len(
+    #    calculate.calculate_tied_note_durations(unadorned_measure))
 
-        if new_measure not in new_measures:
-            new_measures.append(new_measure)
+    assert  len(best_note_newly_adorned_notes) == len(unadorned_measure_notes)
 
-        del new_measure, best_note_newly_adorned_notes, matches, chunks
+    # put the best newly adorned notes back in the measure:
+    new_measure = Measure(
+        meta_data=unadorned_measure.meta_data,
+        start_time=unadorned_measure.start_time,
+        notes=best_note_newly_adorned_notes)
 
-    return new_measures
+    # revise the measure:
+    return cbr.revise(new_measure, revise_for_gp5=gp5_wellformedness)
 
 
 '''""
@@ -664,64 +779,6 @@ def find_note_sequences(list_of_notes):
     return sequences
 
 
-def chunk_up_a_measure(measure_or_notes_from_measure, chunk_size=3):
-    """Break up a measure into chunks of AdornedNotes
-
-    """
-
-    if isinstance(measure_or_notes_from_measure, Measure):
-        # get all the notes and tie together tied notes:
-        notes = calculate.calculate_tied_note_durations(
-            measure_or_notes_from_measure)
-
-    if isinstance(measure_or_notes_from_measure, list):
-        for n in measure_or_notes_from_measure:
-            assert isinstance(n, AdornedNote)
-        notes = measure_or_notes_from_measure
-
-    # break the adorned measure into smaller chunks
-    chunks = []
-    last_note_added_to_a_chunk = False
-    for note in notes:
-
-        # check the note is not a rest:
-        if isinstance(note, Rest):
-            # if so continue:
-            continue
-
-        if last_note_added_to_a_chunk:
-            # Reached the last note in the measure
-            # so break
-            break
-
-        # start a new chunk:
-        chunk = [note]
-
-        for next_note in notes[notes.index(note)::]:
-            if len(chunk) >= chunk_size:
-                # start a new chunk:
-                chunks.append(chunk)
-                break
-            # check the note is not a rest:
-            if isinstance(next_note, Rest):
-                # if so continue:
-                continue
-
-            # skip the starting note of the chunk:
-            if next_note in chunk:
-                continue
-
-            chunk.append(next_note)
-
-            if next_note == notes[-1]:
-                last_note_added_to_a_chunk = True
-
-        if chunk not in chunks:
-            chunks.append(chunk)
-
-    return chunks
-
-
 def analyse_chunk(chunk, measure, chunk_id="chunk"):
     """Analyses the chunk from the measure
     with FANTASTIC and SynPy
@@ -1118,6 +1175,131 @@ def match_up_unadorned_measure_chunks_with_adorned_measure_chunks(
     return [mua_a[0] for mua_a in matched_unadorned_and_adorned_chunks], [mua_a[1] for mua_a in matched_unadorned_and_adorned_chunks]
 
 
+def match_up_unadorned_measure_chunks_with_adorned_chunk_features(
+        unadorned_measure,
+        unadorned_measure_notes,
+        adorned_measure,
+        adorned_chunk_features=None,
+        chunk_size=3):
+    """Match up each chunk of the unadorned measure with the most
+    similar chunks of the adorned measure, as
+    match_up_unadorned_measure_chunks_with_adorned_measure_chunks but
+    with the features of the chunks calculated in memory and compared
+    with NumPy (see cbr.chunk_features), so no R or files are used.
+    The unadorned chunks of each size are matched together, with one
+    (unadorned chunks x adorned chunks) similarity matrix.
+
+    Parameters
+    ---------
+    adorned_chunk_features : dict, optional
+        the ChunkFeatures of the chunks of the adorned measure for
+        each chunk size, from the database's ChunkFeatureStore. The
+        features of chunk sizes that aren't in it are calculated.
+
+    Returns
+    ------
+    unadorned chunks, list of the matching adorned chunks for each
+    """
+
+    assert isinstance(unadorned_measure,
+                      Measure), "unadorned_measure must be a Measure"
+    assert isinstance(adorned_measure,
+                      Measure), "adorned_measure must be a Measure"
+
+    if adorned_chunk_features is None:
+        adorned_chunk_features = {}
+
+    # find what is smallest:
+    chunk_size = min([
+        len(unadorned_measure_notes),
+        len(calculate.calculate_tied_note_durations(adorned_measure)),
+        chunk_size
+    ])
+
+    print("chunksize:", chunk_size)
+    assert chunk_size > 0
+
+    unadorned_chunks = chunk_up_a_measure(unadorned_measure_notes, chunk_size)
+
+    # the adorned chunks and their features for each chunk size:
+    adorned_chunks = {}
+
+    def most_similar_adorned_chunks(unadorned_chunks_to_match):
+        """The most similar adorned chunks for each of the unadorned
+        chunks, all the chunks of one size are compared in one go.
+        """
+        matches = [[] for unadorned_chunk in unadorned_chunks_to_match]
+        for c_size in sorted(
+                set([len(chunk) for chunk in unadorned_chunks_to_match])):
+            if c_size not in adorned_chunks:
+                chunks = chunk_up_a_measure(adorned_measure, c_size)
+                features = adorned_chunk_features.get(c_size)
+                if features is None:
+                    features = chunk_features.calculate_chunk_features(
+                        chunks, adorned_measure, c_size)
+                adorned_chunks[c_size] = (chunks, features)
+
+            chunks, features = adorned_chunks[c_size]
+            indexes = [
+                index for index, chunk in enumerate(unadorned_chunks_to_match)
+                if len(chunk) == c_size
+            ]
+            queries = chunk_features.calculate_chunk_features(
+                [unadorned_chunks_to_match[index] for index in indexes],
+                unadorned_measure, c_size)
+            for query_index, chunk_indexes in zip(
+                    queries.chunk_indexes,
+                    chunk_features.most_similar_chunks(queries, features)):
+                matches[indexes[query_index]] = [
+                    chunks[chunk_index] for chunk_index in chunk_indexes
+                ]
+        return matches
+
+    chunk_matches = iter(
+        most_similar_adorned_chunks(
+            [chunk for chunk in unadorned_chunks if len(chunk) > 1]))
+    unadorned_chunk_matches = [
+        next(chunk_matches) if len(chunk) > 1 else []
+        for chunk in unadorned_chunks
+    ]
+
+    # work out similarity based off of 2 note chunks for
+    # the longer chunks that don't have a match:
+    two_note_chunks = [[[unadorned_note1, unadorned_note2]
+                        for unadorned_note1, unadorned_note2 in zip(
+                            chunk[::], chunk[1::])]
+                       if len(chunk) > 2 and matches == [] else []
+                       for chunk, matches in zip(unadorned_chunks,
+                                                 unadorned_chunk_matches)]
+    two_note_chunk_matches = iter(
+        most_similar_adorned_chunks(
+            [chunk for chunks in two_note_chunks for chunk in chunks]))
+
+    matched_unadorned_and_adorned_chunks = []
+    for unadorned_chunk, most_similar_chunks, new_2_note_unadorned_chunks in zip(
+            unadorned_chunks, unadorned_chunk_matches, two_note_chunks):
+        if most_similar_chunks != []:
+            matched_unadorned_and_adorned_chunks.append(
+                (unadorned_chunk, most_similar_chunks))
+            continue
+
+        if len(unadorned_chunk) > 2:
+            for new_2_note_unadorned_chunk in new_2_note_unadorned_chunks:
+                matched_unadorned_and_adorned_chunks.append(
+                    (new_2_note_unadorned_chunk, next(two_note_chunk_matches)))
+            continue
+
+        # single notes (and 2 note chunks that can't be
+        # analysed) are matched note by note:
+        for unadorned_note in unadorned_chunk:
+            matched_unadorned_and_adorned_chunks.append(
+                ([unadorned_note],
+                 find_most_similar_notes([unadorned_note], adorned_measure)))
+
+    del unadorned_chunks, adorned_chunks
+    return [mua_a[0] for mua_a in matched_unadorned_and_adorned_chunks], [mua_a[1] for mua_a in matched_unadorned_and_adorned_chunks]
+
+
 def analyse_two_note_chunk(chunk, chunk_id, measure):
     chunk_FANTASTIC_features = calculate.calculate_FANTASTIC_features_for_note_pair(
         chunk[0], chunk[1], measure)
@@ -1534,6 +1716,10 @@ def adorn_unadorned_note(unadorned_note,
         +ve numbers mean the value is maximised.
         -ve the value is minimised.
 
+    weight_set : str or musiplectics.WeightSet
+        The musiplectics weight set used to calculate the complexity
+        of the possible adornments.
+
     gp5_wellformedness : boolean
         Set True to restrict the adornments to be wellformed for gp5
         file format. Set False to allow for any possible combination
@@ -1554,7 +1740,8 @@ def adorn_unadorned_note(unadorned_note,
 
     pa = find_all_possible_adornements(unadorned_note, adorned_notes,
                                        unadorned_measure, adorned_measure)
-    possible_adornments = make_all_possible_adornments(
+    possible_adornments = partial(
+        generate_possible_adornments,
         pa.plucking_accents,
         pa.fretting_accents,
         pa.plucking_techniques,
@@ -1584,393 +1771,332 @@ def adorn_unadorned_note(unadorned_note,
 def select_best_adornment_for_unadorned_note(
         unadorned_note, possible_adornments, possible_dynamics,
         unadorned_measure, complexity_weight, difficulty_weight, weight_set):
+    """Select the best combination of the possible adornments and
+    dynamics for the unadorned note.
+
+    Each combination is compared to the one selected so far and is
+    selected if it is as good or better, using the complexity_weight
+    and difficulty_weight (see adorn_unadorned_note).
+
+    The complexity and difficulty of a note only go up as its
+    technique, expression, articulation and dynamic weights go up, so
+    the score (complexity_weight x complexity + difficulty_weight x
+    difficulty) of a group of combinations is bounded by the scores
+    with the smallest and largest of these weights in the group.
+    Groups that can't be selected are skipped: the dynamics of an
+    adornment, and when possible_adornments is a function, the parts
+    of generate_possible_adornments that are left after the
+    techniques or accents of the adornments are chosen (adornments
+    with grace notes aren't bounded, the grace note is a note too).
+
+    Parameters
+    ---------
+    possible_adornments : iterable of Adornments, or function
+        can be a generator (see generate_possible_adornments), or a
+        function that is passed the bound keyword argument of
+        generate_possible_adornments and returns the adornments
+
+    possible_dynamics : list of Dynamics
+
+    Returns
+    -------
+    AdornedNote
+    """
 
     unadorned_note_in = unadorned_note
     unadorned_note = unadorned_note.note
 
-    print('possible notes: ',
-          len(possible_adornments) * len(possible_dynamics))
-
     selected = namedtuple("Selected",
                           ["newly_adorned_note", 'complexity', "difficulty"])
     selected_newly_adorned_note = None
-    for adornment in possible_adornments:
-        # work out what one to pick here.....
-        #print(adornment)
-        # need to update the dynamic in unadorned_note...
-        for d in possible_dynamics:
-            #print("with dynamic added")
-            dynamic_unadorned_note = Note(
-                note_number=unadorned_note.note_number,
-                pitch=unadorned_note.pitch,
-                fret_number=unadorned_note.fret_number,
-                string_number=unadorned_note.string_number,
-                string_tuning=unadorned_note.string_tuning,
-                start_time=unadorned_note.start_time,
-                duration=unadorned_note.duration,
-                notated_duration=unadorned_note.notated_duration,
-                dynamic=d)
-            #print(AdornedNote(dynamic_unadorned_note, adornment))
-
-            adorned_note = AdornedNote(dynamic_unadorned_note, adornment)
-
-            # some quick checks:
-            assert isinstance(adorned_note.adornment.fretting.modulation,
-                              Modulation), "Modulation adornment is wrong"
-
-            ####################################
-
-            # calculating musiplectic stuff:
-            # Check for the weight set:
-            if weight_set == 'GM':
-                use_geometric_mean = True
-                use_total_playing_time = False
-                log_scale_values = False
-            if weight_set == 'GMS':
-                use_geometric_mean = True
-                use_total_playing_time = False
-                log_scale_values = True
-            if weight_set == 'GMT':
-                use_geometric_mean = True
-                use_total_playing_time = True
-                log_scale_values = False
-            if weight_set == 'GMTS':
-                use_geometric_mean = True
-                use_total_playing_time = True
-                log_scale_values = False
-            if weight_set == 'RD':
-                use_geometric_mean = False
-                use_total_playing_time = False
-                log_scale_values = False
-            if weight_set == 'RDT':
-                use_geometric_mean = False
-                use_total_playing_time = True
-                log_scale_values = False
-
-            assert isinstance(use_geometric_mean, bool)
-            assert isinstance(use_total_playing_time, bool)
-            assert isinstance(log_scale_values, bool)
-
-            # set some default values:
-
-            playing_technique_complexity = 0
-            duration_tempo_complexity = 0
-            time_sig_complexity = 0
-            bpm_complexity = 0
-            expressive_techniques_complexity = 0
-            articulations_accents_complexity = 0
-            dynamics_complexity = 0
-            key_sig_complexity = 0
-            fret_playing_postion_complexity = 0
-            shift_distance_complexity = 0
-            note_playing_complexity = 0
-
-            interval_complexity = 0
-            interval_ioi_complexity = 0
-            shift_distance_complexity = 0
-            interval_dynamic_complexity = 0
-            interval_fret_position_complexity = 0
-            interval_expression_complexity = 0
-
-            # get measure stuff:
-            time_sig = unadorned_measure.meta_data.time_signature
-            bpm = unadorned_measure.meta_data.tempo
-            key_sig = unadorned_measure.meta_data.key_signature
-
-            playing_techniques = calculate.calculate_musiplectic_techniques(
-                adorned_note)
-            '''
-            if adorned_note.note.duration == 0:
-                if adorned_note.note.notated_duration.value != 0:
-                    rt_duration = calculate_realtime_duration(
-                        adorned_note.note.notated_duration.value, bpm)
-            else:
-            '''
-
-            # first see if there is a grace_note:
-            previous_note = None
-            new_adorned_note = adorned_note
-
-            #if adorned_note.adornment.grace_note is not None:
-            #    #print("grace_note!")
-            #    adorned_note_list = calculate.calculate_grace_note_possitions(
-            #        [adorned_note])
-            #    previous_note = grace_note_list[0]
-            #    adorned_note = grace_note_list[1]
-
-            adorned_note_list = calculate.calculate_grace_note_possitions(
-                [adorned_note])
-
-            for adorned_note in adorned_note_list:
-                ## Techniques:
-                rt_duration = calculate.calculate_realtime_duration(
-                    adorned_note.note.duration, bpm)
-                #duration_tempo = calculate_musiplectics_duration(adorned_note, bpm)
-                expressive_techniques = calculate.calculate_musiplectic_expression(
-                    adorned_note)
-                articulations_accents = calculate.calculate_musiplectic_articulations(
-                    adorned_note)
-                dynamic = calculate.calculate_musiplectic_dynamic(adorned_note)
-                fret_playing_postion = calculate.calculate_musiplectic_fret_possition(
-                    adorned_note)
-
-                # calculate the complexity values from note info:
-
-                # variable to keep track of the complexity scores for techniques
-                # in this note, used to calculate the full complexity score.
-                playing_technique_note_scores = []
-
-                for playing_technique in playing_techniques:
-                    # updated the playing technique complexity
-                    # playing_technique_complexity += musiplectics.technique_scores(
-                    # ).get(playing_technique)
-                    # and add the scores to the note score list
-                    playing_technique_note_scores.append(
-                        musiplectics.technique_weights(
-                            use_geometric_mean=use_geometric_mean,
-                            use_total_playing_time=use_total_playing_time,
-                            log_scale_values=log_scale_values).get(
-                                playing_technique))
-
-                playing_technique_complexity += reduce(
-                    mul, playing_technique_note_scores)
-
-                duration_tempo_score = musiplectics.duration_complexity_polynomial(
-                    rt_duration,
-                    use_geometric_mean=use_geometric_mean,
-                    use_total_playing_time=use_total_playing_time,
-                    log_scale_values=log_scale_values)
-                duration_tempo_complexity += duration_tempo_score
-
-                time_sig_score = musiplectics.time_sig_weights(
-                    use_geometric_mean=use_geometric_mean,
-                    use_total_playing_time=use_total_playing_time,
-                    log_scale_values=log_scale_values).get(time_sig)
-
-                time_sig_complexity += time_sig_score
-
-                bpm_list = sorted(
-                    musiplectics.tempo_weights(
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values)[0].keys())
-
-                bpm_musiplectic = calculate.calculate_closest_value(
-                    bpm_list, bpm)
-
-                bpm_score = musiplectics.tempo_weights(
-                    use_geometric_mean=use_geometric_mean,
-                    use_total_playing_time=use_total_playing_time,
-                    log_scale_values=log_scale_values)[0].get(
-                        int(bpm_musiplectic))
-
-                bpm_complexity += bpm_score
-
-                expressive_techniques_score = []
-                for expressive_technique in expressive_techniques:
-                    expressive_techniques_score.append(
-                        musiplectics.expression_weights(
-                            use_geometric_mean=use_geometric_mean,
-                            use_total_playing_time=use_total_playing_time,
-                            log_scale_values=log_scale_values).get(
-                                expressive_technique))
-
-                expressive_techniques_complexity += reduce(
-                    mul, expressive_techniques_score)
-
-                articulations_accent_score = []
-
-                if articulations_accents == []:
-                    # articulations_accents_complexity += musiplectics.articulation_scores().get(None)
-                    articulations_accent_score.append(
-                        musiplectics.articulation_weights(
-                            use_geometric_mean=use_geometric_mean,
-                            use_total_playing_time=use_total_playing_time,
-                            log_scale_values=log_scale_values).get(None))
-                else:
-                    for articulations_accent in articulations_accents:
-                        # articulations_accents_complexity += musiplectics.articulation_scores().get(articulations_accent)
-                        articulations_accent_score.append(
-                            musiplectics.articulation_weights(
-                                use_geometric_mean=use_geometric_mean,
-                                use_total_playing_time=use_total_playing_time,
-                                log_scale_values=log_scale_values).get(
-                                    articulations_accent))
-
-                articulations_accents_complexity += reduce(
-                    mul, articulations_accent_score)
-
-                dynamic_score = []
-                if len(dynamic) == 2:
-                    dynamic_score.append(
-                        musiplectics.dynamic_weights(
-                            use_geometric_mean=use_geometric_mean,
-                            use_total_playing_time=use_total_playing_time,
-                            log_scale_values=log_scale_values).get(dynamic[0]))
-                    if dynamic[1] is not None:
-                        dynamic_score.append(
-                            musiplectics.dynamic_weights(
-                                use_geometric_mean=use_geometric_mean,
-                                use_total_playing_time=use_total_playing_time,
-                                log_scale_values=log_scale_values).get(
-                                    dynamic[1]))
-
-                dynamics_complexity += reduce(mul, dynamic_score)
-
-                key_sig_score = musiplectics.key_sig_weights(
-                    use_geometric_mean=use_geometric_mean,
-                    use_total_playing_time=use_total_playing_time,
-                    log_scale_values=log_scale_values).get('KeySignature.' +
-                                                           key_sig)
-                key_sig_complexity += key_sig_score
-
-                fret_position_score = musiplectics.fret_position_weights(
-                    use_geometric_mean=use_geometric_mean,
-                    use_total_playing_time=use_total_playing_time,
-                    log_scale_values=log_scale_values).get(
-                        fret_playing_postion)
-                fret_playing_postion_complexity += fret_position_score
-
-                # Playing postion shift is only the fretting hand.
-                # If the note is played/fretted by the plucking hand
-                # no shift should occur:
-
-                shift_distance_score = musiplectics.shifting_weights(
-                    use_geometric_mean=use_geometric_mean,
-                    use_total_playing_time=use_total_playing_time,
-                    log_scale_values=log_scale_values).get(str(0))
-
-                shift_distance_complexity += shift_distance_score
-
-                # Adapting the Musiplectics original equation:
-                # fret_position x technique x expression x articulation x
-                #       dynamic x duration x timesig x bpm
-                note_playing_complexity += (fret_position_score * reduce(
-                    mul, playing_technique_note_scores) * reduce(
-                        mul, expressive_techniques_score) * reduce(
-                            mul, articulations_accent_score) * reduce(
-                                mul, dynamic_score) * duration_tempo_score *
-                                            time_sig_score * bpm_score)
-
-                if previous_note is not None:
-                    interval = calculate.calculate_pitch_interval(
-                        adorned_note, previous_note)
-
-                    interval_ioi = adorned_note.note.start_time - previous_note.note.start_time
-
-                    # Get the interval complexity scores:
-                    # add a restriction/limit to the interval so
-                    # that it does not fall outside the complexity score range
-                    if interval >= 21:
-                        interval = 21
-
-                    interval_score = musiplectics.interval_weights(
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values).get(interval)
-                    interval_complexity += interval_score
-
-                    # Calculte the real time duration for the interval ioi
-                    # and find the closest duration complexity for it:
-                    interval_ioi_rt_duration = calculate.calculate_realtime_duration(
-                        interval_ioi, bpm)
-                    '''
-                    duration_keys = sorted(
-                        musiplectics.duration_scores().keys())
-                    closest_interval_ioi_duration = calculate_closest_value()
-                        duration_keys, interval_ioi_rt_duration)
-
-                    interval_ioi_score = musiplectics.duration_scores(
-                    ).get(closest_interval_ioi_duration)
-                    '''
-
-                    interval_ioi_score = musiplectics.duration_complexity_polynomial(
-                        interval_ioi_rt_duration,
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values)
-                    interval_ioi_complexity += interval_ioi_score
-
-                    # work out if there is a change in dynamics:
-                    dynamic_change = (utilities.dynamics_inv.get(
-                        adorned_note.note.dynamic.value) -
-                                      utilities.dynamics_inv.get(
-                                          previous_note.note.dynamic.value))
-
-                    # default no dynamic change so it is the same
-                    # as the adorned note
-
-                    interval_dynamic = dynamic[0]
-
-                    # if there is a change in dynamic, work out if
-                    # it is a cressendo or diminuendo
-                    if dynamic_change > 0:
-                        # cressendo
-                        interval_dynamic = 'cresc'
-
-                    if dynamic_change < 0:
-                        # diminuendo
-                        interval_dynamic = 'dim'
-
-                    interval_dynamic_score = musiplectics.dynamic_weights(
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values).get(
-                            interval_dynamic)
-
-                    interval_dynamic_complexity += interval_dynamic_score
-
-                    # interval expression is either none, or a slide
-                    # as no other expression technique are used in the
-                    # "playing" of an interval, and are instead confined
-                    # modulating a single note
-                    interval_expression = 'none'
-                    if isinstance(previous_note.adornment.fretting.modulation,
-                                  Slide):
-                        interval_expression = 'slide'
-
-                    interval_expression_score = musiplectics.expression_weights(
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values).get(
-                            interval_expression)
-                    interval_expression_complexity += interval_expression_score
-
-                    # work out the fret position of the interval:
-                    # take the great fret postion and use that:
-                    if adorned_note.note.fret_number >= previous_note.note.fret_number:
-                        interval_fret_position = calculate.calculate_musiplectic_fret_possition(
-                            adorned_note)
-                    elif adorned_note.note.fret_number < previous_note.note.fret_number:
-                        interval_fret_position = calculate.calculate_musiplectic_fret_possition(
-                            previous_note)
-
-                    interval_fret_position_score = musiplectics.fret_position_weights(
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values).get(
-                            interval_fret_position)
-                    interval_fret_position_complexity += interval_fret_position_score
-
-                    interval_complexity += (
-                        interval_score * interval_ioi_score * key_sig_score *
-                        interval_dynamic_score * shift_distance_score *
-                        interval_fret_position_score *
-                        interval_expression_score)
+    selected_score = None
+
+    # Load the weights for the weight set:
+    weights = musiplectics.load_weight_set(weight_set)
+
+    # get measure stuff:
+    time_sig = unadorned_measure.meta_data.time_signature
+    bpm = unadorned_measure.meta_data.tempo
+    key_sig = unadorned_measure.meta_data.key_signature
+
+    time_sig_score = weights.time_sig.get(time_sig)
+    bpm_score = weights.tempo_weight(bpm)
+    key_sig_score = weights.key_sig.get('KeySignature.' + key_sig)
+
+    # Playing postion shift is only the fretting hand, the note is
+    # on its own so there is no shift:
+    shift_distance_score = weights.shifting.get(str(0))
+
+    # the unadorned note with each of the dynamics, the dynamic
+    # weights only depend on the dynamic so they are worked out once:
+    dynamic_unadorned_notes = []
+    dynamic_scores = []
+    for d in possible_dynamics:
+        dynamic_unadorned_note = Note(
+            note_number=unadorned_note.note_number,
+            pitch=unadorned_note.pitch,
+            fret_number=unadorned_note.fret_number,
+            string_number=unadorned_note.string_number,
+            string_tuning=unadorned_note.string_tuning,
+            start_time=unadorned_note.start_time,
+            duration=unadorned_note.duration,
+            notated_duration=unadorned_note.notated_duration,
+            dynamic=d)
+        dynamic_unadorned_notes.append(dynamic_unadorned_note)
+        dynamic_scores.append(
+            reduce(
+                mul,
+                incremental_complexity.calculate_dynamic_weights(
+                    AdornedNote(dynamic_unadorned_note, None), weights)))
+
+    if dynamic_scores:
+        dynamic_score_range = [min(dynamic_scores), max(dynamic_scores)]
+
+    def note_complexities(note_weights_list):
+        """The function that works out the complexity and complexity
+        vector of the notes for the dynamic score of the adorned note,
+        the last of the notes, and the dynamic complexity of the others.
+        """
+        # set some default values:
+        playing_technique_complexity = 0
+        duration_tempo_complexity = 0
+        time_sig_complexity = 0
+        bpm_complexity = 0
+        expressive_techniques_complexity = 0
+        articulations_accents_complexity = 0
+        dynamics_complexity = 0
+        key_sig_complexity = 0
+        fret_playing_postion_complexity = 0
+        shift_distance_complexity = 0
+        note_playing_complexity = 0
+
+        # there is no previous note so there are
+        # no interval complexities:
+        interval_complexity = 0
+        interval_ioi_complexity = 0
+        interval_dynamic_complexity = 0
+        interval_fret_position_complexity = 0
+        interval_expression_complexity = 0
+
+        for note_weights in note_weights_list:
+            playing_technique_complexity += reduce(mul,
+                                                   note_weights.technique)
+            duration_tempo_complexity += note_weights.duration
+            time_sig_complexity += time_sig_score
+            bpm_complexity += bpm_score
+            expressive_techniques_complexity += reduce(
+                mul, note_weights.expression)
+            articulations_accents_complexity += reduce(
+                mul, note_weights.articulation)
+            key_sig_complexity += key_sig_score
+            fret_playing_postion_complexity += note_weights.fret_position
+            shift_distance_complexity += shift_distance_score
+
+        # The adorned note is the last note after its grace note, so
+        # its dynamic weights are the only ones that change with the
+        # dynamic. Add up the others:
+        for note_weights in note_weights_list[:-1]:
+            dynamics_complexity += reduce(mul, note_weights.dynamic)
+
+            # Adapting the Musiplectics original equation:
+            # fret_position x technique x expression x articulation x
+            #       dynamic x duration x timesig x bpm
+            note_playing_complexity += (
+                note_weights.fret_position *
+                reduce(mul, note_weights.technique) *
+                reduce(mul, note_weights.expression) *
+                reduce(mul, note_weights.articulation) *
+                reduce(mul, note_weights.dynamic) * note_weights.duration *
+                time_sig_score * bpm_score)
+
+        note_weights = note_weights_list[-1]
+        playing_complexity_without_dynamic = (
+            note_weights.fret_position * reduce(mul, note_weights.technique) *
+            reduce(mul, note_weights.expression) *
+            reduce(mul, note_weights.articulation))
+
+        def dynamic_complexities(dynamic_score):
+            """The complexity and vector for the dynamic_score."""
+            playing_complexity = note_playing_complexity + (
+                playing_complexity_without_dynamic * dynamic_score *
+                note_weights.duration * time_sig_score * bpm_score)
+            playing_complexity = sum([playing_complexity, interval_complexity])
 
             playing_complexity_vector = [
                 playing_technique_complexity, duration_tempo_complexity,
                 bpm_score, key_sig_complexity, time_sig_complexity,
                 expressive_techniques_complexity,
-                articulations_accents_complexity, dynamics_complexity,
+                articulations_accents_complexity,
+                dynamics_complexity + dynamic_score,
                 fret_playing_postion_complexity, interval_complexity,
                 interval_ioi_complexity, shift_distance_complexity,
-                interval_dynamic_complexity, interval_fret_position_complexity,
+                interval_dynamic_complexity,
+                interval_fret_position_complexity,
                 interval_expression_complexity
             ]
+            return playing_complexity, playing_complexity_vector
+
+        return dynamic_complexities, dynamics_complexity
+
+    def score_bound(lowest, highest):
+        """The largest score of the notes with weights between the
+        lowest and highest (complexity, complexity vector) of them,
+        allowing for rounding errors.
+        """
+        complexity_bounds = []
+        difficulty_bounds = []
+        for playing_complexity, playing_complexity_vector in [
+                lowest, highest
+        ]:
+            complexity_bounds.append(playing_complexity)
+            difficulty_bounds.append(
+                calculate.calculate_euclidean_complexity(
+                    playing_complexity_vector))
+
+        score = (max([c * complexity_weight for c in complexity_bounds]) +
+                 max([d * difficulty_weight for d in difficulty_bounds]))
+        return score + 1e-9 * max(1, abs(selected_score), abs(score))
+
+    # The smallest and largest weight products of the
+    # parts of the adornments, they are worked out once:
+    weight_ranges = {}
+
+    def weight_range(category, adornments):
+        key = (category, tuple([adornment_key(a) for a in adornments]))
+        if key not in weight_ranges:
+            products = [
+                reduce(
+                    mul,
+                    getattr(
+                        incremental_complexity.calculate_note_weights(
+                            AdornedNote(dynamic_unadorned_notes[0], a), bpm,
+                            weights), category)) for a in adornments
+            ]
+            weight_ranges[key] = (min(products), max(products))
+        return weight_ranges[key]
+
+    def partial_adornment(plucking_technique=None,
+                          fretting_technique=None,
+                          palm_mute=None,
+                          artificial_harmonic=None,
+                          modification_type=None,
+                          plucking_accent=None,
+                          fretting_accent=None,
+                          modulation=Modulation(None, None, None, None)):
+        return Adornment(
+            PluckingAdornment(
+                plucking_technique,
+                PluckingModification(palm_mute, artificial_harmonic),
+                plucking_accent),
+            FrettingAdornment(technique=fretting_technique,
+                              modification=FrettingModification(
+                                  type=modification_type, let_ring=False),
+                              accent=fretting_accent,
+                              modulation=modulation),
+            grace_note=None,
+            ghost_note=False)
+
+    def subtree_bound(grace_note, plucking_technique, fretting_technique,
+                      palm_mute, plucking_accents, fretting_accents,
+                      harmonics_and_dead_notes, modulations):
+        """False if none of the adornments that are made from the
+        choices and lists of choices left (see generate_possible_adornments)
+        can be selected.
+        """
+        if (grace_note is not None or selected_score is None
+                or not dynamic_scores):
+            return True
+
+        # the dead notes and harmonics change the techniques,
+        # and can be left out:
+        techniques = weight_range('technique', [
+            partial_adornment(plucking_technique, fretting_technique,
+                              palm_mute)
+        ] + [
+            partial_adornment(plucking_technique,
+                              fretting_technique,
+                              palm_mute,
+                              artificial_harmonic=h)
+            if isinstance(h, ArtificialHarmonic) else partial_adornment(
+                plucking_technique,
+                fretting_technique,
+                palm_mute,
+                modification_type=h) for h in harmonics_and_dead_notes
+        ])
+        vibs, bends, trills, slides = modulations
+        expressions = weight_range('expression', [
+            partial_adornment(modulation=Modulation(bend, vib, trill, slide))
+            for vib in vibs for bend in bends for trill in trills + [None]
+            for slide in slides + [None]
+        ])
+        articulations = weight_range('articulation', [
+            partial_adornment(plucking_accent=p_accent,
+                              fretting_accent=f_accent)
+            for p_accent in plucking_accents for f_accent in fretting_accents
+        ])
+
+        if min(techniques + expressions + articulations +
+               (dynamic_score_range[0], )) < 0:
+            return True
+
+        note_weights = incremental_complexity.calculate_note_weights(
+            AdornedNote(dynamic_unadorned_notes[0], partial_adornment()), bpm,
+            weights)
+        lowest, highest = [
+            note_complexities([
+                note_weights._replace(technique=[technique],
+                                      expression=[expression],
+                                      articulation=[articulation])
+            ])[0](dynamic_score)
+            for technique, expression, articulation, dynamic_score in zip(
+                techniques, expressions, articulations, dynamic_score_range)
+        ]
+        return score_bound(lowest, highest) >= selected_score
+
+    if callable(possible_adornments):
+        possible_adornments = possible_adornments(bound=subtree_bound)
+
+    number_of_adornments = 0
+    for adornment in possible_adornments:
+        number_of_adornments += 1
+        if not dynamic_unadorned_notes:
+            continue
+
+        adorned_note = AdornedNote(dynamic_unadorned_notes[0], adornment)
 
-            playing_complexity = sum(
-                [note_playing_complexity, interval_complexity])
+        # some quick checks:
+        assert isinstance(adorned_note.adornment.fretting.modulation,
+                          Modulation), "Modulation adornment is wrong"
+
+        # the playing techniques are the ones of the
+        # adorned note for it and its grace note:
+        playing_techniques = calculate.calculate_musiplectic_techniques(
+            adorned_note)
+
+        note_weights_list = [
+            incremental_complexity.calculate_note_weights(
+                note, bpm, weights, playing_techniques)
+            for note in calculate.calculate_grace_note_possitions(
+                [adorned_note])
+        ]
+        dynamic_complexities, dynamics_complexity = note_complexities(
+            note_weights_list)
+
+        # Bound the score of the dynamics of the adornment (the
+        # dynamic complexity can't be negative):
+        if (selected_newly_adorned_note is not None
+                and len(dynamic_scores) > 2
+                and dynamic_score_range[0] + dynamics_complexity >= 0):
+            if score_bound(*[
+                    dynamic_complexities(dynamic_score)
+                    for dynamic_score in dynamic_score_range
+            ]) < selected_score:
+                continue
+
+        for dynamic_unadorned_note, dynamic_score in zip(
+                dynamic_unadorned_notes, dynamic_scores):
+            (playing_complexity,
+             playing_complexity_vector) = dynamic_complexities(dynamic_score)
             percieved_difficulty = calculate.calculate_euclidean_complexity(
                 playing_complexity_vector)
 
@@ -1978,22 +2104,71 @@ def select_best_adornment_for_unadorned_note(
             #print("Difficulty=", percieved_difficulty)
 
             # decide what note to select:
-            if selected_newly_adorned_note is None:
+            if selected_newly_adorned_note is None or (
+                ((playing_complexity - selected_newly_adorned_note.complexity)
+                 * complexity_weight +
+                 (percieved_difficulty -
+                  selected_newly_adorned_note.difficulty) * difficulty_weight)
+                    >= 0):
                 selected_newly_adorned_note = selected(
-                    new_adorned_note, note_playing_complexity,
-                    percieved_difficulty)
-            else:
-                if (((playing_complexity - selected_newly_adorned_note.
-                      complexity) * complexity_weight +
-                     (percieved_difficulty - selected_newly_adorned_note.
-                      difficulty) * difficulty_weight) >= 0):
-                    selected_newly_adorned_note = selected(
-                        new_adorned_note, note_playing_complexity,
-                        percieved_difficulty)
+                    AdornedNote(dynamic_unadorned_note, adornment),
+                    playing_complexity, percieved_difficulty)
+                selected_score = (playing_complexity * complexity_weight +
+                                  percieved_difficulty * difficulty_weight)
+
+    print('possible notes: ', number_of_adornments * len(possible_dynamics))
 
     return selected_newly_adorned_note.newly_adorned_note
 
 
+def adornment_key(adornment):
+    """A hashable key for the adornment, the bend points are a list."""
+    bend = adornment.fretting.modulation.bend
+    if isinstance(bend, Bend):
+        bend = (bend.type, bend.value, tuple(bend.points))
+    return (adornment.plucking, adornment.fretting.technique,
+            adornment.fretting.modification, adornment.fretting.accent,
+            adornment.fretting.modulation.vibrato,
+            adornment.fretting.modulation.trill,
+            adornment.fretting.modulation.slide, bend, adornment.grace_note,
+            adornment.ghost_note)
+
+
+def remove_duplicate_adornments(adornment_list):
+    """
+    Return the adornment_list without the adornments that are
+    already in it, in the order they are first in it.
+    """
+    unique_adornments = {}
+    for adornment in adornment_list:
+        key = adornment
+        if isinstance(adornment, Bend):
+            key = (adornment.type, adornment.value, tuple(adornment.points))
+        unique_adornments.setdefault((type(adornment), key), adornment)
+    return list(unique_adornments.values())
+
+
+def grace_note_changes(grace_note, fretting_modifications):
+    """
+    Check if the grace_note is changed when it is combined with any of
+    the dead-notes or harmonics in fretting_modifications, as in
+    generate_possible_adornments.
+    """
+    if grace_note is None:
+        return False
+
+    for fretting_modification in fretting_modifications:
+        if fretting_modification == 'dead-note':
+            if ((grace_note.dead_note and grace_note.transition == 'slide')
+                    or grace_note.transition == 'bend'):
+                return True
+        if (fretting_modification == 'natural-harmonic'
+                or isinstance(fretting_modification, ArtificialHarmonic)):
+            if grace_note.transition not in ['bend', None]:
+                return True
+    return False
+
+
 def make_all_possible_adornments(plucking_accents,
                                  fretting_accents,
                                  plucking_techniques,
@@ -2011,6 +2186,50 @@ def make_all_possible_adornments(plucking_accents,
                                  complexity_weight,
                                  difficulty_weight,
                                  gp5_wellformedness=True):
+    """
+    List all of the possible adornments,
+    see generate_possible_adornments.
+    """
+    return list(
+        generate_possible_adornments(
+            plucking_accents, fretting_accents, plucking_techniques,
+            plucking_modifications_ah, plucking_modifications_palm_mute,
+            fretting_techniques, fretting_modifications_type,
+            fretting_modifications_let_ring, fretting_modulations_bend,
+            fretting_modulations_trill, fretting_modulations_vib,
+            fretting_modulations_slide, grace_notes, ghost_notes,
+            complexity_weight, difficulty_weight, gp5_wellformedness))
+
+
+def generate_possible_adornments(plucking_accents,
+                                 fretting_accents,
+                                 plucking_techniques,
+                                 plucking_modifications_ah,
+                                 plucking_modifications_palm_mute,
+                                 fretting_techniques,
+                                 fretting_modifications_type,
+                                 fretting_modifications_let_ring,
+                                 fretting_modulations_bend,
+                                 fretting_modulations_trill,
+                                 fretting_modulations_vib,
+                                 fretting_modulations_slide,
+                                 grace_notes,
+                                 ghost_notes,
+                                 complexity_weight,
+                                 difficulty_weight,
+                                 gp5_wellformedness=True,
+                                 bound=None):
+    """
+    Generate the well-formed combinations of the possible adornments,
+    each different adornment is generated once, the first time it is made.
+
+    bound is an optional function that is called with the choices
+    made (grace note, plucking and fretting techniques and palm mute)
+    and the lists of choices left (plucking and fretting accents,
+    dead-notes and harmonics, and the vibratos, bends, trills and
+    slides), once the techniques and then the accents are chosen.
+    The adornments of the choices are skipped if it returns False.
+    """
 
     # combine artificial harmonics, natural-harmonics and deadnotes:
     dn_ah_ns = []
@@ -2030,16 +2249,49 @@ def make_all_possible_adornments(plucking_accents,
         f_mod_lr = fretting_modifications_let_ring
         ghost_n = ghost_notes
 
-    possible_adornments = []
-    for grace_n in grace_notes:
-        for p_tech in plucking_techniques:
-            for f_tech in fretting_techniques:
-                for p_mod_pm in plucking_modifications_palm_mute:
-                    for p_accent in plucking_accents:
-                        for f_accent in fretting_accents:
-                            for vib in fretting_modulations_vib:
-                                for bend in fretting_modulations_bend:
-                                    for trill in fretting_modulations_trill:
+    # The lists of possible adornments can have the same adornment more
+    # than once, it only needs to be combined with the others once
+    # unless the grace note is changed by a dead-note or harmonic, as
+    # the changed grace note is used for the rest of the combinations:
+    adornment_lists = [
+        plucking_techniques, fretting_techniques,
+        plucking_modifications_palm_mute, plucking_accents, fretting_accents,
+        fretting_modulations_vib, fretting_modulations_bend,
+        fretting_modulations_trill, fretting_modulations_slide
+    ]
+    unique_adornment_lists = [
+        remove_duplicate_adornments(adornment_list)
+        for adornment_list in adornment_lists
+    ]
+
+    # the keys of the adornments that have been generated:
+    generated_adornments = set()
+    for grace_n in remove_duplicate_adornments(grace_notes):
+        if grace_note_changes(grace_n, dn_ah_ns):
+            combined_lists = adornment_lists
+        else:
+            combined_lists = unique_adornment_lists
+        (p_techs, f_techs, p_mod_pms, p_accents, f_accents, vibs, bends,
+         trills, slides) = combined_lists
+
+        for p_tech in p_techs:
+            for f_tech in f_techs:
+                for p_mod_pm in p_mod_pms:
+                    if bound is not None and not bound(
+                            grace_n, p_tech, f_tech, p_mod_pm, p_accents,
+                            f_accents, dn_ah_ns, [vibs, bends, trills, slides
+                                                  ]):
+                        continue
+                    for p_accent in p_accents:
+                        for f_accent in f_accents:
+                            if bound is not None and not bound(
+                                    grace_n, p_tech, f_tech, p_mod_pm,
+                                [p_accent], [f_accent], dn_ah_ns,
+                                [vibs, bends, trills, slides]):
+                                continue
+                            for vib in vibs:
+                                for bend in bends:
+                                    for trill in trills:
                                         if (p_tech == 'tap'
                                                 and gp5_wellformedness):
                                             trill = None
@@ -2071,14 +2323,15 @@ def make_all_possible_adornments(plucking_accents,
                                                 grace_note=grace_n,
                                                 ghost_note=ghost_n)
 
-                                            if adornment not in possible_adornments:
-                                                possible_adornments.append(
-                                                    adornment)
+                                            key = adornment_key(adornment)
+                                            if key not in generated_adornments:
+                                                generated_adornments.add(key)
+                                                yield adornment
 
                                         # can't have slide, trill or any
                                         # dead_notes and harmonics:
                                         trill = None
-                                        for slide in fretting_modulations_slide:
+                                        for slide in slides:
                                             for dn_ah_n in dn_ah_ns:
                                                 f_mod_type = dn_ah_n
                                                 p_mod_ah = None
@@ -2180,11 +2433,10 @@ def make_all_possible_adornments(plucking_accents,
                                                             slide)),
                                                     grace_note=grace_n,
                                                     ghost_note=ghost_n)
-                                                if adornment not in possible_adornments:
-                                                    possible_adornments.append(
-                                                        adornment)
-
-    return possible_adornments
+                                                key = adornment_key(adornment)
+                                                if key not in generated_adornments:
+                                                    generated_adornments.add(key)
+                                                    yield adornment
 
 
 def find_all_possible_adornements(unadorned_note, adorned_notes,
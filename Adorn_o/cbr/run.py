@@ -74,22 +74,25 @@ def run(gp5_file,
         notes_in_measure = parser.API.calculate_functions.calculate_bars_from_note_list(
             note_list, api_songs[track])
 
-        new_measures = []
-        for unadorned_measure in song.measures:
-            measure_number = unadorned_measure.meta_data.number - 1
-
-            if not database.valid_measure(unadorned_measure,
-                                          notes_in_measure[measure_number]):
-                # append the measure to keep continuity and continue:
-                new_measures.append(unadorned_measure)
-                continue
-
-            # need to do the CBR on the notes_in_measure list:
-            print('Retrieve:')
-            candidate_set = cbr.retrieval(
+        valid_measures = [
+            database.valid_measure(
                 unadorned_measure,
-                notes_in_measure[measure_number],
-                database,
+                notes_in_measure[unadorned_measure.meta_data.number - 1],
+                database.weight_set) for unadorned_measure in song.measures
+        ]
+        measures_to_retrieve = [
+            unadorned_measure for unadorned_measure, valid in zip(
+                song.measures, valid_measures) if valid
+        ]
+
+        # need to do the CBR on the notes_in_measure lists,
+        # the candidates of all the measures are retrieved together:
+        candidate_sets = iter(
+            database.retrieve_many(
+                measures_to_retrieve, [
+                    notes_in_measure[unadorned_measure.meta_data.number - 1]
+                    for unadorned_measure in measures_to_retrieve
+                ],
                 complexity_weight=complexity_weight,
                 difficulty_weight=difficulty_weight,
                 method=retrieval_parameters.get('method', 'all'),
@@ -103,7 +106,18 @@ def run(gp5_file,
                 exclude_artists=retrieval_parameters.get(
                     'exclude_artists', ['none']),
                 exclude_files=retrieval_parameters.get('exclude_files',
-                                                       ['none']))
+                                                       ['none'])))
+
+        new_measures = []
+        for unadorned_measure, valid in zip(song.measures, valid_measures):
+            measure_number = unadorned_measure.meta_data.number - 1
+
+            if not valid:
+                # append the measure to keep continuity and continue:
+                new_measures.append(unadorned_measure)
+                continue
+
+            candidate_set = next(candidate_sets)
             # if nothing can be retrieved:
             if candidate_set == None:
                 # append the measure to keep continuity and continue:
@@ -117,7 +131,8 @@ def run(gp5_file,
             print("Reuse:")
             new_measure = cbr.reuse(unadorned_measure, notes_in_measure[measure_number], adorned_measures,
                                     complexity_weight, difficulty_weight,
-                                    weight_set, gp5_wellformedness)
+                                    weight_set, gp5_wellformedness,
+                                    chunk_feature_store=database.chunk_features)
 
             del adorned_measures
 
@@ -213,7 +228,8 @@ def run_action_reflection(gp5_file,
             measure_number = unadorned_measure.meta_data.number - 1
 
             if not database.valid_measure(unadorned_measure,
-                                          notes_in_measure[measure_number]):
+                                          notes_in_measure[measure_number],
+                                          database.weight_set):
                 # append the measure to keep continuity and continue:
                 new_measures.append(unadorned_measure)
                 continue
@@ -351,14 +367,15 @@ def action_reflection_loop(database,
         new_measure = cbr.reuse(unadorned_measure, notes_in_measure,
                                 adorned_measures, complexity_weight,
                                 difficulty_weight, weight_set,
-                                gp5_wellformedness)
+                                gp5_wellformedness,
+                                chunk_feature_store=database.chunk_features)
         del adorned_measures
 
         revised_newly_adorned_measure = cbr.revise(
             new_measure.measure, revise_for_gp5=gp5_wellformedness)
         del new_measure
 
-        rnameasure_complexity = parser.API.calculate_functions.calculate_playing_complexity(
+        rnameasure_complexity = parser.API.complexity_cache.cached_playing_complexity(
             revised_newly_adorned_measure,
             song=None,
             by_bar=False,
@@ -498,8 +515,43 @@ def run_virtuosity_thesh_action_reflection(
         notes_in_measure = parser.API.calculate_functions.calculate_bars_from_note_list(
             note_list, api_songs[track])
 
+        valid_measures = [
+            database.valid_measure(
+                unadorned_measure,
+                notes_in_measure[unadorned_measure.meta_data.number - 1],
+                database.weight_set) for unadorned_measure in song.measures
+        ]
+        measures_to_retrieve = [
+            unadorned_measure for unadorned_measure, valid in zip(
+                song.measures, valid_measures) if valid
+        ]
+
+        # the virtuosity thresholds of all the measures
+        # are worked out with one similarity query:
+        measure_virtuosity_thresholds = iter(
+            database.virtuosity_thresholds(
+                complexity_weight,
+                difficulty_weight,
+                measures=measures_to_retrieve,
+                notes_per_measure=[
+                    notes_in_measure[unadorned_measure.meta_data.number - 1]
+                    for unadorned_measure in measures_to_retrieve
+                ],
+                virtuosity_type='performance',
+                virtuosity_percentile=virtuosity_percentile,
+                similarity_threshold=similarity_threshold,
+                percentile_range=retrieval_parameters.get(
+                    'percentile_range', [0, 100]),
+                adorned=retrieval_parameters.get('adorned', True),
+                artists=retrieval_parameters.get('artists', 'all'),
+                files=retrieval_parameters.get('files', 'all'),
+                exclude_artists=retrieval_parameters.get(
+                    'exclude_artists', ['none']),
+                exclude_files=retrieval_parameters.get('exclude_files',
+                                                       ['none'])))
+
         new_measures = []
-        for unadorned_measure in song.measures:
+        for unadorned_measure, valid in zip(song.measures, valid_measures):
 
             print("Working on....")
             print("Song:", song_title)
@@ -511,13 +563,12 @@ def run_virtuosity_thesh_action_reflection(
             # measure_number is an index.
             measure_number = unadorned_measure.meta_data.number - 1
 
-            if not database.valid_measure(unadorned_measure,
-                                          notes_in_measure[measure_number]):
+            if not valid:
                 # append the measure to keep continuity and continue:
                 new_measures.append(unadorned_measure)
                 continue
 
-            unadorned_measure_complexity = parser.API.calculate_functions.calculate_playing_complexity(
+            unadorned_measure_complexity = parser.API.complexity_cache.cached_playing_complexity(
                 unadorned_measure,
                 song=None,
                 by_bar=False,
@@ -527,23 +578,7 @@ def run_virtuosity_thesh_action_reflection(
 
             print(unadorned_measure_complexity)
 
-            measure_virtuosity_threshold = database.virtuosity_threshold(
-                complexity_weight,
-                difficulty_weight,
-                measure=unadorned_measure,
-                notes_in_measure=notes_in_measure[measure_number],
-                virtuosity_type='performance',
-                virtuosity_percentile=virtuosity_percentile,
-                similarity_threshold=similarity_threshold,
-                percentile_range=retrieval_parameters.get(
-                    'percentile_range', [0, 100]),
-                adorned=retrieval_parameters.get('adorned', True),
-                artists=retrieval_parameters.get('artists', 'all'),
-                files=retrieval_parameters.get('files', 'all'),
-                exclude_artists=retrieval_parameters.get(
-                    'exclude_artists', ['none']),
-                exclude_files=retrieval_parameters.get('exclude_files',
-                                                       ['none']))
+            measure_virtuosity_threshold = next(measure_virtuosity_thresholds)
             """
             # compare the calculated virtuosity threshold with the
             # unadorned measure and pick the best
@@ -659,7 +694,8 @@ def run_virtuosity_thesh_action_reflection(
                         complexity_weight=complexity_weight,
                         difficulty_weight=difficulty_weight,
                         weight_set=weight_set,
-                        gp5_wellformedness=gp5_wellformedness)
+                        gp5_wellformedness=gp5_wellformedness,
+                        chunk_feature_store=database.chunk_features)
 
                     revised_newly_adorned_measure = new_measure.measure
                     assert len(revised_newly_adorned_measure.notes) == len(
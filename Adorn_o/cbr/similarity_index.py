@@ -0,0 +1,295 @@
+import os
+import hashlib
+
+# 3rd party imports
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Application imports:
+from .. import feature_analysis
+from .storage import rows_feature_matrix
+
+
+class SimilarityIndex:
+    """Approximate nearest neighbour index over the standardised
+    features of the database entries, used by find_most_similar
+    so it doesn't have to work out the distance to every entry.
+
+    The features are standardised with the mean and standard deviation
+    of the whole database when the index is built, and a KD-tree is
+    built over them. Entries added to the database are standardised
+    with the same mean and standard deviation and kept in memory,
+    they are searched exhaustively until there are enough of them for
+    the tree to be rebuilt, which is done the next time it is queried.
+    A query fetches the nearest entries from the tree and the similarity
+    threshold is applied to those and the added entries.
+    Exact similarity is used instead when the query is restricted to
+    a small subset of the database or the threshold would match
+    entries past the nearest ones.
+    The minimum similarity (for the similarity range) is estimated
+    from an evenly spaced sample of entries.
+
+    There is a separate index for each set of features, as single
+    and two note measures don't have all the features.
+
+    Parameters:
+    ----------
+    storage : the storage backend of the database
+
+    min_size : int
+        databases with fewer entries than this are not indexed
+        and exact similarity is used.
+
+    neighbours : int
+        number of nearest entries that are fetched from the tree,
+        more neighbours gives better recall but is slower.
+
+    eps : float
+        the nearest neighbours are allowed to be (1 + eps) times
+        further away than the true nearest neighbours, 0 is exact,
+        larger is faster with lower recall.
+
+    rebuild_fraction : float
+        the tree is rebuilt when the entries added since it was
+        built are more than this fraction of the entries in it.
+
+    sample_size : int
+        number of entries used to estimate the minimum similarity.
+    """
+
+    def __init__(
+        self,
+        storage,
+        min_size=1000,
+        neighbours=100,
+        eps=0.0,
+        rebuild_fraction=0.1,
+        sample_size=1000,
+    ):
+        self.storage = storage
+        self.folder = storage.save_folder + "/similarity_index"
+        self.min_size = min_size
+        self.neighbours = neighbours
+        self.eps = eps
+        self.rebuild_fraction = rebuild_fraction
+        self.sample_size = sample_size
+        self.indexes = {}
+        self.database_size = None
+
+    def index_location(self, feature_names):
+        key = hashlib.sha1(",".join(feature_names).encode("utf-8")).hexdigest()
+        return self.folder + "/" + key + ".npz"
+
+    def row_count(self):
+        """Number of entries in the database, counted from the
+        storage the first time and then kept up to date by add.
+        """
+        if self.database_size is None:
+            self.database_size = self.storage.row_count()
+        return self.database_size
+
+    def build(self, feature_names):
+        features, text = self.storage.feature_matrix(feature_names)
+        features[text] = np.nan
+
+        present = ~np.isnan(features)
+        count = present.sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.where(present, features, 0.0).sum(axis=0) / count
+            squares = np.where(present, features - mean, 0.0) ** 2
+            std = np.sqrt(np.where(count > 1, squares.sum(axis=0) / (count - 1), 0.0))
+        mean = np.nan_to_num(mean)
+
+        index = {
+            "ids": np.array(self.storage.column_values("file.id"), dtype=np.str_),
+            "mean": mean,
+            "std": std,
+            "standardised": (features - mean) / (std + 0.0000001),
+        }
+        self.save(feature_names, index)
+        return self.prepare(index)
+
+    def save(self, feature_names, index):
+        if not os.path.isdir(self.folder):
+            os.makedirs(self.folder)
+        np.savez(
+            self.index_location(feature_names),
+            ids=index["ids"],
+            mean=index["mean"],
+            std=index["std"],
+            standardised=index["standardised"],
+        )
+
+    def prepare(self, index):
+        """Build the tree and the sample of the index,
+        with no entries added since.
+        """
+        indexed_size = len(index["ids"])
+        index["tree"] = cKDTree(np.nan_to_num(index["standardised"]))
+        index["sample"] = np.unique(
+            np.linspace(0, indexed_size - 1, min(self.sample_size, indexed_size))
+        ).astype(int)
+        index["added_ids"] = np.array([], dtype=np.str_)
+        index["added"] = np.empty((0, len(index["mean"])), dtype=np.float64)
+        return index
+
+    def standardise(self, index, features, text):
+        features[text] = np.nan
+        return (features - index["mean"]) / (index["std"] + 0.0000001)
+
+    def load(self, feature_names):
+        """Load the index for the features, building it if there
+        isn't one, and rebuild the tree if too many entries have
+        been added since it was built.
+        """
+        feature_names = list(feature_names)
+        key = tuple(feature_names)
+
+        index = self.indexes.get(key)
+        if index is None and os.path.isfile(self.index_location(feature_names)):
+            saved = np.load(self.index_location(feature_names))
+            index = self.prepare({name: saved[name] for name in saved.files})
+            indexed_size = len(index["ids"])
+
+            # the saved index is rebuilt if it has more entries than
+            # the database, entries added to the database since it
+            # was saved are read from the storage:
+            if indexed_size > self.row_count():
+                index = None
+            elif indexed_size < self.row_count():
+                features, text = self.storage.feature_matrix(
+                    feature_names, start=indexed_size
+                )
+                index["added_ids"] = np.array(
+                    self.storage.column_values("file.id", start=indexed_size),
+                    dtype=np.str_,
+                )
+                index["added"] = self.standardise(index, features, text)
+
+        if index is None:
+            print("Building the similarity index....")
+            index = self.build(feature_names)
+
+        elif len(index["added_ids"]) > self.rebuild_fraction * len(index["ids"]):
+            print("Rebuilding the similarity index....")
+            index["ids"] = np.concatenate([index["ids"], index["added_ids"]])
+            index["standardised"] = np.vstack([index["standardised"], index["added"]])
+            self.save(feature_names, index)
+            index = self.prepare(index)
+
+        self.indexes[key] = index
+        return index
+
+    def add(self, entries):
+        """Standardise the entries added to the database and add
+        them to the loaded indexes, the trees are rebuilt when
+        they are next loaded if enough entries have been added.
+        """
+        if entries == []:
+            return
+
+        if self.database_size is not None:
+            self.database_size += len(entries)
+
+        ids = np.array([entry[0] for entry in entries], dtype=np.str_)
+        for key, index in self.indexes.items():
+            features, text = rows_feature_matrix(self.storage.header, entries, key)
+            index["added_ids"] = np.concatenate([index["added_ids"], ids])
+            index["added"] = np.vstack(
+                [index["added"], self.standardise(index, features, text)]
+            )
+
+    def clear(self):
+        """Remove the indexes, used when the database is re-written."""
+        self.indexes = {}
+        self.database_size = None
+        if os.path.isdir(self.folder):
+            for index_file in os.listdir(self.folder):
+                os.remove(self.folder + "/" + index_file)
+
+    def get_candidate_set(
+        self, feature_names, measure_vector, measure_text, rows, percent_match=1
+    ):
+        """Returns the ids of the entries in rows that are the most
+        similar to the measure, or None if the exact similarity
+        should be used instead: when the database is too small to use
+        the index, the rows are a small part of the database, or the
+        similarity threshold is wide enough to match entries that
+        weren't fetched from the tree.
+
+        Parameters
+        ----------
+        rows : bool array
+            True for the rows of the database in the subset.
+        """
+        if self.row_count() < self.min_size:
+            return None
+
+        # the whole subset matches at 100 percent, and small
+        # subsets are quicker to check exactly:
+        if percent_match >= 100 or np.count_nonzero(rows) <= self.neighbours:
+            return None
+
+        index = self.load(feature_names)
+        indexed_size = len(index["ids"])
+        indexed_allowed = np.count_nonzero(rows[:indexed_size])
+
+        # the tree can't be queried inside the subset, so when most of
+        # the database is left out it is quicker to check every entry:
+        if indexed_allowed < indexed_size / 2:
+            return None
+
+        query = (np.array(measure_vector, dtype=np.float64) - index["mean"]) / (
+            index["std"] + 0.0000001
+        )
+        query[np.array(measure_text, dtype=bool)] = np.nan
+
+        # nearest neighbours from the tree, with enough extra that
+        # there are still enough once the rows outside the subset
+        # are removed:
+        neighbours = min(self.neighbours + indexed_size - indexed_allowed, indexed_size)
+        distances, nearest = index["tree"].query(
+            np.nan_to_num(query), k=neighbours, eps=self.eps
+        )
+        nearest = np.atleast_1d(nearest)
+        nearest = nearest[rows[nearest]]
+        sample = index["sample"][rows[index["sample"]]]
+
+        # entries added since the tree was built are all checked:
+        added = np.flatnonzero(rows[indexed_size:])
+        shortlist_ids = np.concatenate(
+            [index["ids"][nearest], index["added_ids"][added]]
+        )
+        if len(shortlist_ids) == 0:
+            return []
+        shortlist_features = np.vstack(
+            [index["standardised"][nearest], index["added"][added]]
+        )
+
+        shortlist_similarities = np.exp(
+            -feature_analysis.vector_similarity.euclidean_distances(
+                query, shortlist_features
+            )
+            / len(feature_names)
+        )
+        sample_similarities = np.exp(
+            -feature_analysis.vector_similarity.euclidean_distances(
+                query, index["standardised"][sample]
+            )
+            / len(feature_names)
+        )
+
+        max_similarity = np.nanmax(shortlist_similarities)
+        similarity_range = max_similarity - np.nanmin(
+            np.concatenate([shortlist_similarities, sample_similarities])
+        )
+        threshold = max_similarity - percent_match * similarity_range / 100
+        with np.errstate(invalid="ignore"):
+            matches = shortlist_similarities >= threshold
+
+            # if the least similar neighbour from the tree matches,
+            # entries that weren't fetched could match as well:
+            if len(nearest) < indexed_allowed and np.all(matches[: len(nearest)]):
+                return None
+
+        return [str(shortlist_ids[i]) for i in np.flatnonzero(matches)]
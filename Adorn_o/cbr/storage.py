@@ -0,0 +1,621 @@
+import os
+import csv
+import json
+import hashlib
+import shutil
+from collections.abc import Mapping
+
+# 3rd party imports
+import numpy as np
+
+
+class CSVStorage:
+    """Stores the database table as a single csv file.
+
+    This is the original storage format of the Database and is also
+    used as the import/export format for the other storage backends.
+    """
+
+    name = "csv"
+
+    def __init__(self, save_folder, header):
+        self.save_folder = save_folder
+        self.header = header
+        self.location = save_folder + "/" + "database.csv"
+        # the parsed table and the (modified time, size) of the file
+        # it was parsed from, so it is only read again when it changes:
+        self._rows = None
+        self._rows_stat = None
+
+    def exists(self):
+        return os.path.isfile(self.location)
+
+    def create(self):
+        self._rows = None
+        with open(self.location, mode="w") as data_base_file:
+            data_base_updater = csv.writer(data_base_file)
+            data_base_updater.writerow(self.header)
+
+    def _table(self):
+        """The parsed table, read from the file the first
+        time it is used and whenever the file has changed.
+        """
+        stat = os.stat(self.location)
+        stat = (stat.st_mtime_ns, stat.st_size)
+        if self._rows is None or stat != self._rows_stat:
+            with open(self.location) as f:
+                self._rows = [
+                    [val.strip() for val in r.split(",")] for r in f.readlines()
+                ]
+            self._rows_stat = stat
+
+        return self._rows
+
+    def read_rows(self):
+        """Returns the table as a list of rows of strings,
+        the first row is the header.
+        """
+        return [list(row) for row in self._table()]
+
+    def load(self):
+        """Returns a dict of entry id: rest of the row"""
+        data = self._table()[1:]
+        return {row[0]: row[1:] for row in data}
+
+    def row_count(self):
+        return len(self._table()) - 1
+
+    def column_values(self, column, start=0):
+        """Returns the values of the column as strings,
+        from the start row onwards.
+        """
+        index = self.header.index(column)
+        return [row[index] for row in self._table()[1 + start :]]
+
+    def feature_matrix(self, columns, start=0):
+        """Returns a (rows x columns) float array of the columns,
+        values that are not numbers are set to nan, and a boolean
+        array that is True where the value is text (not a number or NA).
+        Only rows from the start row onwards are returned.
+        """
+        return rows_feature_matrix(self.header, self._table()[1 + start :], columns)
+
+    def append_rows(self, rows):
+        if rows == []:
+            return
+        self._rows = None
+        with open(self.location, mode="a+") as data_base_file:
+            data_base_updater = csv.writer(data_base_file)
+            for row in rows:
+                data_base_updater.writerow(row)
+
+    def write_rows(self, rows):
+        """Overwrite the table with rows, the header is added."""
+        self._rows = None
+        with open(self.location, mode="w") as database_csv:
+            database_writer = csv.writer(
+                database_csv,
+                delimiter=",",
+                quotechar="|",
+                quoting=csv.QUOTE_MINIMAL,
+            )
+            database_writer.writerow(self.header)
+            for row in rows:
+                database_writer.writerow(row)
+
+    def as_csv(self):
+        """Location of a csv file with the table in it"""
+        return self.location
+
+
+class ColumnarStorage:
+    """Stores the database table as one binary .npy file per column.
+
+    Numeric columns are saved as float64 arrays and everything else
+    (ids, file locations, artists, titles...) as fixed width unicode
+    arrays. The few values in a numeric column that can't be written
+    back out as the same string (e.g. "NA" or "4.0") are kept as
+    exceptions in the manifest, and are nan in the float array.
+    The files are opened memory-mapped so loading the database
+    only reads the manifest and the pages of the columns that are used.
+    Rows that are added are appended to the end of the column files.
+
+    The table can be exported to the csv format with export_csv.
+    """
+
+    name = "columnar"
+
+    def __init__(self, save_folder, header):
+        self.save_folder = save_folder
+        self.header = header
+        self.folder = save_folder + "/columns"
+        self.manifest_location = self.folder + "/manifest.json"
+        self.location = save_folder + "/" + "database.csv"
+
+    def exists(self):
+        return os.path.isfile(self.manifest_location)
+
+    def create(self):
+        self.write_rows([])
+
+    def column_location(self, column):
+        return self.folder + "/" + str(self.header.index(column)) + ".npy"
+
+    def manifest(self):
+        with open(self.manifest_location) as manifest_file:
+            return json.load(manifest_file)
+
+    def column(self, column):
+        """Returns the memory-mapped array for the column"""
+        return np.load(self.column_location(column), mmap_mode="r")
+
+    def column_values(self, column, start=0):
+        """Returns the values of the column as strings,
+        from the start row onwards.
+        """
+        manifest = self.manifest()
+        values = self.column(column)[start : manifest["rows"]]
+        if manifest["kinds"][column] == "str":
+            return [str(value) for value in values]
+        exceptions = manifest["exceptions"][column]
+        return [
+            exceptions.get(str(row), _number_to_string(value))
+            for row, value in enumerate(values, start)
+        ]
+
+    def feature_matrix(self, columns, start=0):
+        """Returns a (rows x columns) float array of the columns,
+        values that are not numbers are set to nan, and a boolean
+        array that is True where the value is text (not a number or NA).
+        Only rows from the start row onwards are returned.
+        """
+        manifest = self.manifest()
+        rows = max(manifest["rows"] - start, 0)
+        matrix = np.empty((rows, len(columns)), dtype=np.float64)
+        text = np.zeros((rows, len(columns)), dtype=bool)
+        for i, column in enumerate(columns):
+            values = self.column(column)[start : manifest["rows"]]
+            if manifest["kinds"][column] == "str":
+                matrix[:, i], text[:, i] = _numbers_and_text(values)
+            else:
+                matrix[:, i] = values
+                for row, value in manifest["exceptions"][column].items():
+                    if int(row) >= start:
+                        text[int(row) - start, i] = _is_text(value)
+        return matrix, text
+
+    def read_rows(self):
+        return [self.header] + list(self.load().rows())
+
+    def load(self):
+        return ColumnarTable(self, self.manifest())
+
+    def row_count(self):
+        return self.manifest()["rows"]
+
+    def append_rows(self, rows):
+        """Add the rows to the end of the table, the values are
+        appended to the column files and the new ids are merged into
+        the id order, so the table isn't re-written. Tables with fewer
+        rows than are being added are re-written, so the kinds of the
+        columns are worked out from enough rows.
+        """
+        if rows == []:
+            return
+
+        manifest = self.manifest()
+        start = manifest["rows"]
+        if start < len(rows):
+            self.write_rows(self.read_rows()[1:] + rows)
+            return
+
+        columns = self._columns_from_rows(rows)
+        for column, values in zip(self.header, columns):
+            if manifest["kinds"][column] == "str":
+                array = np.array(values, dtype=np.str_)
+            else:
+                numbers = [_to_float(value) for value in values]
+                for row, (value, number) in enumerate(zip(values, numbers), start):
+                    if _number_to_string(number) != value:
+                        manifest["exceptions"][column][str(row)] = value
+                array = np.array(numbers, dtype=np.float64)
+            _append_to_npy(self.column_location(column), array, start)
+
+        # the new ids go after the same ids already in the
+        # table, as the stable sort in _write_columns:
+        ids = self.column(self.header[0])[: start + len(rows)]
+        order = np.load(self.folder + "/id.order.npy")
+        new_order = start + np.argsort(ids[start:], kind="stable")
+        positions = np.searchsorted(ids[order], ids[new_order], side="right")
+        order = np.insert(order, positions, new_order)
+        np.save(self.folder + "/id.order.tmp.npy", order.astype(np.int64))
+        os.replace(self.folder + "/id.order.tmp.npy", self.folder + "/id.order.npy")
+
+        manifest["rows"] = start + len(rows)
+        self._write_manifest(manifest)
+
+    def write_rows(self, rows):
+        self._write_columns(self._columns_from_rows(rows))
+
+    def _columns_from_rows(self, rows):
+        columns = [[] for column in self.header]
+        for row in rows:
+            assert len(row) == len(self.header), "row length does not match header"
+            for index, value in enumerate(row):
+                columns[index].append(str(value))
+        return columns
+
+    def _write_columns(self, columns):
+        if not os.path.isdir(self.folder):
+            os.makedirs(self.folder)
+        kinds = {}
+        exceptions = {}
+        for column, values in zip(self.header, columns):
+            numbers = [_to_float(value) for value in values]
+            column_exceptions = {
+                str(row): value
+                for row, (value, number) in enumerate(zip(values, numbers))
+                if _number_to_string(number) != value
+            }
+            # keep it as a string column if most of it isn't numbers:
+            if column == self.header[0] or len(column_exceptions) * 2 > len(values):
+                kinds[column] = "str"
+                array = np.array(values, dtype=np.str_)
+                if len(values) == 0:
+                    array = array.astype("<U1")
+            else:
+                kinds[column] = "number"
+                exceptions[column] = column_exceptions
+                array = np.array(numbers, dtype=np.float64)
+            # write to a temp file then swap it in, so an open
+            # memmap of the old column stays valid:
+            temp_location = self.column_location(column) + ".tmp.npy"
+            np.save(temp_location, array)
+            os.replace(temp_location, self.column_location(column))
+
+        order = np.argsort(np.array(columns[0], dtype=np.str_), kind="stable")
+        np.save(self.folder + "/id.order.tmp.npy", order.astype(np.int64))
+        os.replace(self.folder + "/id.order.tmp.npy", self.folder + "/id.order.npy")
+
+        self._write_manifest(
+            {
+                "header": self.header,
+                "kinds": kinds,
+                "exceptions": exceptions,
+                "rows": len(columns[0]),
+            }
+        )
+
+    def _write_manifest(self, manifest):
+        with open(self.manifest_location + ".tmp", mode="w") as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.replace(self.manifest_location + ".tmp", self.manifest_location)
+
+    def as_csv(self):
+        """Export the table to database.csv in the save folder
+        and return the location, used for the R based features.
+        """
+        self.export_csv(self.location)
+        return self.location
+
+    def export_csv(self, location):
+        with open(location, mode="w") as database_csv:
+            database_writer = csv.writer(database_csv)
+            for row in self.read_rows():
+                database_writer.writerow(row)
+
+
+class ColumnarTable(Mapping):
+    """Read only dict like view (entry id: rest of the row) over
+    the columns of a ColumnarStorage.
+
+    Rows are only made when they are asked for, entry ids are found
+    with a binary search over the sorted id column.
+    """
+
+    def __init__(self, storage, manifest):
+        self.storage = storage
+        self.kinds = [manifest["kinds"][column] for column in storage.header]
+        self.exceptions = [
+            manifest["exceptions"].get(column, {}) for column in storage.header
+        ]
+        self.length = manifest["rows"]
+        self.columns = [storage.column(column) for column in storage.header]
+        self.order = np.load(storage.folder + "/id.order.npy", mmap_mode="r")
+
+    def index(self, entry_id):
+        """Row index of entry_id in the table, None if it isn't in it."""
+        ids = self.columns[0]
+        low = 0
+        high = self.length
+        while low < high:
+            middle = (low + high) // 2
+            if ids[self.order[middle]] < entry_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.length and ids[self.order[low]] == entry_id:
+            return int(self.order[low])
+        return None
+
+    def row(self, index):
+        row = []
+        for column, kind, exceptions in zip(self.columns, self.kinds, self.exceptions):
+            if kind == "str":
+                row.append(str(column[index]))
+            elif str(index) in exceptions:
+                row.append(exceptions[str(index)])
+            else:
+                row.append(_number_to_string(column[index]))
+        return row
+
+    def rows(self):
+        for index in range(self.length):
+            yield self.row(index)
+
+    def __getitem__(self, entry_id):
+        index = self.index(entry_id)
+        if index is None:
+            raise KeyError(entry_id)
+        return self.row(index)[1:]
+
+    def __contains__(self, entry_id):
+        return self.index(entry_id) is not None
+
+    def __iter__(self):
+        for index in range(self.length):
+            yield str(self.columns[0][index])
+
+    def __len__(self):
+        return self.length
+
+
+class DuplicateIndex:
+    """Hashes of the feature values (complexity onwards) of every
+    entry in the database, saved next to it in duplicate_index.txt,
+    so duplicate entries can be found without going through
+    the whole database.
+
+    The index is rebuilt from the database if the number of
+    hashes doesn't match the number of entries.
+    """
+
+    def __init__(self, storage, feature_start):
+        self.storage = storage
+        self.feature_start = feature_start
+        self.location = storage.save_folder + "/duplicate_index.txt"
+        self.hashes = None
+
+    def load(self):
+        hashes = []
+        if os.path.isfile(self.location):
+            with open(self.location) as index_file:
+                hashes = [line.rstrip() for line in index_file]
+
+        if len(hashes) != self.storage.row_count():
+            print("Rebuilding the duplicate index....")
+            hashes = [
+                entry_hash(row[self.feature_start :])
+                for row in self.storage.read_rows()[1:]
+            ]
+            with open(self.location, mode="w") as index_file:
+                for h in hashes:
+                    index_file.write(h + "\n")
+
+        self.hashes = set(hashes)
+
+    def clear(self):
+        if os.path.isfile(self.location):
+            os.remove(self.location)
+        self.hashes = None
+
+    def __contains__(self, features):
+        if self.hashes is None:
+            self.load()
+        return entry_hash(features) in self.hashes
+
+    def add(self, entries):
+        """Add the hashes of the entries that
+        have been added to the database
+        """
+        if self.hashes is None:
+            self.load()
+        with open(self.location, mode="a+") as index_file:
+            for entry in entries:
+                h = entry_hash(entry[self.feature_start :])
+                self.hashes.add(h)
+                index_file.write(h + "\n")
+
+
+class BuildManifest:
+    """Record of the tabs added to the database, saved next to it in
+    build_manifest.jsonl, so builds can skip the tabs that have
+    already been added.
+
+    Each tab has the hash of its contents, its status ("complete" or
+    "failed") and the rows of the database its entries were added to,
+    or the error if it failed. Tabs that failed are copied to the
+    failed folder. A line is appended to the file for each tab, the
+    last line for a tab is its current record.
+    """
+
+    def __init__(self, save_folder):
+        self.location = save_folder + "/build_manifest.jsonl"
+        self.failed_folder = save_folder + "/failed"
+        self.records = None
+
+    def load(self):
+        self.records = {}
+        if os.path.isfile(self.location):
+            with open(self.location) as manifest_file:
+                for line in manifest_file:
+                    if line.strip() == "":
+                        continue
+                    record = json.loads(line)
+                    self.records[record["file"]] = record
+
+    def clear(self):
+        if os.path.isfile(self.location):
+            os.remove(self.location)
+        self.records = None
+
+    def record(self, file_location):
+        """The current record for the tab, or None"""
+        if self.records is None:
+            self.load()
+        return self.records.get(file_location)
+
+    def is_done(self, file_location, retry_failed=False):
+        """True if the tab has been added (or failed) and
+        hasn't changed since.
+        """
+        record = self.record(file_location)
+        if record is None:
+            return False
+        if record["status"] == "failed" and retry_failed:
+            return False
+        # tabs that have been moved into the database are not checked:
+        if not os.path.isfile(file_location):
+            return True
+        return record["hash"] == file_hash(file_location)
+
+    def complete(self, file_location, tab_hash, first_row, end_row):
+        self.add(
+            {
+                "file": file_location,
+                "hash": tab_hash,
+                "status": "complete",
+                "rows": [first_row, end_row],
+            }
+        )
+
+    def fail(self, file_location, tab_hash, error, tab_location=None):
+        """Record the error and copy the tab to the failed folder"""
+        if tab_location is None:
+            tab_location = file_location
+
+        quarantine_location = None
+        if os.path.isfile(tab_location):
+            if not os.path.isdir(self.failed_folder):
+                os.makedirs(self.failed_folder)
+            quarantine_location = self.failed_folder + "/" + tab_location.split("/")[-1]
+            shutil.copy2(tab_location, quarantine_location)
+
+        self.add(
+            {
+                "file": file_location,
+                "hash": tab_hash,
+                "status": "failed",
+                "error": str(error),
+                "quarantine": quarantine_location,
+            }
+        )
+
+    def add(self, record):
+        if self.records is None:
+            self.load()
+        self.records[record["file"]] = record
+        with open(self.location, mode="a+") as manifest_file:
+            manifest_file.write(json.dumps(record) + "\n")
+
+
+def file_hash(file_location):
+    """Hash of the contents of a file, None if it doesn't exist"""
+    if not os.path.isfile(file_location):
+        return None
+    with open(file_location, "rb") as hashed_file:
+        return hashlib.sha1(hashed_file.read()).hexdigest()
+
+
+def entry_hash(features):
+    """Stable hash of a list of feature values"""
+    return hashlib.sha1(
+        ",".join([str(f).strip() for f in features]).encode("utf-8")
+    ).hexdigest()
+
+
+def rows_feature_matrix(header, rows, columns):
+    """The feature_matrix of the columns of a list of rows of
+    strings, the rows have the same columns as the header.
+    """
+    matrix = np.empty((len(rows), len(columns)), dtype=np.float64)
+    text = np.zeros((len(rows), len(columns)), dtype=bool)
+    for i, column in enumerate(columns):
+        index = header.index(column)
+        matrix[:, i], text[:, i] = _numbers_and_text([row[index] for row in rows])
+    return matrix, text
+
+
+def _append_to_npy(location, array, rows):
+    """Write the 1d array after the first rows of the array saved
+    in the .npy file, and update the shape in the file's header.
+    The file is re-written if the header doesn't have room for the
+    new shape or the strings are wider than the saved ones.
+    """
+    with open(location, "r+b") as npy_file:
+        version = np.lib.format.read_magic(npy_file)
+        length_size = 2 if version == (1, 0) else 4
+        header_start = npy_file.tell() + length_size
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(npy_file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(npy_file)
+        data_start = npy_file.tell()
+
+        header = str(
+            {
+                "descr": np.lib.format.dtype_to_descr(dtype),
+                "fortran_order": False,
+                "shape": (rows + len(array),),
+            }
+        )
+        header_size = data_start - header_start
+        if len(header) < header_size and array.dtype.itemsize <= dtype.itemsize:
+            npy_file.seek(header_start)
+            npy_file.write((header.ljust(header_size - 1) + "\n").encode("latin1"))
+            npy_file.seek(data_start + rows * dtype.itemsize)
+            npy_file.write(array.astype(dtype).tobytes())
+            npy_file.truncate()
+            return
+
+    # write to a temp file then swap it in, so an open
+    # memmap of the old column stays valid:
+    array = np.concatenate([np.load(location, mmap_mode="r")[:rows], array])
+    temp_location = location + ".tmp.npy"
+    np.save(temp_location, array)
+    os.replace(temp_location, location)
+
+
+def _number_to_string(number):
+    """Formats numbers the way R writes them to csv,
+    whole numbers without the decimal point.
+    """
+    number = float(number)
+    if number != number:
+        return "NA"
+    if number.is_integer():
+        return str(int(number))
+    return repr(number)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def _is_text(value):
+    return value not in ["", "NA"] and _to_float(value) != _to_float(value)
+
+
+def _numbers_and_text(values):
+    numbers = np.array([_to_float(value) for value in values], dtype=np.float64)
+    text = np.array([_is_text(value) for value in values], dtype=bool)
+    return numbers, text
+
+
+storage_backends = {
+    CSVStorage.name: CSVStorage,
+    ColumnarStorage.name: ColumnarStorage,
+}
@@ -6,6 +6,8 @@ import guitarpro
 from bisect import bisect_left
 from math import log, e
 
+import numpy as np
+
 import pkg_resources
 
 # Set the folder with the musiplectics score data
@@ -932,6 +934,44 @@ def duration_complexity_polynomial(duration,
             return duration_complexity
 
 
+def duration_complexity_polynomial_array(durations,
+                                         use_geometric_mean=True,
+                                         log_scale_values=True,
+                                         use_total_playing_time=False):
+    '''
+    duration_complexity_polynomial for an array of real time
+    durations, returning an array of the duration complexities.
+
+    The polynomial is calculated for all the durations at once.
+    The log scaling is done with math.log for each different value
+    so the values are the same as duration_complexity_polynomial.
+    '''
+    clicks = 60000 / np.asarray(durations, dtype=np.float64)
+
+    if use_geometric_mean:
+        if not use_total_playing_time:
+            duration_complexity = (9.51 - 0.141 * clicks +
+                                   0.000699 * np.power(clicks, 2))
+        else:
+            duration_complexity = (14.8 - 0.224 * clicks +
+                                   0.00106 * np.power(clicks, 2))
+
+        if log_scale_values:
+            unique_values, inverse = np.unique(duration_complexity,
+                                               return_inverse=True)
+            log_values = np.array(
+                [log((value + 1), 2) for value in unique_values.tolist()],
+                dtype=np.float64)
+            return log_values[inverse].reshape(duration_complexity.shape)
+        else:
+            return duration_complexity
+    else:
+        if not use_total_playing_time:
+            return (1.6 - 0.0109 * clicks + 0.0000618 * np.power(clicks, 2))
+        else:
+            return (1.43 - 0.00738 * clicks +
+                    0.0000399 * np.power(clicks, 2))
+
 def shifting_complexity_function(shift_distance,
                                  log_scale_values=True,
                                  polynomial=True):
@@ -961,3 +1001,151 @@ def shifting_complexity_function(shift_distance,
             return 1 + log(1.77 * pow(e, 0.295 * shift_distance) - 0.77, 10)
         else:
             return 1.77 * pow(e, 0.295 * shift_distance) - 0.77, 10
+
+
+# Flags for each of the named weight sets:
+# (use_geometric_mean, use_total_playing_time, log_scale_values)
+weight_set_flags = {
+    'GM': (True, False, False),
+    'GMS': (True, False, True),
+    'GMT': (True, True, False),
+    'GMTS': (True, True, False),
+    'RD': (False, False, False),
+    'RDT': (False, True, False),
+}
+
+# WeightSets that have already been loaded in this process:
+loaded_weight_sets = {}
+
+
+class WeightSet(object):
+    '''
+    All the musiplectic complexity weights for one of the named
+    weight sets (GM, GMS, GMT, GMTS, RD or RDT).
+
+    The weight files are read once when the WeightSet is made and
+    kept as dictionaries, so looking up a weight is a dict lookup
+    rather than re-reading the csv files. Use load_weight_set to get
+    a WeightSet so that each set is only loaded once per process.
+    '''
+
+    def __init__(self, name, musiplectics_folder=musiplectics_folder):
+        assert name in weight_set_flags, '%s is not a valid weight set' % name
+
+        self.name = name
+        (self.use_geometric_mean, self.use_total_playing_time,
+         self.log_scale_values) = weight_set_flags[name]
+
+        flags = dict(
+            use_geometric_mean=self.use_geometric_mean,
+            use_total_playing_time=self.use_total_playing_time,
+            log_scale_values=self.log_scale_values)
+
+        self.fret_position = fret_position_weights(musiplectics_folder,
+                                                   **flags)
+        self.interval = interval_weights(musiplectics_folder, **flags)
+        self.dynamic = dynamic_weights(musiplectics_folder, **flags)
+        self.key_sig = key_sig_weights(musiplectics_folder, **flags)
+        self.articulation = articulation_weights(musiplectics_folder,
+                                                 **flags)
+        self.expression = expression_weights(musiplectics_folder, **flags)
+        self.shifting = shifting_weights(musiplectics_folder, **flags)
+        self.technique = technique_weights(musiplectics_folder, **flags)
+        self.tempo, self.tempo_beat_dur_rt = tempo_weights(
+            musiplectics_folder, **flags)
+        self.time_sig = time_sig_weights(musiplectics_folder, **flags)
+
+        # sorted tempos and their weights for finding the closest
+        # tempo weight with a binary search:
+        self.tempo_list = sorted(self.tempo.keys())
+        self.tempo_array = np.array(self.tempo_list, dtype=np.float64)
+        self.tempo_weight_array = np.array(
+            [self.tempo.get(int(tempo)) for tempo in self.tempo_list],
+            dtype=np.float64)
+
+    def duration(self, duration):
+        '''
+        Duration complexity of a note with this weight set,
+        see duration_complexity_polynomial.
+        '''
+        return duration_complexity_polynomial(
+            duration,
+            use_geometric_mean=self.use_geometric_mean,
+            log_scale_values=self.log_scale_values,
+            use_total_playing_time=self.use_total_playing_time)
+
+    def durations(self, durations):
+        '''
+        Duration complexities of an array of real time durations
+        with this weight set, see duration_complexity_polynomial_array.
+        '''
+        return duration_complexity_polynomial_array(
+            durations,
+            use_geometric_mean=self.use_geometric_mean,
+            log_scale_values=self.log_scale_values,
+            use_total_playing_time=self.use_total_playing_time)
+
+    def closest_tempo(self, bpm):
+        '''
+        The closest tempo in tempo_list to bpm, if two tempos are
+        equally close the smallest is used, as calculate_closest_value.
+        '''
+        pos = bisect_left(self.tempo_list, bpm)
+        if pos == 0:
+            return self.tempo_list[0]
+        if pos == len(self.tempo_list):
+            return self.tempo_list[-1]
+        before = self.tempo_list[pos - 1]
+        after = self.tempo_list[pos]
+        if after - bpm < bpm - before:
+            return after
+        return before
+
+    def tempo_weight(self, bpm):
+        '''
+        The tempo complexity weight of the closest tempo to bpm.
+        '''
+        return self.tempo.get(int(self.closest_tempo(bpm)))
+
+    def tempo_weights(self, bpms):
+        '''
+        tempo_weight for an array of tempos, returning
+        an array of the tempo complexity weights.
+        '''
+        bpms = np.asarray(bpms, dtype=np.float64)
+        last = len(self.tempo_array) - 1
+
+        pos = np.searchsorted(self.tempo_array, bpms, side='left')
+        before = np.clip(pos - 1, 0, last)
+        after = np.clip(pos, 0, last)
+
+        closest = np.where(
+            self.tempo_array[after] - bpms < bpms - self.tempo_array[before],
+            after, before)
+        closest = np.where(pos == 0, 0, closest)
+        closest = np.where(pos > last, last, closest)
+
+        return self.tempo_weight_array[closest]
+
+    def __reduce__(self):
+        # Only send the name when pickling, the weights
+        # are loaded from the cache in the receiving process.
+        return (load_weight_set, (self.name, ))
+
+    def __repr__(self):
+        return 'WeightSet(%r)' % self.name
+
+
+def load_weight_set(weight_set='GMS'):
+    '''
+    Return the WeightSet for weight_set, which can either be the name of
+    the weight set or a WeightSet. Each named set is loaded
+    the first time it is asked for and cached after that.
+    '''
+    if isinstance(weight_set, WeightSet):
+        return weight_set
+
+    if weight_set not in loaded_weight_sets:
+        loaded_weight_sets[weight_set] = WeightSet(weight_set)
+
+    return loaded_weight_sets[weight_set]
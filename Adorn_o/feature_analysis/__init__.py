@@ -1,5 +1,8 @@
 import glob
 from . import synpy_interface
+from . import fantastic
+from . import adornment_features
 from . import fantastic_interface
+from . import vector_similarity
 from . import synpy
 from .similarity import *
@@ -0,0 +1,351 @@
+"""
+Adornment feature tables for a corpus of songs.
+
+The adornment rate (feature count / number of notes) and density
+(feature count / song duration in beats) of the musiplectic features
+(techniques, expressions, articulations, dynamics and fret positions)
+are calculated for every track of the GP5/JSON files in a corpus.
+The files are read by a pool of worker processes, which count the
+features of each track. The counts are put into one
+(tracks x features) array, and the table is saved as a single .npz
+file with a column for each feature rate and density.
+"""
+
+# Standard library imports
+import os
+import glob
+import json
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+# 3rd party imports
+import numpy as np
+import guitarpro
+
+# Local application imports
+from ..parser.API import get_functions
+from ..parser.API import calculate_functions as calculate
+
+# The features in the order of the calculate_features_table_multiple_songs
+# columns, followed by the rest of the musiplectic features:
+adornment_feature_names = [
+    "2_finger_pluck",
+    "pick",
+    "slap",
+    "pop",
+    "tap",
+    "double_thumb",
+    "double_thumb_upstroke",
+    "double_thumb_downstroke",
+    "fretting_slap",
+    "hammer_on",
+    "pull_off",
+    "double_stop",
+    "3_note_chord",
+    "4_note_chord",
+    "natural_harmonic",
+    "artificial_harmonic",
+    "palm_mute",
+    "palm_mute_pluck",
+    "palm_mute_pick",
+    "palm_mute_thumb_pluck",
+    "dead_note",
+    "dead_note_pluck_pick",
+    "dead_note_slap",
+    "dead_note_pop",
+    "quater_bend",
+    "half_bend",
+    "whole_bend",
+    "vibrato",
+    "trill",
+    "slide",
+    "0-4",
+    "5-11",
+    "12-17",
+    "18+",
+    "staccato",
+    "accent",
+    "ppp",
+    "pp",
+    "p",
+    "mp",
+    "mf",
+    "f",
+    "ff",
+    "fff",
+    "1_finger_pluck",
+    "3_finger_pluck",
+    "thumb_pluck",
+    "two_handed_tap",
+    "fast-vibrato",
+    "slow-vibrato",
+    "trill-slide",
+    "legato",
+    "tenuto",
+    "cresc",
+    "dim",
+]
+
+feature_index = {name: index for index, name in enumerate(adornment_feature_names)}
+
+# The column names of the feature table:
+feature_table_header = ["file.id"] + [
+    name + value_type
+    for name in adornment_feature_names
+    for value_type in ["_rate", "_density"]
+]
+
+# Features that are also counted as the group they are part of:
+feature_groups = {
+    "double_thumb_upstroke": "double_thumb",
+    "double_thumb_downstroke": "double_thumb",
+    "palm_mute_pluck": "palm_mute",
+    "palm_mute_pick": "palm_mute",
+    "palm_mute_thumb_pluck": "palm_mute",
+    "dead_note_pluck_pick": "dead_note",
+    "dead_note_slap": "dead_note",
+    "dead_note_pop": "dead_note",
+}
+
+# The feature counts of the tracks in a file:
+FileFeatureCounts = namedtuple(
+    "FileFeatureCounts", ["file_ids", "counts", "note_counts", "durations"]
+)
+
+# The feature table of a corpus, values is a (tracks x columns) array
+# of the rate and density of each feature for each track:
+FeatureTable = namedtuple("FeatureTable", ["file_ids", "columns", "values", "failed"])
+
+
+def note_features(adorned_note):
+    """
+    Return the set of features of the adorned_note that
+    are in adornment_feature_names.
+    """
+    features = set(calculate.calculate_musiplectic_techniques(adorned_note))
+    features.update(calculate.calculate_musiplectic_expression(adorned_note))
+    features.update(calculate.calculate_musiplectic_articulations(adorned_note))
+    features.update(calculate.calculate_musiplectic_dynamic(adorned_note))
+    features.add(calculate.calculate_musiplectic_fret_possition(adorned_note))
+
+    features.update(
+        [feature_groups[feature] for feature in features if feature in feature_groups]
+    )
+    return set([feature for feature in features if feature in feature_index])
+
+
+def count_song_features(song):
+    """
+    Count the notes in the song that have each feature.
+
+    Returns
+    -------
+    (counts, note_count, duration)
+        counts is an array of the number of notes with each feature in
+        adornment_feature_names, duration is the song duration in beats.
+    """
+    counts = np.zeros(len(adornment_feature_names), dtype=np.int64)
+
+    note_list = calculate.calculate_tied_note_durations(song)
+    for adorned_note in note_list:
+        for feature in note_features(adorned_note):
+            counts[feature_index[feature]] += 1
+
+    return counts, len(note_list), float(calculate.calculate_song_duration(song))
+
+
+def load_song_file(song_file):
+    """
+    Load the tracks of a GP5 or JSON file as a list of Songs.
+    """
+    if os.path.splitext(song_file)[1] == ".json":
+        with open(song_file) as read_file:
+            tracks = get_functions.get_from_JSON(json.load(read_file))
+    else:
+        tracks = get_functions.get_song_data(guitarpro.parse(song_file))
+
+    if not isinstance(tracks, list):
+        tracks = [tracks]
+    return tracks
+
+
+def count_file_features(song_file):
+    """
+    Count the features of each track in the song_file, this is run
+    by the worker processes in calculate_corpus_feature_table.
+
+    Returns
+    -------
+    FileFeatureCounts, or None if the file can't be loaded
+    """
+    try:
+        tracks = load_song_file(song_file)
+    except Exception:
+        print("Unable to load %s" % song_file)
+        return None
+
+    file_id = os.path.splitext(os.path.basename(song_file))[0]
+
+    file_ids = []
+    counts = np.zeros((len(tracks), len(adornment_feature_names)), dtype=np.int64)
+    note_counts = np.zeros(len(tracks), dtype=np.int64)
+    durations = np.zeros(len(tracks), dtype=np.float64)
+    for track_number, track in enumerate(tracks):
+        if len(tracks) == 1:
+            file_ids.append(file_id)
+        else:
+            file_ids.append(file_id + "_track_" + str(track_number + 1))
+        (
+            counts[track_number],
+            note_counts[track_number],
+            durations[track_number],
+        ) = count_song_features(track)
+
+    return FileFeatureCounts(file_ids, counts, note_counts, durations)
+
+
+def find_song_files(corpus):
+    """
+    The GP5 and JSON files in the corpus folder, or the
+    files in corpus if it is a list of files.
+    """
+    if isinstance(corpus, list):
+        return corpus
+
+    song_files = []
+    for extension in ["gp5", "json"]:
+        song_files += glob.glob(os.path.join(corpus, "*." + extension))
+    return sorted(song_files)
+
+
+def calculate_corpus_feature_table(corpus, output_file=None, workers=1):
+    """
+    Calculate the adornment feature table for every track
+    of the songs in a corpus.
+
+    Parameters
+    ---------
+    corpus : str or list of str
+        a folder with the GP5/JSON files, or a list of the files
+
+    output_file : str, optional
+        the .npz file to save the table to, see save_feature_table
+
+    workers : int
+        number of processes used to load the files and count their
+        features, the rows are in the order of the files either way.
+
+    Returns
+    -------
+    FeatureTable
+        the rate and density of each feature (feature_table_header)
+        for each track, and the files that couldn't be loaded
+    """
+    song_files = find_song_files(corpus)
+
+    # One row for each file, more are added if files have more tracks:
+    counts = np.zeros((len(song_files), len(adornment_feature_names)), dtype=np.int64)
+    note_counts = np.zeros(len(song_files), dtype=np.int64)
+    durations = np.zeros(len(song_files), dtype=np.float64)
+    file_ids = []
+    failed = []
+
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        file_counts = executor.map(
+            count_file_features,
+            song_files,
+            chunksize=max(1, len(song_files) // (4 * workers)),
+        )
+    else:
+        executor = None
+        file_counts = map(count_file_features, song_files)
+
+    try:
+        for song_file, file_count in zip(song_files, file_counts):
+            if file_count is None:
+                failed.append(song_file)
+                continue
+
+            start = len(file_ids)
+            end = start + len(file_count.file_ids)
+            if end > len(counts):
+                rows = max(end, 2 * len(counts))
+                counts = np.resize(counts, (rows, counts.shape[1]))
+                note_counts = np.resize(note_counts, rows)
+                durations = np.resize(durations, rows)
+
+            counts[start:end] = file_count.counts
+            note_counts[start:end] = file_count.note_counts
+            durations[start:end] = file_count.durations
+            file_ids += file_count.file_ids
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    rows = len(file_ids)
+    counts = counts[:rows].astype(np.float64)
+
+    # Tracks without notes have rates and densities of 0:
+    rates = np.divide(
+        counts,
+        note_counts[:rows, None],
+        out=np.zeros_like(counts),
+        where=note_counts[:rows, None] > 0,
+    )
+    densities = np.divide(
+        counts,
+        durations[:rows, None],
+        out=np.zeros_like(counts),
+        where=durations[:rows, None] > 0,
+    )
+
+    # the rate and density columns of each feature are next to each other:
+    values = np.empty((rows, 2 * len(adornment_feature_names)), dtype=np.float64)
+    values[:, 0::2] = rates
+    values[:, 1::2] = densities
+
+    feature_table = FeatureTable(file_ids, feature_table_header[1:], values, failed)
+
+    if output_file is not None:
+        save_feature_table(feature_table, output_file)
+
+    return feature_table
+
+
+def save_feature_table(feature_table, output_file):
+    """
+    Save the FeatureTable as a .npz file, with an array for the
+    file ids, the column names and the (tracks x columns) values.
+    """
+    np.savez(
+        output_file,
+        file_ids=np.array(feature_table.file_ids, dtype=str),
+        columns=np.array(feature_table.columns, dtype=str),
+        values=feature_table.values,
+        failed=np.array(feature_table.failed, dtype=str),
+    )
+
+
+def load_feature_table(feature_table_file):
+    """
+    Load a FeatureTable saved with save_feature_table.
+    """
+    with np.load(feature_table_file) as data:
+        return FeatureTable(
+            data["file_ids"].tolist(),
+            data["columns"].tolist(),
+            data["values"],
+            data["failed"].tolist(),
+        )
+
+
+def feature_table_rows(feature_table):
+    """
+    The FeatureTable as a list of rows with the header first,
+    the same format as calculate_features_table_multiple_songs.
+    """
+    rows = [["file.id"] + list(feature_table.columns)]
+    for file_id, values in zip(feature_table.file_ids, feature_table.values.tolist()):
+        rows.append([file_id] + values)
+    return rows
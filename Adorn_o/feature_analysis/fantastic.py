@@ -0,0 +1,608 @@
+"""
+NumPy version of the FANTASTIC features used by the database,
+so the features can be computed without R.
+
+The functions follow the R functions in FANTASTIC/ that
+compute.features uses (Feature_Value_Summary_Statistics.R and
+M-Type_Summary_Statistics.R) and keep their behaviour, e.g. i.mode
+and d.mode are the position of the most frequent value in the sorted
+values, not the value itself, so the features are the same as the
+ones computed with R.
+
+Melodies are note tables with the columns of the melconv mcsv
+files, see calculate_functions.note_table_header.
+"""
+
+from collections import OrderedDict
+
+# 3rd party imports
+import numpy as np
+
+phrase_length_limits = (2, 24)
+n_limits = (1, 5)
+
+major_weights = np.array(
+    [6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88]
+)
+minor_weights = np.array(
+    [6.33, 2.68, 3.52, 5.38, 2.6, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17]
+)
+
+# classes of the intervals from -12 to 12 semitones:
+interval_classes = (
+    "d8 d7 d7 d6 d6 d5 dt d4 d3 d3 d2 d2 s1 u2 u2 u3 u3 u4 ut u5 u6 u6 u7 u7 u8"
+).split()
+time_ratio_limits = [0.8118987, 1.4945858]
+time_ratio_classes = ["q", "e", "l"]
+
+m_type_feature_names = [
+    "mean.entropy",
+    "mean.productivity",
+    "mean.Simpsons.D",
+    "mean.Yules.K",
+    "mean.Sichels.S",
+    "mean.Honores.H",
+]
+factor_feature_names = ["mode", "h.contour", "int.cont.glob.dir", "int.contour.class"]
+summary_feature_names = [
+    "p.range",
+    "p.entropy",
+    "p.std",
+    "i.abs.range",
+    "i.abs.mean",
+    "i.abs.std",
+    "i.mode",
+    "i.entropy",
+    "d.range",
+    "d.median",
+    "d.mode",
+    "d.entropy",
+    "d.eq.trans",
+    "d.half.trans",
+    "d.dotted.trans",
+    "len",
+    "glob.duration",
+    "note.dens",
+    "tonalness",
+    "tonal.clarity",
+    "tonal.spike",
+    "mode",
+    "h.contour",
+    "int.cont.glob.dir",
+    "int.cont.grad.mean",
+    "int.cont.grad.std",
+    "int.cont.dir.change",
+    "int.contour.class",
+    "step.cont.glob.var",
+    "step.cont.glob.dir",
+    "step.cont.loc.var",
+]
+
+# the columns in the order compute.features returns them:
+feature_names = (
+    m_type_feature_names
+    + [name for name in summary_feature_names if name not in factor_feature_names]
+    + factor_feature_names
+)
+
+# note table columns:
+ONSET = 0
+PITCH = 5
+DURS = 6
+DUR16 = 8
+TEMPERLEY = 13
+
+
+def read_mcsv(mcsv_file):
+    """
+    Read the notes of a melconv mcsv file into a note table,
+    like the read.table call in compute.features.
+
+    Returns
+    -------
+    2D numpy array
+        a row for each note with the first 15 columns of the file
+    """
+    with open(mcsv_file, "r") as mcsv:
+        lines = mcsv.read().splitlines()
+
+    note_table = [
+        [float(value.replace(",", ".")) for value in line.split(";")[:15]]
+        for line in lines[2:]
+        if line.strip() != ""
+    ]
+    return np.array(note_table, dtype=np.float64).reshape(-1, 15)
+
+
+def standard_deviation(values):
+    """Sample standard deviation, nan for less than 2 values as R's sd"""
+    if len(values) < 2:
+        return np.nan
+    return np.std(values, ddof=1)
+
+
+def correlation(x, y):
+    """Pearson correlation, nan if either has no variance as R's cor"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    x = x - x.mean()
+    y = y - y.mean()
+    denominator = np.sqrt((x * x).sum() * (y * y).sum())
+    if denominator == 0:
+        return np.nan
+    return (x * y).sum() / denominator
+
+
+def compute_entropy(values, alphabet_size):
+    """Entropy of the values, normalised by the alphabet size"""
+    counts = np.unique(values, return_counts=True)[1]
+    probabilities = counts / counts.sum()
+    return -(probabilities * np.log2(probabilities)).sum() / np.log2(alphabet_size)
+
+
+def mode_position(values):
+    """
+    Position (from 1) of the most frequent value in the sorted values,
+    the last one if several values are the most frequent.
+    """
+    counts = np.unique(values, return_counts=True)[1]
+    return np.flatnonzero(counts == counts.max())[-1] + 1
+
+
+def tonal_weights(weights):
+    """The key weights for each of the 12 tonics"""
+    return np.array([np.roll(weights, tonic) for tonic in range(12)])
+
+
+def compute_tonality_vector(pitch, dur16):
+    """
+    Correlation of the duration weighted pitch classes with the
+    major and then the minor key weights for each tonic.
+    """
+    pitch_class_weights = np.zeros(12)
+    np.add.at(pitch_class_weights, np.mod(pitch, 12).astype(int), pitch * dur16)
+
+    key_weights = np.vstack(
+        [tonal_weights(major_weights), tonal_weights(minor_weights)]
+    )
+    return np.array(
+        [correlation(weights, pitch_class_weights) for weights in key_weights]
+    )
+
+
+def compute_tonal_features(tonality_vector):
+    A0 = np.max(tonality_vector)
+    A1 = np.sort(tonality_vector)[::-1][1]
+    tonal_spike = A0 / tonality_vector[tonality_vector > 0].sum()
+    if np.flatnonzero(tonality_vector == A0)[0] >= 12:
+        mode = "minor"
+    else:
+        mode = "major"
+    return A0, A0 / A1, tonal_spike, mode
+
+
+def huron_contour(pitch):
+    first = pitch[0]
+    last = pitch[-1]
+    average = np.round(np.mean(pitch[1:-1]))
+
+    if first < average and average > last:
+        return "convex"
+    elif first < average and average == last:
+        return "asc-horiz"
+    elif first < average and average < last:
+        return "ascending"
+    elif first == average and average == last:
+        return "horizontal"
+    elif first == average and average < last:
+        return "horiz-asc"
+    elif first == average and average > last:
+        return "horiz-desc"
+    elif first > average and average < last:
+        return "concave"
+    elif first > average and average == last:
+        return "desc-horiz"
+    return "descending"
+
+
+def line_contour(onset, pitch):
+    """
+    Gradients of the lines between the contour turning points,
+    each repeated by the length of the line in tenths of a second.
+    """
+    note_count = len(pitch)
+    candidate_onsets = [onset[0]]
+
+    if note_count == 3 or note_count == 4:
+        for i in range(1, note_count - 1):
+            if (pitch[i] > pitch[i - 1] and pitch[i] > pitch[i + 1]) or (
+                pitch[i] < pitch[i - 1] and pitch[i] < pitch[i + 1]
+            ):
+                candidate_onsets.append(onset[i])
+    else:
+        for i in range(2, note_count - 2):
+            if (
+                (pitch[i - 1] < pitch[i] and pitch[i] > pitch[i + 1])
+                or (pitch[i - 1] > pitch[i] and pitch[i] < pitch[i + 1])
+                or (
+                    pitch[i - 1] == pitch[i]
+                    and pitch[i - 2] < pitch[i]
+                    and pitch[i] > pitch[i + 1]
+                )
+                or (
+                    pitch[i - 1] < pitch[i]
+                    and pitch[i] == pitch[i + 1]
+                    and pitch[i + 2] > pitch[i]
+                )
+                or (
+                    pitch[i - 1] == pitch[i]
+                    and pitch[i - 2] > pitch[i]
+                    and pitch[i] < pitch[i + 1]
+                )
+                or (
+                    pitch[i - 1] > pitch[i]
+                    and pitch[i] == pitch[i + 1]
+                    and pitch[i + 2] < pitch[i]
+                )
+            ):
+                candidate_onsets.append(onset[i])
+
+    turning_pitches = [pitch[0]]
+    turning_onsets = [onset[0]]
+    if len(candidate_onsets) > 2:
+        for i in range(1, note_count - 1):
+            if onset[i] in candidate_onsets and pitch[i - 1] != pitch[i + 1]:
+                turning_pitches.append(pitch[i])
+                turning_onsets.append(onset[i])
+    turning_pitches.append(pitch[-1])
+    turning_onsets.append(onset[-1])
+
+    durations = np.diff(turning_onsets)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gradients = np.diff(turning_pitches) / durations
+
+    return np.repeat(gradients, np.round(10 * durations).astype(int))
+
+
+def compute_int_cont_features(gradients):
+    n_grad_changes = np.abs(np.sign(np.diff(gradients))).sum()
+    glob_dir = "%d" % np.sign(gradients.sum())
+    grad_mean = np.abs(gradients).mean()
+    grad_std = standard_deviation(gradients)
+
+    signs = np.sign(gradients[:-1] * gradients[1:])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dir_change = np.abs(signs[signs == -1].sum()) / n_grad_changes
+    if np.isnan(dir_change):
+        dir_change = 0
+
+    # the gradients at 4 evenly spaced points, using the
+    # last gradient at or before the point like R's approx:
+    points = 1 + np.arange(4) * (len(gradients) - 1) / 3.0
+    points[-1] = len(gradients)
+    reduced = gradients[np.floor(points).astype(int) - 1] / 4
+
+    classes = np.zeros(4, dtype=int)
+    classes[reduced >= 0.45] = 1
+    classes[reduced >= 1.45] = 2
+    classes[reduced <= -0.45] = -1
+    classes[reduced <= -1.45] = -2
+    contour_class = "".join("abcde"[c + 2] for c in classes)
+
+    return grad_mean, grad_std, dir_change, glob_dir, contour_class
+
+
+def step_contour(pitch, dur16):
+    """Pitches repeated by their duration, normalised to 64 steps"""
+    steps = np.round(dur16 / dur16.sum() * 64).astype(int)
+    if np.count_nonzero(steps > 0) < 2:
+        steps = steps + 1
+    return np.repeat(pitch, steps)
+
+
+def compute_step_cont_features(step_contour_vector):
+    glob_var = standard_deviation(step_contour_vector)
+    loc_var = np.abs(np.diff(step_contour_vector)).mean()
+    if loc_var == 0:
+        glob_dir = 0.0
+    else:
+        glob_dir = correlation(
+            step_contour_vector, np.arange(1, len(step_contour_vector) + 1)
+        )
+    return glob_var, glob_dir, loc_var
+
+
+def summary_phrase_features(phrase):
+    """
+    The summary features of a phrase, as summary.phr.features.
+
+    Parameters
+    ---------
+    phrase : 2D numpy array
+        the note table of a phrase with at least 3 notes
+
+    Returns
+    -------
+    OrderedDict
+        feature name to value, with the features in summary_feature_names
+    """
+    onset = phrase[:, ONSET]
+    pitch = phrase[:, PITCH]
+    durs = phrase[:, DURS]
+    dur16 = phrase[:, DUR16]
+
+    intervals = np.diff(pitch)
+    abs_intervals = np.abs(intervals)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d_ratios = np.round(dur16[:-1] / dur16[1:], 2)
+    length = len(pitch)
+    glob_duration = onset[-1] - onset[0]
+
+    tonalness, tonal_clarity, tonal_spike, mode = compute_tonal_features(
+        compute_tonality_vector(pitch, dur16)
+    )
+    (
+        grad_mean,
+        grad_std,
+        dir_change,
+        int_cont_glob_dir,
+        int_contour_class,
+    ) = compute_int_cont_features(line_contour(onset, pitch))
+    step_glob_var, step_glob_dir, step_loc_var = compute_step_cont_features(
+        step_contour(pitch, dur16)
+    )
+
+    features = OrderedDict()
+    features["p.range"] = pitch.max() - pitch.min()
+    features["p.entropy"] = compute_entropy(pitch, 24)
+    features["p.std"] = standard_deviation(pitch)
+    features["i.abs.range"] = abs_intervals.max() - abs_intervals.min()
+    features["i.abs.mean"] = abs_intervals.mean()
+    features["i.abs.std"] = standard_deviation(abs_intervals)
+    features["i.mode"] = mode_position(intervals)
+    features["i.entropy"] = compute_entropy(intervals, 23)
+    features["d.range"] = durs.max() - durs.min()
+    features["d.median"] = np.median(dur16)
+    features["d.mode"] = mode_position(dur16)
+    features["d.entropy"] = compute_entropy(dur16, 24)
+    features["d.eq.trans"] = np.count_nonzero(d_ratios == 1) / float(len(d_ratios))
+    features["d.half.trans"] = (
+        np.count_nonzero(d_ratios == 0.5) + np.count_nonzero(np.round(d_ratios) == 2)
+    ) / float(len(d_ratios))
+    features["d.dotted.trans"] = (
+        np.count_nonzero(d_ratios == 1 / 3.0)
+        + np.count_nonzero(np.round(d_ratios) == 3)
+    ) / float(len(d_ratios))
+    features["len"] = length
+    features["glob.duration"] = glob_duration
+    features["note.dens"] = length / glob_duration
+    features["tonalness"] = tonalness
+    features["tonal.clarity"] = tonal_clarity
+    features["tonal.spike"] = tonal_spike
+    features["mode"] = mode
+    features["h.contour"] = huron_contour(pitch)
+    features["int.cont.glob.dir"] = int_cont_glob_dir
+    features["int.cont.grad.mean"] = grad_mean
+    features["int.cont.grad.std"] = grad_std
+    features["int.cont.dir.change"] = dir_change
+    features["int.contour.class"] = int_contour_class
+    features["step.cont.glob.var"] = step_glob_var
+    features["step.cont.glob.dir"] = step_glob_dir
+    features["step.cont.loc.var"] = step_loc_var
+    return features
+
+
+def make_phrases(note_table):
+    """
+    Split the note table into phrases that end at the notes with a
+    temperley boundary. Notes after the last boundary are not used.
+    """
+    boundaries = np.flatnonzero(note_table[:, TEMPERLEY] == 1)
+    if len(boundaries) == 0:
+        return [note_table]
+    starts = np.concatenate([[0], boundaries[:-1] + 1])
+    return [note_table[start : end + 1] for start, end in zip(starts, boundaries)]
+
+
+def phrase_length_allowed(phrase):
+    return phrase_length_limits[0] < len(phrase) < phrase_length_limits[1]
+
+
+def interval_class(interval):
+    if interval < -12:
+        return "dl"
+    if interval > 12:
+        return "ul"
+    return interval_classes[int(interval) + 12]
+
+
+def time_ratio_class(time_ratio):
+    for limit, symbol in zip(time_ratio_limits, time_ratio_classes):
+        if time_ratio < limit:
+            return symbol
+    return time_ratio_classes[-1]
+
+
+def count_ngrams(phrases, min_n=n_limits[0], max_n=n_limits[1]):
+    """
+    Count the m-type n-grams of the pitch interval and duration ratio
+    classes in the phrases.
+
+    Returns
+    -------
+    OrderedDict
+        n-gram to the number of times it occurs in all the phrases
+    """
+    ngram_counts = OrderedDict()
+    for phrase in phrases:
+        durs = phrase[:, DURS]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            time_ratios = durs[1:] / durs[:-1]
+        m_types = [
+            interval_class(interval) + time_ratio_class(time_ratio)
+            for interval, time_ratio in zip(np.diff(phrase[:, PITCH]), time_ratios)
+        ]
+        for n in range(min_n, min(max_n, len(m_types)) + 1):
+            for start in range(len(m_types) - n + 1):
+                ngram = "_".join(m_types[start : start + n])
+                ngram_counts[ngram] = ngram_counts.get(ngram, 0) + 1
+    return ngram_counts
+
+
+def set_value(values, n, value):
+    """values[n] <- value with R's 1-based indexing, extending with NA"""
+    while len(values) < n:
+        values.append(np.nan)
+    values[n - 1] = value
+
+
+def compute_m_type_features(ngram_counts):
+    """
+    The m-type summary features of the n-gram counts, as
+    compute.features.from.ngram.table.main.
+
+    Returns
+    -------
+    OrderedDict
+        feature name to value, with the features in m_type_feature_names
+    """
+    ngram_lengths = np.array([ngram.count("_") + 1 for ngram in ngram_counts])
+    counts = np.array(list(ngram_counts.values()), dtype=np.float64)
+    min_n = ngram_lengths.min()
+    max_n = ngram_lengths.max()
+
+    entropy = []
+    productivity = []
+    simpsons_d = [0.0] * (max_n - min_n + 1)
+    yules_k = [0.0] * (max_n - min_n + 1)
+    sichels_s = [0.0] * (max_n - min_n + 1)
+    honores_h = [0.0] * (max_n - min_n + 1)
+
+    for n in range(min_n, max_n + 1):
+        n_counts = counts[ngram_lengths == n]
+        total = n_counts.sum()
+
+        if total == 1:
+            set_value(entropy, n, 0.0)
+        else:
+            probabilities = n_counts / total
+            set_value(
+                entropy,
+                n,
+                -(probabilities * np.log2(probabilities)).sum() / np.log2(total),
+            )
+        set_value(productivity, n, n_counts[n_counts == 1].sum() / total)
+
+        # frequency spectrum, the number of n-grams (Vm)
+        # that occur each number of times (m):
+        m, Vm = np.unique(n_counts, return_counts=True)
+        # FANTASTIC uses the position in the spectrum
+        # instead of m for Simpson's D and Yule's K:
+        position = np.arange(1, len(m) + 1)
+
+        if total == 1:
+            simpsons_d = [0.0]
+        else:
+            set_value(
+                simpsons_d,
+                n,
+                (Vm * (position / total) * ((position - 1) / (total - 1))).sum(),
+            )
+        set_value(
+            yules_k, n, 10000 * (((Vm * position**2).sum() - total) / total**2)
+        )
+        if np.any(m == 2):
+            set_value(sichels_s, n, Vm[m == 2].sum() / float(Vm.sum()))
+        else:
+            set_value(sichels_s, n, 0.0)
+        if np.any(m == 1):
+            set_value(
+                honores_h,
+                n,
+                100 * (np.log(total) - Vm[m == 1].sum() / float(Vm.sum())),
+            )
+        else:
+            set_value(honores_h, n, 0.0)
+
+    features = OrderedDict()
+    for name, values in zip(
+        m_type_feature_names,
+        [entropy, productivity, simpsons_d, yules_k, sichels_s, honores_h],
+    ):
+        features[name] = np.mean(values)
+    return features
+
+
+def most_frequent(values):
+    """
+    The most frequent value, the first in sorted order if several
+    values are the most frequent, or None if there are no values.
+    """
+    values = [value for value in values if value is not None]
+    if values == []:
+        return None
+    unique_values = sorted(set(values))
+    counts = [values.count(value) for value in unique_values]
+    return unique_values[counts.index(max(counts))]
+
+
+def compute_features(note_table):
+    """
+    Compute the FANTASTIC features of a melody, as compute.features
+    with use.segmentation=TRUE.
+
+    The melody is split into phrases at the temperley boundaries, the
+    summary features of the phrases with 3 to 23 notes are averaged
+    (the most frequent value is used for the text features) and the
+    m-type features are computed from the n-grams of the same phrases.
+
+    Parameters
+    ---------
+    note_table : 2D array
+        a row for each note, see calculate_functions.note_table_header
+
+    Returns
+    -------
+    OrderedDict
+        feature name to value, with the features in feature_names,
+        or None if the features can't be computed for the melody.
+    """
+    note_table = np.array(note_table, dtype=np.float64).reshape(-1, 15)
+    if len(note_table) < 2 or np.any(np.diff(note_table[:, ONSET]) < 0):
+        return None
+
+    phrases = [
+        phrase for phrase in make_phrases(note_table) if phrase_length_allowed(phrase)
+    ]
+    if phrases == []:
+        return None
+
+    phrase_features = [summary_phrase_features(phrase) for phrase in phrases]
+
+    features = compute_m_type_features(count_ngrams(phrases))
+    for name in summary_feature_names:
+        if name not in factor_feature_names:
+            features[name] = np.nanmean([p_f[name] for p_f in phrase_features])
+    for name in factor_feature_names:
+        features[name] = most_frequent([p_f[name] for p_f in phrase_features])
+    return features
+
+
+def compute_features_for_files(mcsv_file_list):
+    """
+    Compute the FANTASTIC features for melconv mcsv files.
+
+    Returns
+    -------
+    list of lists
+        a row for each file that features could be computed for,
+        the file.id followed by the features in feature_names
+    """
+    rows = []
+    for mcsv_file in mcsv_file_list:
+        features = compute_features(read_mcsv(mcsv_file))
+        if features is None:
+            continue
+        file_id = mcsv_file.split("/")[-1].split(".")[0]
+        rows.append([file_id] + list(features.values()))
+    return rows
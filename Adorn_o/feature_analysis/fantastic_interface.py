@@ -6,13 +6,90 @@ http://www.doc.gold.ac.uk/isms/m4s/FANTASTIC_docs.pdf
 # Standard library imports
 import os
 import pkg_resources
+from collections import OrderedDict
 
 # 3rd party imports
 import rpy2.robjects as robjects
 
+# Local application imports
+from ..parser.API.calculate_functions import note_table_header
+
 # Set the default folder with the FANTASTIC R scripts
 FANTASTIC_folder = pkg_resources.resource_filename(__name__, "FANTASTIC")
 
+# compute.features (melody-wise) for a note table dataframe
+# that has the columns of an mcsv file, rather than the mcsv file:
+note_table_functions = """
+    make.phrases.from.note.table <- function(mel.data,file.id,line1="") {
+        mel.data <- mel.data[,1:15]
+        mel.list <- list(line1=line1)
+        if(sum(mel.data$temperley)<1){
+            mel.list[[paste("file",file.id,"single_phrase",sep="-")]] <- mel.data
+            }
+        else{
+            boundaries <- which(mel.data$temperley==1)
+            start <- 1
+            for(i in seq(along=boundaries)) {
+                end <- boundaries[i]
+                mel.list[[paste("file",file.id,"ph",i,sep="-")]] <- mel.data[start:end,]
+                start <- end+1
+                }
+            }
+        mel.list
+        }
+
+    n.grams.from.phrase.list <- function(phr.list,n.lim=n.limits,phr.length.lim=phr.length.limits) {
+        excludes <- make.excludes(phr.length.lim,phr.list)
+        if(length(excludes) >= length(phr.list)) {
+            ngrams.mel.tab.collapsed <- NA}
+        else{
+            diff.phr.list <- diff.transform(phr.list[-excludes])
+            class.diff.phr.list <- class.transform(diff.phr.list)
+            ngram.phr.list <- create.ngram.hash(class.diff.phr.list)
+            ngrams.mel.tab <- count.ngrams.in.melody(ngram.phr.list,n.lim[1],n.lim[2])
+            ngrams.mel.tab.collapsed <- tapply(ngrams.mel.tab$Freq, ngrams.mel.tab$ngram, sum)
+            ngrams.mel.tab.collapsed <- data.frame(ngram=names(ngrams.mel.tab.collapsed),count=ngrams.mel.tab.collapsed)
+            rownames(ngrams.mel.tab.collapsed) <- NULL
+            }
+        ngrams.mel.tab.collapsed
+        }
+
+    compute.features.from.note.table <- function(mel.data,file.id,use.segmentation=TRUE) {
+        mel.data <- mel.data[,1:15]
+        tonsets <- mel.data[,"onset"]
+        if(length(tonsets) < 2) return(NULL)
+        if(any((tonsets[2:length(tonsets)]-tonsets[1:(length(tonsets)-1)])<0)) {
+            print("Onsets not  monotonically positive")
+            return(NULL)}
+
+        phrase.list <- make.phrases.from.note.table(mel.data,file.id)
+        sum.feat <- NULL
+        if(use.segmentation==TRUE) {
+            for(j in 1:(length(phrase.list)-1)){
+                phr.length <- length(phrase.list[[j+1]][,"pitch"])
+                if(phr.length <= phr.length.limits[1] | phr.length >= phr.length.limits[2]) {
+                    if(j==1) next
+                    summary.features <- matrix(NA,1,length(colnames(summary.features)),dimnames=list((j),colnames(summary.features)))
+                    sum.feat <- rbind(sum.feat,summary.features)}
+                else{
+                    summary.features <- summary.phr.features(phrase.list[[j+1]])
+                    sum.feat <- rbind(sum.feat,summary.features)
+                    }
+                }
+            }
+        else{
+            summary.features <- summary.phr.features(mel.data,poly.contour=FALSE)
+            sum.feat <- rbind(sum.feat,summary.features)
+            }
+
+        ngram.mel.features <- data.frame(file.id,compute.features.from.ngram.table.main(n.grams.from.phrase.list(phrase.list)))
+        factors <- which(sapply(sum.feat,is.factor))
+        m.sum.feat <- matrix(apply(sum.feat[,-factors],2, function(x) mean(x,na.rm=TRUE)),nrow=1,ncol=length(colnames(sum.feat)[-factors]),dimnames=list(1,colnames(sum.feat)[-factors]))
+        m.freq.sum.feat <- matrix(apply(sum.feat[,factors],2, function(x) names(which(table(x)==max(table(x)))[1])), nrow=1,ncol=length(colnames(sum.feat)[factors]),dimnames=list(1,colnames(sum.feat)[factors]))
+        data.frame(ngram.mel.features,m.sum.feat,m.freq.sum.feat)
+        }
+"""
+
 
 def load(fantastic_dir=FANTASTIC_folder):
     """
@@ -30,6 +107,7 @@ def load(fantastic_dir=FANTASTIC_folder):
          source('Fantastic.R')
          """
     )
+    robjects.r(note_table_functions)
     # return to the original working directory.
     robjects.r["setwd"](working_directory)
 
@@ -46,6 +124,35 @@ def compute_features(mcsv_file_list, write_out=True):
     return robjects.r["compute.features"](mcsv_file_list, write_out=write_out)
 
 
+def note_table_dataframe(note_table):
+    """
+    Make an R dataframe of the note table (a list of rows with the
+    values of the note_table_header columns), see
+    parser.API.calculate_functions.calculate_note_table_for_measure_note_list
+    """
+    return robjects.DataFrame(
+        OrderedDict(
+            (
+                column_name,
+                robjects.FloatVector([float(row[column]) for row in note_table]),
+            )
+            for column, column_name in enumerate(note_table_header)
+        )
+    )
+
+
+def compute_features_for_note_table(note_table, file_id):
+    """
+    Compute the fantastic features for a note table in memory,
+    instead of an mcsv file, the file.id of the features is file_id.
+    """
+    assert isinstance(note_table, list), "Must be a list of note table rows"
+
+    return robjects.r["compute.features.from.note.table"](
+        note_table_dataframe(note_table), file_id
+    )
+
+
 def compute_features_folder(mcsv_folder, write_out=True):
     """
     Compute the fantastic features for the mcsv files in mcsv_folder
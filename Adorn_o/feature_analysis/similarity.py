@@ -5,11 +5,15 @@ analysed from FANTASTIC and SynPy
 import glob
 import os
 import csv
+from collections import OrderedDict
 
 # 3rd party imports
+import numpy as np
+import pandas as pd
 import rpy2.robjects as robjects
 
 # Local application imports
+from . import fantastic
 from . import fantastic_interface
 from . import synpy_interface
 from ..parser.API import calculate_functions as calculate
@@ -114,6 +118,132 @@ def merge_synpy_and_fantastic_features(
         return False
 
 
+def merge_synpy_and_fantastic_features_for_measures(
+    note_tables, rhy_lines_list, file_ids
+):
+    """
+    Compute the FANTASTIC features for the note tables in note_tables
+    and the SynPy features for the .rhy file lines in rhy_lines_list,
+    combine both into a single dataframe, like
+    merge_synpy_and_fantastic_features but without any files.
+
+    The FANTASTIC features are computed with the NumPy version in
+    fantastic, so Fantastic.R doesn't need to be loaded.
+
+    Parameters
+    ---------
+    note_tables : list
+        note tables, see
+        calculate_functions.calculate_note_table_for_measure_note_list
+
+    rhy_lines_list : list
+        lines of the .rhy files, see
+        calculate_functions.calculate_rhy_lines_for_measure
+
+    file_ids : list of strings
+        the file.id for each note table and rhy lines
+
+    Returns
+    ------
+    pandas dataframe, or False if the features could not be merged
+    """
+    fantastic_features, synpy_features = compute_synpy_and_fantastic_features(
+        note_tables, rhy_lines_list, file_ids
+    )
+    return merge_feature_rows(fantastic_features, synpy_features)
+
+
+def compute_synpy_and_fantastic_features(note_tables, rhy_lines_list, file_ids):
+    """
+    Compute the FANTASTIC and SynPy features for the measures,
+    see merge_synpy_and_fantastic_features_for_measures.
+    This doesn't use R, so it can be used in worker processes.
+
+    Returns
+    ------
+    fantastic_features, synpy_features : lists
+        rows of the file.id followed by the features, measures
+        that FANTASTIC can't analyse don't have a fantastic row.
+    """
+    assert len(note_tables) == len(rhy_lines_list) == len(file_ids)
+
+    synpy_features = [
+        synpy_interface.compute_features_for_rhy_lines(rhy_lines, file_id)
+        for rhy_lines, file_id in zip(rhy_lines_list, file_ids)
+    ]
+
+    fantastic_features = []
+    for note_table, file_id in zip(note_tables, file_ids):
+        features = fantastic.compute_features(note_table)
+        if features is None:
+            print("Error when analysing %s" % file_id)
+        else:
+            fantastic_features.append([file_id] + list(features.values()))
+
+    return fantastic_features, synpy_features
+
+
+def merge_feature_rows(fantastic_features, synpy_features):
+    """
+    Merge the rows from compute_synpy_and_fantastic_features
+    into a single dataframe, sorted by file.id like R's merge.
+
+    Returns
+    ------
+    pandas dataframe, or False if the features could not be merged
+    """
+    if fantastic_features == []:
+        print("could not merge feature table")
+        return False
+
+    return feature_dataframe(
+        ["file.id"] + fantastic.feature_names, fantastic_features
+    ).merge(
+        feature_dataframe(synpy_interface.feature_table_header(), synpy_features),
+        on="file.id",
+        sort=True,
+    )
+
+
+def feature_dataframe(header, rows):
+    """
+    Make a pandas dataframe from rows of feature values,
+    None values are NA.
+    """
+    return pd.DataFrame(rows, columns=header)
+
+
+def features_from_dataframe(feature_df):
+    """
+    Convert the first row of a feature dataframe to
+    a list of the feature names, a numpy array of the values,
+    (nan for text and NA values) and a boolean array that is
+    True where the value is text.
+    """
+    names = list(feature_df.columns)
+    values = []
+    text = []
+    for value in feature_df.iloc[0]:
+        if isinstance(value, (bool, np.bool_)):
+            values.append(np.nan)
+            text.append(True)
+        elif isinstance(value, str):
+            try:
+                values.append(float(value))
+                text.append(False)
+            except ValueError:
+                values.append(np.nan)
+                text.append(True)
+        elif pd.isna(value):
+            values.append(np.nan)
+            text.append(False)
+        else:
+            values.append(float(value))
+            text.append(False)
+
+    return names, np.array(values, dtype=np.float64), np.array(text, dtype=bool)
+
+
 def add_to_feature_table(mcsv_file_list, rhy_file_list, feature_table):
     """
     Add compute the FANTASTIC features for the mcsv files in mcvs_file_list
@@ -274,18 +404,26 @@ def read_in_feature_dataframe(feature_dataframe):
 
 
 def combine_synpy_and_fantastic_features_for_two_notes(
-    measure, two_notes, rhy_file, r_data_frame=False, save_table=False
+    measure, two_notes, rhy_file, r_data_frame=False, save_table=False, file_id=None
 ):
     """Compute the FANTASTIC features for the 2 notes in the measure,
     then combine these with the SynPy Features.
 
+    rhy_file can be a .rhy file or the lines of a .rhy file,
+    (calculate_functions.calculate_rhy_lines_for_measure)
+    with the file_id to use for the features.
     """
 
     FANTASTIC_features = calculate.calculate_FANTASTIC_features_for_note_pair(
         two_notes[0], two_notes[1], measure
     )
 
-    SynPy_features = synpy_interface.compute_features(rhy_file)
+    if isinstance(rhy_file, list):
+        SynPy_features = synpy_interface.compute_features_for_rhy_lines(
+            rhy_file, file_id
+        )
+    else:
+        SynPy_features = synpy_interface.compute_features(rhy_file)
 
     # combine: chunk_FANTASTIC_features + chunk_SynPy_features
     # then return the list:
@@ -334,17 +472,13 @@ def combine_synpy_and_fantastic_features_for_two_notes(
         ]
 
         # write out the csv file that combines that features.
-        with open("2_note_features.csv", mode="w") as csv_file:
-            feature_writer = csv.writer(csv_file)
-            feature_writer.writerow(feature_header)
-            feature_writer.writerow(combined_features)
-        # read in the csvfile as a dataframe and find most similar.
-        feature_df = read_in_feature_dataframe("2_note_features.csv")
-
-        if os.path.isfile("2_note_features.csv") and not save_table:
-            os.remove("2_note_features.csv")
+        if save_table:
+            with open("2_note_features.csv", mode="w") as csv_file:
+                feature_writer = csv.writer(csv_file)
+                feature_writer.writerow(feature_header)
+                feature_writer.writerow(combined_features)
 
-        return feature_df
+        return feature_dataframe(feature_header, [combined_features])
 
     else:
         return combined_features
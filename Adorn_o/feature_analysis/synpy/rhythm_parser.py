@@ -41,6 +41,11 @@ def discard_linereturns(line):
 def read_rhythm(fileName):
     fileContent = open(fileName, "r")
     print(fileContent)
+    return read_rhythm_lines(fileContent)
+
+
+# Parse the lines of a rhythm file that is already in memory
+def read_rhythm_lines(fileContent):
     barList = BarList()
 
     tempo = None
@@ -95,15 +95,36 @@ def compute_features(
     return syncopation_features
 
 
-def make_feature_table(
-    RHY_files,
-    output="synpy_features.csv",
-    features=["mean_syncopation_per_bar"],
-    models=models_all,
-    save=True,
-    byBar=True,
+def compute_features_for_rhy_lines(
+    rhy_lines, file_id, features=["mean_syncopation_per_bar"], models=models_all
 ):
+    """
+    Compute the features for the lines of a .rhy file that is in memory,
+    see parser.API.calculate_functions.calculate_rhy_lines_for_measure,
+    the bars are parsed as they would be from the file.
+    """
+    synpy_bars = synpy.rhythm_parser.read_rhythm_lines(rhy_lines)
+
+    syncopation_features = []
+    syncopation_features.append(file_id)
+
+    for m in models:
+        try:
+            s = synpy.calculate_syncopation(txt2models.get(m), synpy_bars)
+        except:
+            print("Error cannot analyse skipping.. a bar of %s" % file_id)
+            s = {}
+            for feature in features:
+                s[feature] = None
+
+        for f in features:
+            syncopation_features.append(s.get(f))
+
+    return syncopation_features
+
 
+def feature_table_header(features=["mean_syncopation_per_bar"], models=models_all):
+    """The header of the table made by make_feature_table"""
     header = []
     header.append("file.id")
 
@@ -112,6 +133,20 @@ def make_feature_table(
             col_title = m + "." + f
             header.append(col_title)
 
+    return header
+
+
+def make_feature_table(
+    RHY_files,
+    output="synpy_features.csv",
+    features=["mean_syncopation_per_bar"],
+    models=models_all,
+    save=True,
+    byBar=True,
+):
+
+    header = feature_table_header(features, models)
+
     data = []
     data.append(header)
 
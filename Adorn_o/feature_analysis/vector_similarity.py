@@ -0,0 +1,261 @@
+"""
+NumPy versions of the feature similarity functions used to
+find candidate sets (the R get.candidate.set functions).
+
+Features are rows of float arrays, text feature values (e.g. "major")
+are nan. The R functions z-transform only the numeric columns and
+text columns are used as they are by dist, which treats the text
+as NA and scales up the sum of squares for the missing values.
+These functions do the same.
+"""
+
+# Standard library imports
+import warnings
+
+# 3rd party imports
+import numpy as np
+
+
+def ztransform(features, numeric_columns=None):
+    """
+    Standardise the columns of features to have mean 0 and standard
+    deviation of 1, ignoring nan values, as FANTASTIC's ztransform.
+
+    Parameters
+    ---------
+    features : 2D numpy array
+        rows of feature values, or a stack of 2D arrays
+        (e.g. a 3D array) that are each standardised separately
+
+    numeric_columns : boolean numpy array, optional
+        the columns to standardise, (default is all of them),
+        it is broadcast against features
+
+    Returns
+    -------
+    numpy array
+        the standardised features
+    """
+    features = np.array(features, dtype=np.float64)
+    if numeric_columns is None:
+        numeric_columns = np.ones(features.shape[-1], dtype=bool)
+
+    present = ~np.isnan(features)
+    count = present.sum(axis=-2, keepdims=True)
+    # C ordered, so the sums add up the rows in the same order for
+    # a stack of arrays as for a single array:
+    values = np.ascontiguousarray(np.where(present, features, 0.0))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = values.sum(axis=-2, keepdims=True) / count
+        squares = np.ascontiguousarray(np.where(present, features - mean, 0.0) ** 2)
+        # R's var is nan for less than 2 values:
+        var = np.where(
+            count > 1, squares.sum(axis=-2, keepdims=True) / (count - 1), np.nan
+        )
+        standardised = (features - mean) / (np.sqrt(var) + 0.0000001)
+
+    return np.where(numeric_columns, standardised, features)
+
+
+def euclidean_distances(query, features, scale=None):
+    """
+    Euclidean distance between the query row and each row in features.
+    Like R's dist, nan values are left out and the sum is scaled
+    up by the proportion of the values that were used.
+
+    The rows are the last but one axis, so a stack of queries
+    can be compared with a stack of features.
+
+    Parameters
+    ---------
+    scale : numpy array, optional
+        the differences are multiplied by the scale of their column,
+        (e.g. one over the standard deviation of the column)
+
+    Returns
+    -------
+    numpy array
+        distance to each row, nan if no values could be compared.
+    """
+    difference = features - query
+    if scale is not None:
+        difference = difference * scale
+    present = ~np.isnan(difference)
+    count = present.sum(axis=-1)
+    squares = np.where(present, difference, 0.0) ** 2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distances = np.sqrt(squares.sum(axis=-1) * features.shape[-1] / count)
+
+    return np.where(count > 0, distances, np.nan)
+
+
+def similarities(query, features, eucl_stand=True, numeric_columns=None):
+    """
+    Similarity of the query to each row in features:
+    exp(-distance/number of features).
+
+    The query and the features are z-transformed together
+    if eucl_stand is True.
+    """
+    query = np.asarray(query, dtype=np.float64).reshape(1, -1)
+    return similarity_matrix(query, features, eucl_stand, numeric_columns)[0]
+
+
+def similarity_matrix(queries, features, eucl_stand=True, numeric_columns=None):
+    """
+    Similarity of each query row to each row in features, the same
+    as similarities for each query but worked out together.
+
+    Each query is z-transformed together with the features (as the
+    R functions rbind the query to the features before ztransform).
+    The mean of the query and features cancels out of the differences
+    between them, so only the standard deviation of each column is
+    needed. It is worked out for each query from the count and sum of
+    squares of the centred features, which are only worked out once,
+    and the query value.
+
+    Parameters
+    ---------
+    queries : 2D numpy array
+        (queries x features) rows of feature values
+
+    features : 2D numpy array
+        (rows x features) feature values to compare with
+
+    eucl_stand : boolean
+        z-transform the features before the distances are worked out
+
+    numeric_columns : boolean numpy array, optional
+        the columns that are standardised, either the same for all
+        queries (1D) or a row for each query (2D)
+
+    Returns
+    -------
+    2D numpy array
+        (queries x rows) similarities
+    """
+    features = np.atleast_2d(np.asarray(features, dtype=np.float64))
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float64))
+
+    scale = np.ones(queries.shape)
+    if eucl_stand:
+        if numeric_columns is None:
+            numeric_columns = np.ones(features.shape[1], dtype=bool)
+
+        present = ~np.isnan(features)
+        count = present.sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.nan_to_num(np.where(present, features, 0.0).sum(axis=0) / count)
+        squares = (np.where(present, features - mean, 0.0) ** 2).sum(axis=0)
+
+        # adding the query to the column moves the mean by
+        # query/count, so the sum of squares goes up by
+        # query**2 * (count - 1)/count (with the count including it):
+        query_present = ~np.isnan(queries)
+        query_count = count + query_present
+        centred_query = np.where(query_present, queries - mean, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            query_squares = (
+                squares + centred_query**2 * (query_count - 1) / query_count
+            )
+            # R's var is nan for less than 2 values:
+            var = np.where(query_count > 1, query_squares / (query_count - 1), np.nan)
+        scale = np.where(numeric_columns, 1 / (np.sqrt(var) + 0.0000001), 1.0)
+
+    similarities = np.empty((len(queries), len(features)))
+    for row, (query, query_scale) in enumerate(zip(queries, scale)):
+        similarities[row] = np.exp(
+            -euclidean_distances(query, features, query_scale) / features.shape[1]
+        )
+    return similarities
+
+
+def most_similar_rows(sims, percent_match=1):
+    """
+    The indexes of the most similar rows for each row of a
+    similarity_matrix, the columns with a similarity within
+    percent_match percent of the range of the similarities in the
+    row from the max similarity of the row, as most_similar.
+
+    Returns
+    -------
+    list of 1D numpy arrays
+        the column indexes for each row, empty if all its
+        similarities are nan.
+    """
+    sims = np.atleast_2d(np.asarray(sims, dtype=np.float64))
+    if sims.shape[1] == 0:
+        return [np.array([], dtype=np.int64) for row in sims]
+
+    compared = ~np.all(np.isnan(sims), axis=1)
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        # rows that are all nan have no matches:
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        max_sim = np.nanmax(sims, axis=1)
+        similarity_range = max_sim - np.nanmin(sims, axis=1)
+        matches = sims >= (max_sim - percent_match * similarity_range / 100)[:, None]
+
+    matches &= compared[:, None]
+    return [np.flatnonzero(row) for row in matches]
+
+
+def most_similar(ids, sims, percent_match=1):
+    """
+    Return the ids with a similarity within percent_match
+    percent of the range of the similarities from the max similarity.
+    Rows with nan similarities are not returned.
+    """
+    sims = np.asarray(sims, dtype=np.float64)
+    if len(sims) == 0 or np.all(np.isnan(sims)):
+        return []
+
+    max_sim = np.nanmax(sims)
+    similarity_range = max_sim - np.nanmin(sims)
+    with np.errstate(invalid="ignore"):
+        matches = sims >= max_sim - percent_match * similarity_range / 100
+
+    return [str(ids[i]) for i in np.flatnonzero(matches)]
+
+
+def get_candidate_set(
+    ids, query, features, eucl_stand=True, percent_match=1, numeric_columns=None
+):
+    """
+    Find the ids of the rows of features that are most similar to
+    the query, the NumPy version of get.candidate.set.
+
+    Parameters
+    ---------
+    ids : list
+        the ids for each row in features
+
+    query : 1D numpy array
+        features of the measure
+
+    features : 2D numpy array
+        features of the database entries
+
+    eucl_stand : boolean
+        z-transform the features before the distances are worked out
+
+    percent_match : number 0-100
+        how far (as a percentage of the similarity range)
+        from the most similar a candidate can be.
+
+    numeric_columns : 1D boolean numpy array, optional
+        the columns that are standardised
+
+    Returns
+    -------
+    list
+        ids of the candidates
+    """
+    assert len(ids) == len(features), "there must be an id for each row"
+    if len(ids) == 0:
+        return []
+
+    return most_similar(
+        ids, similarities(query, features, eucl_stand, numeric_columns), percent_match
+    )
@@ -5,7 +5,11 @@ used within virtuobass.
 
 
 from . import calculate_functions
+from . import complexity_arrays
+from . import incremental_complexity
+from . import complexity_cache
 from . import datatypes
+from . import note_table
 from . import get_functions
 from . import update_functions
 from . import convert_functions
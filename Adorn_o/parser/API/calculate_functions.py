@@ -6,9 +6,9 @@ Calculate Functions
 from fractions import Fraction
 import os
 from bisect import bisect_left
-from math import log, e, sqrt, floor
+from math import log, e, sqrt, floor, gcd
 from operator import mul, add
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 import random
 
 # 3rd party imports
@@ -55,6 +55,44 @@ def calculate_song_duration(song):
     return song_duration
 
 
+# The ticks in a beat of the integer tick timebase used for start
+# times and durations in the loops over notes, 960 ticks per quarter
+# note as in GP5 files:
+default_ticks_per_beat = 3840
+
+
+def calculate_ticks_per_beat(times):
+    """
+    Return the ticks per beat needed for all of the times (in beats)
+    to be a whole number of ticks, the lcm of default_ticks_per_beat
+    and the denominators of the times.
+    """
+    ticks_per_beat = default_ticks_per_beat
+    for time in times:
+        if ticks_per_beat % time.denominator:
+            ticks_per_beat = (
+                ticks_per_beat
+                * time.denominator
+                // gcd(ticks_per_beat, time.denominator)
+            )
+    return ticks_per_beat
+
+
+def calculate_ticks(time, ticks_per_beat=default_ticks_per_beat):
+    """Return the time (in beats) as a number of ticks."""
+
+    assert (
+        ticks_per_beat % time.denominator == 0
+    ), "%s is not a whole number of ticks" % (time)
+    return time.numerator * (ticks_per_beat // time.denominator)
+
+
+def calculate_time_from_ticks(ticks, ticks_per_beat=default_ticks_per_beat):
+    """Return the time (in beats) of a number of ticks."""
+
+    return Fraction(ticks, ticks_per_beat)
+
+
 def calculate_note_endtime(note):
     """Return the end time (in beats) for the note."""
 
@@ -110,38 +148,48 @@ def calculate_duration_for_notes_in_measure(measure):
     ), "Can only calculate durations for notes in a measure"
 
     # Get the timings of all events from the start times of notes
-    # in the measure then append the bar endtime to the event_times
+    # in the measure
     event_times = []
     for note in measure.notes:
         if isinstance(note, AdornedNote):
-            # if the event time is not already added to the
-            # event time list, add it:
-            if note.note.start_time not in event_times:
-                event_times.append(note.note.start_time)
+            event_times.append(note.note.start_time)
         elif isinstance(note, Rest):
-            if note.start_time not in event_times:
-                event_times.append(note.start_time)
-
-    event_times.append(calculate_measure_endtime(measure))
+            event_times.append(note.start_time)
+    measure_endtime = calculate_measure_endtime(measure)
 
-    # sort event times so they are in order.
+    # work with the event times as ticks, each event time
+    # is added once, then append the bar endtime and
+    # sort them so they are in order.
     # This allows the notes to be in non-chronological order
     # and the duration calculation should still work.
-    event_times = sorted(event_times)
+    ticks_per_beat = calculate_ticks_per_beat(event_times + [measure_endtime])
+    event_ticks = sorted(
+        set([calculate_ticks(event_time, ticks_per_beat) for event_time in event_times])
+    )
+    event_ticks = sorted(
+        event_ticks + [calculate_ticks(measure_endtime, ticks_per_beat)]
+    )
+
+    # the next event time after each event time:
+    next_event_ticks = {}
+    for event_num in range(len(event_ticks) - 1):
+        next_event_ticks.setdefault(event_ticks[event_num], event_ticks[event_num + 1])
 
     updated_measure = measure
     for note in measure.notes:
 
-        # cylce through the event times,
-        # find what one matches the note
+        # find the next event time after the note,
         # duration is the time between the note's
         # start time and the next event time.
-        event_num = 0
-
         if isinstance(note, AdornedNote):
-            event_num = event_times.index(note.note.start_time)
-            dur_note = calculate_note_duration(note.note, event_times[event_num + 1])
-            if dur_note == Fraction(0, 1):
+            start_ticks = calculate_ticks(note.note.start_time, ticks_per_beat)
+            next_ticks = next_event_ticks[start_ticks]
+            dur_note = note.note._replace(
+                duration=calculate_time_from_ticks(
+                    next_ticks - start_ticks, ticks_per_beat
+                )
+            )
+            if next_ticks == start_ticks:
                 print("Duration 0")
                 print("bar: ", measure.meta_data.number)
                 print(note)
@@ -149,9 +197,14 @@ def calculate_duration_for_notes_in_measure(measure):
                 note, update_adorned_note(note, note=dur_note), updated_measure
             )
         elif isinstance(note, Rest):
-            event_num = event_times.index(note.start_time)
-            dur_note = calculate_note_duration(note, event_times[event_num + 1])
-            if dur_note == Fraction(0, 1):
+            start_ticks = calculate_ticks(note.start_time, ticks_per_beat)
+            next_ticks = next_event_ticks[start_ticks]
+            dur_note = note._replace(
+                duration=calculate_time_from_ticks(
+                    next_ticks - start_ticks, ticks_per_beat
+                )
+            )
+            if next_ticks == start_ticks:
                 print("Duration 0")
                 print("bar: ", measure.meta_data.number)
                 print(note)
@@ -446,20 +499,39 @@ def calculate_artificial_harmonic_octave(artificial_harmonic_octave):
 
 
 def calculate_bars_from_note_list(note_list, song_data):
+    """
+    Split the note_list into a list of the notes that start in each
+    measure of song_data (see calcuate_note_is_in_measure), the notes
+    of each measure are in the same order as in the note_list.
 
-    measures_list = []
+    The notes are sorted by start time (in ticks) once, and the notes
+    of each measure are found by bisecting the start times.
+    """
 
-    measure_notes = []
+    note_start_times = [adorned_note.note.start_time for adorned_note in note_list]
+    measure_times = [
+        (measure.start_time, calculate_measure_endtime(measure))
+        for measure in song_data.measures
+    ]
+    ticks_per_beat = calculate_ticks_per_beat(
+        note_start_times + [time for times in measure_times for time in times]
+    )
 
-    print("For: ", song_data.meta_data.title)
+    # the note indexes in order of their start times:
+    note_ticks = [
+        calculate_ticks(start_time, ticks_per_beat) for start_time in note_start_times
+    ]
+    note_order = sorted(range(len(note_list)), key=note_ticks.__getitem__)
+    start_ticks = [note_ticks[index] for index in note_order]
 
-    for measure in song_data.measures:
-        measure_notes = []
-        print("Working out what notes are in measure: ", measure.meta_data.number)
-        for adorned_note in note_list:
-            if calcuate_note_is_in_measure(adorned_note, measure):
-                measure_notes.append(adorned_note)
-        measures_list.append(measure_notes)
+    measures_list = []
+
+    for start_time, end_time in measure_times:
+        first = bisect_left(start_ticks, calculate_ticks(start_time, ticks_per_beat))
+        last = bisect_left(start_ticks, calculate_ticks(end_time, ticks_per_beat))
+        measures_list.append(
+            [note_list[index] for index in sorted(note_order[first:last])]
+        )
 
     return measures_list
 
@@ -705,6 +777,145 @@ def calculate_midi_file_for_measure_note_list(
             return False
 
 
+# Columns of the mcsv files made by melconv that FANTASTIC reads:
+note_table_header = [
+    "onset",
+    "onsetics",
+    "takt",
+    "beat",
+    "ticks",
+    "pitch",
+    "durs",
+    "durtic",
+    "dur16",
+    "LBDM1",
+    "LBDM2",
+    "refLBDM1",
+    "refLBDM2",
+    "temperley",
+    "simple0-0-0",
+]
+
+
+def calculate_note_table_for_measure_note_list(
+    measure_note_list, measure, ticks_per_beat=960, max_phrase_length=23
+):
+    """
+    Calculate the table of notes that FANTASTIC analyses for the notes
+    in measure_note_list, in the format of the mcsv files that melconv
+    makes from the midi file of the measure,
+    see calculate_midi_file_for_measure_note_list.
+
+    Times are in seconds (rounded as in the mcsv files) and in
+    ticks, with ticks_per_beat ticks per quarter note.
+    There is no melodic segmentation, the notes are analysed as a
+    single phrase, unless there are more than max_phrase_length of
+    them (FANTASTIC only analyses phrases of 3 to 23 notes), then
+    they are split into phrases of about the same length with
+    temperley boundaries.
+
+    Parameters
+    ---------
+    measure_note_list : list of AdornedNotes
+
+    measure : Measure, list of Measures
+        the measure(s) the notes are in, the tempo, time signature
+        and start time are taken from the first measure.
+
+    Returns
+    ------
+    list of lists
+        a row for each note with the values for the note_table_header columns
+    """
+    assert isinstance(measure_note_list, list)
+    assert isinstance(measure, Measure) or isinstance(measure, list)
+
+    if isinstance(measure, list):
+        for m in measure:
+            assert isinstance(m, Measure)
+        measure = measure[0]
+
+    bpm = measure.meta_data.tempo
+    time_sig = measure.meta_data.time_signature.split("/")
+    ticks_per_bar = int(ticks_per_beat * 4 * int(time_sig[0]) / int(time_sig[1]))
+
+    note_table = []
+    for adorned_note in sorted(
+        measure_note_list, key=lambda adorned_note: adorned_note.note.start_time
+    ):
+        # notes without a duration aren't in the midi file:
+        if adorned_note.note.duration <= 0:
+            continue
+
+        start_time = adorned_note.note.start_time - measure.start_time
+        onset_ticks = int(round(start_time * 4 * ticks_per_beat))
+        duration_ticks = int(round(adorned_note.note.duration * 4 * ticks_per_beat))
+
+        note_table.append(
+            [
+                round(calculate_realtime_duration(start_time, bpm) / 1000, 4),
+                onset_ticks,
+                onset_ticks // ticks_per_bar + 1,
+                (onset_ticks % ticks_per_bar) // ticks_per_beat + 1,
+                onset_ticks % ticks_per_beat,
+                adorned_note.note.pitch,
+                round(
+                    calculate_realtime_duration(adorned_note.note.duration, bpm) / 1000,
+                    4,
+                ),
+                duration_ticks,
+                duration_ticks * 24 / ticks_per_beat,
+                0,
+                0,
+                0,
+                0,
+                0,
+                0,
+            ]
+        )
+
+    if len(note_table) > max_phrase_length:
+        phrases = -(-len(note_table) // max_phrase_length)
+        for phrase in range(1, phrases + 1):
+            # the temperley boundary is on the last note of the phrase:
+            note_table[phrase * len(note_table) // phrases - 1][
+                note_table_header.index("temperley")
+            ] = 1
+
+    return note_table
+
+
+def calculate_mcsv_file_for_note_table(
+    note_table, measure, mcsv_file_name="measure.csv", ticks_per_beat=960
+):
+    """
+    Write the note table out as an mcsv file (the format melconv
+    makes) so it can be analysed by FANTASTIC's compute.features.
+    """
+    if isinstance(measure, list):
+        measure = measure[0]
+    assert isinstance(measure, Measure)
+
+    with open(mcsv_file_name, "w") as mcsv_file:
+        mcsv_file.write(
+            "Signature: %s, Ticks per Beat: %s\n"
+            % (measure.meta_data.time_signature, ticks_per_beat)
+        )
+        mcsv_file.write(";".join(note_table_header) + "\n")
+        for row in note_table:
+            values = []
+            for column, value in zip(note_table_header, row):
+                if column in ["onset", "durs"]:
+                    values.append(("%.4f" % value).replace(".", ","))
+                elif float(value).is_integer():
+                    values.append(str(int(value)))
+                else:
+                    values.append(str(value).replace(".", ","))
+            mcsv_file.write(";".join(values) + "\n")
+
+    return mcsv_file_name
+
+
 # TODO: Check if a note overlaps a bar so the correct
 # time sig can be updated for the overlap bar
 def calculate_midi_files(
@@ -883,6 +1094,20 @@ def calculate_rhy_file_for_measure(
     convert_incompatable_time_sigs=True,
 ):
     """ """
+    rhy_lines = calculate_rhy_lines_for_measure(measure, convert_incompatable_time_sigs)
+
+    with open(rhy_file_name, "w") as rhythm_file:
+        for rhy_line in rhy_lines:
+            rhythm_file.write(rhy_line)
+
+    return rhy_file_name
+
+
+def calculate_rhy_lines_for_measure(measure, convert_incompatable_time_sigs=True):
+    """
+    Calculate the lines of the .rhy file for the measure,
+    so the SynPy bars can be made without writing the file.
+    """
     assert isinstance(measure, Measure), "note_list not a list!"
 
     # get a list of note_durations and velocities
@@ -949,7 +1174,9 @@ def calculate_rhy_file_for_measure(
         # convert the start time into number of 1/4 notes
         # and then number of ticks per quaternote
         # and then into the position in the bar
-        st = int(start_time / Fraction(1, 4) * tpq * tpq_mod) % ticksperbar
+        st = (
+            start_time.numerator * 4 * tpq * tpq_mod // start_time.denominator
+        ) % ticksperbar
         st = st % ticksperbar
         # convert the dynamic into velocity
         # and normalise it
@@ -971,14 +1198,12 @@ def calculate_rhy_file_for_measure(
     measure = str(measure).replace("[", "")
     measure = str(measure).replace("]", "")
 
-    with open(rhy_file_name, "w") as rhythm_file:
-
-        # write time sig and ticks per quaternote values to the .rhy file.
-        rhythm_file.write("T\{" + str(time_sig) + "\} # time-signature\n")
-        rhythm_file.write("TPQ{" + str(tpq) + "} #ticks per quaternote\n")
-        rhythm_file.write("V{" + str(measure) + "}\n")
-
-    return rhy_file_name
+    # time sig and ticks per quaternote values then the velocities:
+    return [
+        "T\{" + str(time_sig) + "\} # time-signature\n",
+        "TPQ{" + str(tpq) + "} #ticks per quaternote\n",
+        "V{" + str(measure) + "}\n",
+    ]
 
 
 def calculate_rhy_file_for_song(
@@ -1079,10 +1304,10 @@ def calculate_rhy_file_for_song(
             # convert the start time into number of 1/4 notes
             # and then number of ticks per quaternote
             # and then into the position in the bar
+            start_time = adorned_note.note.start_time
             st = (
-                int(adorned_note.note.start_time / Fraction(1, 4) * tpq * tpq_mod)
-                % ticksperbar
-            )
+                start_time.numerator * 4 * tpq * tpq_mod // start_time.denominator
+            ) % ticksperbar
             st = st % ticksperbar
             # convert the dynamic into velocity
             # and normalise it
@@ -2161,11 +2386,67 @@ def calculate_triplet_feel_note_durations(input_data):
     return input_data
 
 
+# The tied note lists of the last Songs/Measures they were calculated for,
+# by the id of the Song/Measure. Each entry keeps the Song/Measure (so
+# the id can't be reused while it is cached) and the events in its
+# measures when the list was made, so it is remade if they are changed:
+TiedNoteEntry = namedtuple("TiedNoteEntry", ["input_data", "events", "note_list"])
+tied_note_cache = OrderedDict()
+tied_note_cache_size = 256
+
+
+def calculate_measure_events(input_data):
+    """
+    The events in each measure of a song/measure, as a tuple of tuples.
+    """
+    if isinstance(input_data, Song):
+        return tuple([tuple(measure.notes) for measure in input_data.measures])
+    return (tuple(input_data.notes),)
+
+
+def clear_tied_note_cache():
+    """
+    Empty the cache of tied note lists.
+    """
+    tied_note_cache.clear()
+
+
 def calculate_tied_note_durations(input_data):
     """
     Go through every note in a song/measure
     find the tied notes, and what notes they are tied to
     and combine them into a list.
+
+    The list is calculated once for each song/measure and cached until
+    the events in it are changed, a new list is returned each time but
+    the AdornedNotes in it are shared.
+    """
+    assert isinstance(input_data, Song) or isinstance(
+        input_data, Measure
+    ), "Currently can only calculate tied note durations for Song or Measure datatypes"
+
+    events = calculate_measure_events(input_data)
+
+    entry = tied_note_cache.get(id(input_data))
+    if entry is not None and entry.input_data is input_data and entry.events == events:
+        tied_note_cache.move_to_end(id(input_data))
+        return list(entry.note_list)
+
+    note_list = calculate_tied_note_list(input_data)
+
+    tied_note_cache[id(input_data)] = TiedNoteEntry(
+        input_data, events, tuple(note_list)
+    )
+    if len(tied_note_cache) > tied_note_cache_size:
+        tied_note_cache.popitem(last=False)
+
+    return note_list
+
+
+def calculate_tied_note_list(input_data):
+    """
+    Combine the tied notes in a song/measure into a list,
+    without the cache used by calculate_tied_note_durations.
     """
     previous_notes = (0, [])
     start_time = 0
@@ -2868,6 +3149,7 @@ def calculate_playing_complexity(
             GMTS
             RD
             RDT
+        - or a musiplectics.WeightSet that has already been loaded
 
     raw_values:
         True:
@@ -2887,31 +3169,8 @@ def calculate_playing_complexity(
 
     """
 
-    # Check for the weight set:
-    if weight_set == "GM":
-        use_geometric_mean = True
-        use_total_playing_time = False
-        log_scale_values = False
-    if weight_set == "GMS":
-        use_geometric_mean = True
-        use_total_playing_time = False
-        log_scale_values = True
-    if weight_set == "GMT":
-        use_geometric_mean = True
-        use_total_playing_time = True
-        log_scale_values = False
-    if weight_set == "GMTS":
-        use_geometric_mean = True
-        use_total_playing_time = True
-        log_scale_values = False
-    if weight_set == "RD":
-        use_geometric_mean = False
-        use_total_playing_time = False
-        log_scale_values = False
-    if weight_set == "RDT":
-        use_geometric_mean = False
-        use_total_playing_time = True
-        log_scale_values = False
+    # Load the weights for the weight set:
+    weights = musiplectics.load_weight_set(weight_set)
 
     # parameters for calculating complexity:
     position_window = []
@@ -3023,7 +3282,7 @@ def calculate_playing_complexity(
             time_sig = song.measures[measure_number].meta_data.time_signature
 
             # if the time sig doesn't have a complexity weight skip the measure
-            if time_sig not in list(musiplectics.time_sig_weights().keys()):
+            if time_sig not in weights.time_sig:
                 continue
 
             bpm = song.measures[measure_number].meta_data.tempo
@@ -3083,11 +3342,7 @@ def calculate_playing_complexity(
                     # ).get(playing_technique)
                     # and add the scores to the note score list
                     playing_technique_note_scores.append(
-                        musiplectics.technique_weights(
-                            use_geometric_mean=use_geometric_mean,
-                            use_total_playing_time=use_total_playing_time,
-                            log_scale_values=log_scale_values,
-                        ).get(playing_technique)
+                        weights.technique.get(playing_technique)
                     )
 
                 if use_product:
@@ -3099,48 +3354,22 @@ def calculate_playing_complexity(
                         add, playing_technique_note_scores
                     )
 
-                duration_tempo_score = musiplectics.duration_complexity_polynomial(
-                    rt_duration,
-                    use_geometric_mean=use_geometric_mean,
-                    use_total_playing_time=use_total_playing_time,
-                    log_scale_values=log_scale_values,
-                )
+                duration_tempo_score = weights.duration(rt_duration)
                 duration_tempo_complexity += duration_tempo_score
 
-                time_sig_score = musiplectics.time_sig_weights(
-                    use_geometric_mean=use_geometric_mean,
-                    use_total_playing_time=use_total_playing_time,
-                    log_scale_values=log_scale_values,
-                ).get(time_sig)
+                time_sig_score = weights.time_sig.get(time_sig)
 
                 time_sig_complexity += time_sig_score
 
-                bpm_list = sorted(
-                    musiplectics.tempo_weights(
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values,
-                    )[0].keys()
-                )
-
-                bpm_musiplectic = calculate_closest_value(bpm_list, bpm)
-
-                bpm_score = musiplectics.tempo_weights(
-                    use_geometric_mean=use_geometric_mean,
-                    use_total_playing_time=use_total_playing_time,
-                    log_scale_values=log_scale_values,
-                )[0].get(int(bpm_musiplectic))
+                # weight of the closest tempo:
+                bpm_score = weights.tempo_weight(bpm)
 
                 bpm_complexity += bpm_score
 
                 expressive_techniques_score = []
                 for expressive_technique in expressive_techniques:
                     expressive_techniques_score.append(
-                        musiplectics.expression_weights(
-                            use_geometric_mean=use_geometric_mean,
-                            use_total_playing_time=use_total_playing_time,
-                            log_scale_values=log_scale_values,
-                        ).get(expressive_technique)
+                        weights.expression.get(expressive_technique)
                     )
 
                 if use_product:
@@ -3156,22 +3385,12 @@ def calculate_playing_complexity(
 
                 if articulations_accents == []:
                     # articulations_accents_complexity += musiplectics.articulation_scores().get(None)
-                    articulations_accent_score.append(
-                        musiplectics.articulation_weights(
-                            use_geometric_mean=use_geometric_mean,
-                            use_total_playing_time=use_total_playing_time,
-                            log_scale_values=log_scale_values,
-                        ).get(None)
-                    )
+                    articulations_accent_score.append(weights.articulation.get(None))
                 else:
                     for articulations_accent in articulations_accents:
                         # articulations_accents_complexity += musiplectics.articulation_scores().get(articulations_accent)
                         articulations_accent_score.append(
-                            musiplectics.articulation_weights(
-                                use_geometric_mean=use_geometric_mean,
-                                use_total_playing_time=use_total_playing_time,
-                                log_scale_values=log_scale_values,
-                            ).get(articulations_accent)
+                            weights.articulation.get(articulations_accent)
                         )
 
                 if use_product:
@@ -3185,21 +3404,9 @@ def calculate_playing_complexity(
 
                 dynamic_score = []
                 if len(dynamic) == 2:
-                    dynamic_score.append(
-                        musiplectics.dynamic_weights(
-                            use_geometric_mean=use_geometric_mean,
-                            use_total_playing_time=use_total_playing_time,
-                            log_scale_values=log_scale_values,
-                        ).get(dynamic[0])
-                    )
+                    dynamic_score.append(weights.dynamic.get(dynamic[0]))
                     if dynamic[1] is not None:
-                        dynamic_score.append(
-                            musiplectics.dynamic_weights(
-                                use_geometric_mean=use_geometric_mean,
-                                use_total_playing_time=use_total_playing_time,
-                                log_scale_values=log_scale_values,
-                            ).get(dynamic[1])
-                        )
+                        dynamic_score.append(weights.dynamic.get(dynamic[1]))
 
                 if use_product:
                     dynamics_complexity += reduce(mul, dynamic_score)
@@ -3207,18 +3414,10 @@ def calculate_playing_complexity(
                     dynamics_complexity += reduce(add, dynamic_score)
                 # dynamics_complexity += dynamic_score
 
-                key_sig_score = musiplectics.key_sig_weights(
-                    use_geometric_mean=use_geometric_mean,
-                    use_total_playing_time=use_total_playing_time,
-                    log_scale_values=log_scale_values,
-                ).get("KeySignature." + key_sig)
+                key_sig_score = weights.key_sig.get("KeySignature." + key_sig)
                 key_sig_complexity += key_sig_score
 
-                fret_position_score = musiplectics.fret_position_weights(
-                    use_geometric_mean=use_geometric_mean,
-                    use_total_playing_time=use_total_playing_time,
-                    log_scale_values=log_scale_values,
-                ).get(fret_playing_postion)
+                fret_position_score = weights.fret_position.get(fret_playing_postion)
                 fret_playing_postion_complexity += fret_position_score
 
                 # Playing postion shift is only the fretting hand.
@@ -3234,17 +3433,9 @@ def calculate_playing_complexity(
                     shift_distance = 0
 
                 if shift_distance >= 13:
-                    shift_distance_score = musiplectics.shifting_weights(
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values,
-                    ).get(str("13+"))
+                    shift_distance_score = weights.shifting.get(str("13+"))
                 else:
-                    shift_distance_score = musiplectics.shifting_weights(
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values,
-                    ).get(str(shift_distance))
+                    shift_distance_score = weights.shifting.get(str(shift_distance))
                 """
                 NOTE: Need to decide on what I should do with this!
                 print shift_distance
@@ -3319,11 +3510,7 @@ def calculate_playing_complexity(
                         if interval >= 21:
                             interval = 21
 
-                        interval_score = musiplectics.interval_weights(
-                            use_geometric_mean=use_geometric_mean,
-                            use_total_playing_time=use_total_playing_time,
-                            log_scale_values=log_scale_values,
-                        ).get(interval)
+                        interval_score = weights.interval.get(interval)
                         interval_complexity += interval_score
 
                         # Calculte the real time duration for the interval ioi
@@ -3341,14 +3528,7 @@ def calculate_playing_complexity(
                         ).get(closest_interval_ioi_duration)
                         """
 
-                        interval_ioi_score = (
-                            musiplectics.duration_complexity_polynomial(
-                                interval_ioi_rt_duration,
-                                use_geometric_mean=use_geometric_mean,
-                                use_total_playing_time=use_total_playing_time,
-                                log_scale_values=log_scale_values,
-                            )
-                        )
+                        interval_ioi_score = weights.duration(interval_ioi_rt_duration)
                         interval_ioi_complexity += interval_ioi_score
 
                         # work out if there is a change in dynamics:
@@ -3371,11 +3551,7 @@ def calculate_playing_complexity(
                             # diminuendo
                             interval_dynamic = "dim"
 
-                        interval_dynamic_score = musiplectics.dynamic_weights(
-                            use_geometric_mean=use_geometric_mean,
-                            use_total_playing_time=use_total_playing_time,
-                            log_scale_values=log_scale_values,
-                        ).get(interval_dynamic)
+                        interval_dynamic_score = weights.dynamic.get(interval_dynamic)
 
                         interval_dynamic_complexity += interval_dynamic_score
 
@@ -3389,11 +3565,9 @@ def calculate_playing_complexity(
                         ):
                             interval_expression = "slide"
 
-                        interval_expression_score = musiplectics.expression_weights(
-                            use_geometric_mean=use_geometric_mean,
-                            use_total_playing_time=use_total_playing_time,
-                            log_scale_values=log_scale_values,
-                        ).get(interval_expression)
+                        interval_expression_score = weights.expression.get(
+                            interval_expression
+                        )
                         interval_expression_complexity += interval_expression_score
 
                         # work out the fret position of the interval:
@@ -3413,12 +3587,8 @@ def calculate_playing_complexity(
                                 calculate_musiplectic_fret_possition(previous_note)
                             )
 
-                        interval_fret_position_score = (
-                            musiplectics.fret_position_weights(
-                                use_geometric_mean=use_geometric_mean,
-                                use_total_playing_time=use_total_playing_time,
-                                log_scale_values=log_scale_values,
-                            ).get(interval_fret_position)
+                        interval_fret_position_score = weights.fret_position.get(
+                            interval_fret_position
                         )
                         interval_fret_position_complexity += (
                             interval_fret_position_score
@@ -3732,7 +3902,7 @@ def calculate_playing_complexity(
         time_sig = measure.meta_data.time_signature
 
         # if the time sig doesn't have a complexity weight skip the measure
-        if time_sig not in list(musiplectics.time_sig_weights().keys()):
+        if time_sig not in weights.time_sig:
             return
 
         bpm = measure.meta_data.tempo
@@ -3773,11 +3943,7 @@ def calculate_playing_complexity(
                 # ).get(playing_technique)
                 # and add the scores to the note score list
                 playing_technique_note_scores.append(
-                    musiplectics.technique_weights(
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values,
-                    ).get(playing_technique)
+                    weights.technique.get(playing_technique)
                 )
 
             if use_product:
@@ -3789,48 +3955,22 @@ def calculate_playing_complexity(
                     add, playing_technique_note_scores
                 )
 
-            duration_tempo_score = musiplectics.duration_complexity_polynomial(
-                rt_duration,
-                use_geometric_mean=use_geometric_mean,
-                use_total_playing_time=use_total_playing_time,
-                log_scale_values=log_scale_values,
-            )
+            duration_tempo_score = weights.duration(rt_duration)
             duration_tempo_complexity += duration_tempo_score
 
-            time_sig_score = musiplectics.time_sig_weights(
-                use_geometric_mean=use_geometric_mean,
-                use_total_playing_time=use_total_playing_time,
-                log_scale_values=log_scale_values,
-            ).get(time_sig)
+            time_sig_score = weights.time_sig.get(time_sig)
 
             time_sig_complexity += time_sig_score
 
-            bpm_list = sorted(
-                musiplectics.tempo_weights(
-                    use_geometric_mean=use_geometric_mean,
-                    use_total_playing_time=use_total_playing_time,
-                    log_scale_values=log_scale_values,
-                )[0].keys()
-            )
-
-            bpm_musiplectic = calculate_closest_value(bpm_list, bpm)
-
-            bpm_score = musiplectics.tempo_weights(
-                use_geometric_mean=use_geometric_mean,
-                use_total_playing_time=use_total_playing_time,
-                log_scale_values=log_scale_values,
-            )[0].get(int(bpm_musiplectic))
+            # weight of the closest tempo:
+            bpm_score = weights.tempo_weight(bpm)
 
             bpm_complexity += bpm_score
 
             expressive_techniques_score = []
             for expressive_technique in expressive_techniques:
                 expressive_techniques_score.append(
-                    musiplectics.expression_weights(
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values,
-                    ).get(expressive_technique)
+                    weights.expression.get(expressive_technique)
                 )
 
             if use_product:
@@ -3846,22 +3986,12 @@ def calculate_playing_complexity(
 
             if articulations_accents == []:
                 # articulations_accents_complexity += musiplectics.articulation_scores().get(None)
-                articulations_accent_score.append(
-                    musiplectics.articulation_weights(
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values,
-                    ).get(None)
-                )
+                articulations_accent_score.append(weights.articulation.get(None))
             else:
                 for articulations_accent in articulations_accents:
                     # articulations_accents_complexity += musiplectics.articulation_scores().get(articulations_accent)
                     articulations_accent_score.append(
-                        musiplectics.articulation_weights(
-                            use_geometric_mean=use_geometric_mean,
-                            use_total_playing_time=use_total_playing_time,
-                            log_scale_values=log_scale_values,
-                        ).get(articulations_accent)
+                        weights.articulation.get(articulations_accent)
                     )
 
             if use_product:
@@ -3875,21 +4005,9 @@ def calculate_playing_complexity(
 
             dynamic_score = []
             if len(dynamic) == 2:
-                dynamic_score.append(
-                    musiplectics.dynamic_weights(
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values,
-                    ).get(dynamic[0])
-                )
+                dynamic_score.append(weights.dynamic.get(dynamic[0]))
                 if dynamic[1] is not None:
-                    dynamic_score.append(
-                        musiplectics.dynamic_weights(
-                            use_geometric_mean=use_geometric_mean,
-                            use_total_playing_time=use_total_playing_time,
-                            log_scale_values=log_scale_values,
-                        ).get(dynamic[1])
-                    )
+                    dynamic_score.append(weights.dynamic.get(dynamic[1]))
 
             if use_product:
                 dynamics_complexity += reduce(mul, dynamic_score)
@@ -3897,18 +4015,10 @@ def calculate_playing_complexity(
                 dynamics_complexity += reduce(add, dynamic_score)
             # dynamics_complexity += dynamic_score
 
-            key_sig_score = musiplectics.key_sig_weights(
-                use_geometric_mean=use_geometric_mean,
-                use_total_playing_time=use_total_playing_time,
-                log_scale_values=log_scale_values,
-            ).get("KeySignature." + key_sig)
+            key_sig_score = weights.key_sig.get("KeySignature." + key_sig)
             key_sig_complexity += key_sig_score
 
-            fret_position_score = musiplectics.fret_position_weights(
-                use_geometric_mean=use_geometric_mean,
-                use_total_playing_time=use_total_playing_time,
-                log_scale_values=log_scale_values,
-            ).get(fret_playing_postion)
+            fret_position_score = weights.fret_position.get(fret_playing_postion)
             fret_playing_postion_complexity += fret_position_score
 
             # Playing postion shift is only the fretting hand.
@@ -3924,17 +4034,9 @@ def calculate_playing_complexity(
                 shift_distance = 0
 
             if shift_distance >= 13:
-                shift_distance_score = musiplectics.shifting_weights(
-                    use_geometric_mean=use_geometric_mean,
-                    use_total_playing_time=use_total_playing_time,
-                    log_scale_values=log_scale_values,
-                ).get(str("13+"))
+                shift_distance_score = weights.shifting.get(str("13+"))
             else:
-                shift_distance_score = musiplectics.shifting_weights(
-                    use_geometric_mean=use_geometric_mean,
-                    use_total_playing_time=use_total_playing_time,
-                    log_scale_values=log_scale_values,
-                ).get(str(shift_distance))
+                shift_distance_score = weights.shifting.get(str(shift_distance))
             """
                 NOTE: Need to decide on what I should do with this!
                 print shift_distance
@@ -4009,11 +4111,7 @@ def calculate_playing_complexity(
                     if interval >= 21:
                         interval = 21
 
-                    interval_score = musiplectics.interval_weights(
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values,
-                    ).get(interval)
+                    interval_score = weights.interval.get(interval)
                     interval_complexity += interval_score
 
                     # Calculte the real time duration for the interval ioi
@@ -4031,12 +4129,7 @@ def calculate_playing_complexity(
                         ).get(closest_interval_ioi_duration)
                         """
 
-                    interval_ioi_score = musiplectics.duration_complexity_polynomial(
-                        interval_ioi_rt_duration,
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values,
-                    )
+                    interval_ioi_score = weights.duration(interval_ioi_rt_duration)
                     interval_ioi_complexity += interval_ioi_score
 
                     # work out if there is a change in dynamics:
@@ -4059,11 +4152,7 @@ def calculate_playing_complexity(
                         # diminuendo
                         interval_dynamic = "dim"
 
-                    interval_dynamic_score = musiplectics.dynamic_weights(
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values,
-                    ).get(interval_dynamic)
+                    interval_dynamic_score = weights.dynamic.get(interval_dynamic)
 
                     interval_dynamic_complexity += interval_dynamic_score
 
@@ -4075,11 +4164,9 @@ def calculate_playing_complexity(
                     if isinstance(previous_note.adornment.fretting.modulation, Slide):
                         interval_expression = "slide"
 
-                    interval_expression_score = musiplectics.expression_weights(
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values,
-                    ).get(interval_expression)
+                    interval_expression_score = weights.expression.get(
+                        interval_expression
+                    )
                     interval_expression_complexity += interval_expression_score
 
                     # work out the fret position of the interval:
@@ -4093,11 +4180,9 @@ def calculate_playing_complexity(
                             previous_note
                         )
 
-                    interval_fret_position_score = musiplectics.fret_position_weights(
-                        use_geometric_mean=use_geometric_mean,
-                        use_total_playing_time=use_total_playing_time,
-                        log_scale_values=log_scale_values,
-                    ).get(interval_fret_position)
+                    interval_fret_position_score = weights.fret_position.get(
+                        interval_fret_position
+                    )
                     interval_fret_position_complexity += interval_fret_position_score
                     """
                         # Following the Musiplectics paper interval complexity is the:
@@ -0,0 +1,647 @@
+"""
+NumPy version of calculate_playing_complexity for calculating the
+complexity of many measures at once.
+
+The notes of every measure are encoded into arrays of weight codes
+(techniques, expressions, articulations, dynamics, fret positions,
+shifts and intervals) and real time durations, then the BGM and EVC
+for all of the measures are calculated from the arrays together.
+Each measure is calculated on its own, as calculate_playing_complexity
+does with by_bar=[measure_number] or a Measure, and the sums and
+products are taken in note order so the values are the same.
+"""
+
+# Standard library imports
+from collections import namedtuple
+
+# 3rd party imports
+import numpy as np
+
+# Local application imports
+from .datatypes import Song, Measure, Slide
+from . import calculate_functions as calculate
+from .. import utilities
+from ...evaluation import musiplectics
+
+Complexity = namedtuple("ComplexityBoth", ["BGM", "EVC"])
+OutputComplexities = namedtuple("OutputComplexities", ["adorned", "unadorned"])
+
+# The weight codes for a weight set, codes maps the weight keys to
+# the index of their weight in values. The last value is padding.
+WeightTable = namedtuple("WeightTable", ["codes", "values"])
+
+# The notes of a list of measures encoded as arrays:
+ComplexityNoteArrays = namedtuple(
+    "ComplexityNoteArrays",
+    [
+        "weight_set",
+        "measure_count",
+        "note_measure",
+        "note_position",
+        "techniques",
+        "expressions",
+        "articulations",
+        "dynamics",
+        "fret_position",
+        "duration",
+        "shift",
+        "interval_measure",
+        "interval_position",
+        "interval_note",
+        "interval",
+        "interval_duration",
+        "interval_dynamic",
+        "interval_expression",
+        "interval_fret_position",
+        "time_sig",
+        "tempo",
+        "key_sig",
+    ],
+)
+
+# The complexities of the measures in ComplexityNoteArrays, each row
+# is a measure, BGM has the note and interval complexity sums and
+# EVC the complexity vector.
+MeasureComplexityArrays = namedtuple(
+    "MeasureComplexityArrays",
+    ["BGM", "EVC", "unadorned_BGM", "unadorned_EVC"],
+)
+
+# WeightTables that have been made for each weight set:
+weight_tables = {}
+
+
+def load_weight_tables(weight_set="GMS"):
+    """
+    Return a dictionary of WeightTables for the weight set,
+    made from the musiplectics.WeightSet dictionaries.
+    """
+    weights = musiplectics.load_weight_set(weight_set)
+
+    if weights.name not in weight_tables:
+        tables = {}
+        for weight_type in [
+            "technique",
+            "expression",
+            "articulation",
+            "dynamic",
+            "fret_position",
+            "shifting",
+            "interval",
+            "time_sig",
+            "key_sig",
+        ]:
+            weight_dict = getattr(weights, weight_type)
+            tables[weight_type] = WeightTable(
+                {key: code for code, key in enumerate(weight_dict.keys())},
+                np.array(list(weight_dict.values()) + [1.0], dtype=np.float64),
+            )
+        weight_tables[weights.name] = tables
+
+    return weight_tables[weights.name]
+
+
+def pad_codes(code_lists, pad):
+    """
+    Make a 2D array from the lists of codes for each note,
+    the short lists are padded at the end with pad.
+    """
+    width = max([len(codes) for codes in code_lists] + [1])
+    padded = np.full((len(code_lists), width), pad, dtype=np.int64)
+    for row, codes in enumerate(code_lists):
+        padded[row, : len(codes)] = codes
+    return padded
+
+
+def encode_measures(measures, weight_set="GMS"):
+    """
+    Encode the notes in the measures into ComplexityNoteArrays.
+
+    Parameters
+    ---------
+    measures : list of (MeasureMetaData, list of AdornedNotes)
+        the meta data and note lists of the measures, the grace
+        notes need to be in the note lists already
+        (see calculate_grace_note_possitions)
+
+    weight_set : str or musiplectics.WeightSet
+        the weight set the codes are for
+
+    Returns
+    -------
+    ComplexityNoteArrays
+    """
+    weights = musiplectics.load_weight_set(weight_set)
+    tables = load_weight_tables(weights)
+
+    def code(weight_type, key):
+        return tables[weight_type].codes[key]
+
+    notes = {
+        "measure": [],
+        "position": [],
+        "techniques": [],
+        "expressions": [],
+        "articulations": [],
+        "dynamics": [],
+        "fret_position": [],
+        "duration": [],
+        "shift": [],
+    }
+    intervals = {
+        "measure": [],
+        "position": [],
+        "note": [],
+        "interval": [],
+        "duration": [],
+        "dynamic": [],
+        "expression": [],
+        "fret_position": [],
+    }
+    time_sigs = []
+    tempos = []
+    key_sigs = []
+
+    for measure_index, (meta_data, note_list) in enumerate(measures):
+        bpm = meta_data.tempo
+        time_sigs.append(code("time_sig", meta_data.time_signature))
+        tempos.append(bpm)
+        key_sigs.append(code("key_sig", "KeySignature." + meta_data.key_signature))
+
+        position_window = []
+        previous_note = None
+        interval_position = 0
+
+        for position, adorned_note in enumerate(note_list):
+            note_index = len(notes["measure"])
+            notes["measure"].append(measure_index)
+            notes["position"].append(position)
+
+            notes["techniques"].append(
+                [
+                    code("technique", technique)
+                    for technique in calculate.calculate_musiplectic_techniques(
+                        adorned_note
+                    )
+                ]
+            )
+            notes["expressions"].append(
+                [
+                    code("expression", expression)
+                    for expression in calculate.calculate_musiplectic_expression(
+                        adorned_note
+                    )
+                ]
+            )
+
+            articulations = calculate.calculate_musiplectic_articulations(adorned_note)
+            if articulations == []:
+                articulations = [None]
+            notes["articulations"].append(
+                [code("articulation", articulation) for articulation in articulations]
+            )
+
+            dynamic = calculate.calculate_musiplectic_dynamic(adorned_note)
+            notes["dynamics"].append(
+                [code("dynamic", d) for d in dynamic if d is not None]
+            )
+
+            notes["fret_position"].append(
+                code(
+                    "fret_position",
+                    calculate.calculate_musiplectic_fret_possition(adorned_note),
+                )
+            )
+            notes["duration"].append(
+                calculate.calculate_realtime_duration(adorned_note.note.duration, bpm)
+            )
+
+            # Playing postion shift is only the fretting hand:
+            if adorned_note.adornment.plucking.technique != "tap":
+                shift_distance, position_window = calculate.calculate_playing_shift(
+                    adorned_note.note.fret_number, position_window
+                )
+            else:
+                shift_distance = 0
+            if shift_distance >= 13:
+                notes["shift"].append(code("shifting", "13+"))
+            else:
+                notes["shift"].append(code("shifting", str(shift_distance)))
+
+            # the intervals are between notes where the previous
+            # note has finished before the adorned note starts:
+            if previous_note is None:
+                previous_note = adorned_note
+                continue
+            if (
+                previous_note.note.start_time + previous_note.note.duration
+                > adorned_note.note.start_time
+            ):
+                continue
+
+            intervals["measure"].append(measure_index)
+            intervals["position"].append(interval_position)
+            intervals["note"].append(note_index)
+            interval_position += 1
+
+            intervals["interval"].append(
+                code(
+                    "interval",
+                    min(
+                        calculate.calculate_pitch_interval(adorned_note, previous_note),
+                        21,
+                    ),
+                )
+            )
+            intervals["duration"].append(
+                calculate.calculate_realtime_duration(
+                    adorned_note.note.start_time - previous_note.note.start_time, bpm
+                )
+            )
+
+            dynamic_change = utilities.dynamics_inv.get(
+                adorned_note.note.dynamic.value
+            ) - utilities.dynamics_inv.get(previous_note.note.dynamic.value)
+            interval_dynamic = dynamic[0]
+            if dynamic_change > 0:
+                interval_dynamic = "cresc"
+            if dynamic_change < 0:
+                interval_dynamic = "dim"
+            intervals["dynamic"].append(code("dynamic", interval_dynamic))
+
+            interval_expression = "none"
+            if isinstance(previous_note.adornment.fretting.modulation, Slide):
+                interval_expression = "slide"
+            intervals["expression"].append(code("expression", interval_expression))
+
+            if adorned_note.note.fret_number >= previous_note.note.fret_number:
+                interval_fret_note = adorned_note
+            else:
+                interval_fret_note = previous_note
+            intervals["fret_position"].append(
+                code(
+                    "fret_position",
+                    calculate.calculate_musiplectic_fret_possition(interval_fret_note),
+                )
+            )
+
+            previous_note = adorned_note
+
+    def pad(weight_type):
+        return len(tables[weight_type].codes)
+
+    return ComplexityNoteArrays(
+        weight_set=weights,
+        measure_count=len(measures),
+        note_measure=np.array(notes["measure"], dtype=np.int64),
+        note_position=np.array(notes["position"], dtype=np.int64),
+        techniques=pad_codes(notes["techniques"], pad("technique")),
+        expressions=pad_codes(notes["expressions"], pad("expression")),
+        articulations=pad_codes(notes["articulations"], pad("articulation")),
+        dynamics=pad_codes(notes["dynamics"], pad("dynamic")),
+        fret_position=np.array(notes["fret_position"], dtype=np.int64),
+        duration=np.array(notes["duration"], dtype=np.float64),
+        shift=np.array(notes["shift"], dtype=np.int64),
+        interval_measure=np.array(intervals["measure"], dtype=np.int64),
+        interval_position=np.array(intervals["position"], dtype=np.int64),
+        interval_note=np.array(intervals["note"], dtype=np.int64),
+        interval=np.array(intervals["interval"], dtype=np.int64),
+        interval_duration=np.array(intervals["duration"], dtype=np.float64),
+        interval_dynamic=np.array(intervals["dynamic"], dtype=np.int64),
+        interval_expression=np.array(intervals["expression"], dtype=np.int64),
+        interval_fret_position=np.array(intervals["fret_position"], dtype=np.int64),
+        time_sig=np.array(time_sigs, dtype=np.int64),
+        tempo=np.array(tempos, dtype=np.float64),
+        key_sig=np.array(key_sigs, dtype=np.int64),
+    )
+
+
+def measure_sums(values, measures, positions, measure_count):
+    """
+    Sum the values for each measure in note order, so the
+    sums are the same as adding them up one at a time.
+    """
+    width = positions.max() + 1 if len(positions) > 0 else 1
+    table = np.zeros((measure_count, width), dtype=np.float64)
+    table[measures, positions] = values
+    return np.cumsum(table, axis=1)[:, -1]
+
+
+def calculate_measure_complexity_arrays(note_arrays, use_product=True):
+    """
+    Calculate the complexities of the measures in note_arrays.
+
+    Parameters
+    ---------
+    note_arrays : ComplexityNoteArrays
+        the encoded measures, see encode_measures
+
+    use_product : boolean
+        if True take the product of the complexity weights
+        of musical elements from the same musical group
+        for the complexity vector, otherwise take the sum.
+
+    Returns
+    -------
+    MeasureComplexityArrays
+        the BGM note and interval complexities and the EVC complexity
+        vector for each measure, and the same for the unadorned measures.
+    """
+    a = note_arrays
+    weights = a.weight_set
+    tables = load_weight_tables(weights)
+    measure_count = a.measure_count
+
+    def note_sums(values):
+        return measure_sums(values, a.note_measure, a.note_position, measure_count)
+
+    def interval_sums(values):
+        return measure_sums(
+            values, a.interval_measure, a.interval_position, measure_count
+        )
+
+    def group_weights(weight_type, codes):
+        # the weights of the group for each note, combined
+        # as the product and the sum:
+        values = tables[weight_type].values[codes]
+        product = np.cumprod(values, axis=1)[:, -1]
+        if use_product:
+            return product, product
+        padding = codes == len(tables[weight_type].codes)
+        total = np.cumsum(np.where(padding, 0.0, values), axis=1)[:, -1]
+        return product, total
+
+    # note weights:
+    technique, technique_total = group_weights("technique", a.techniques)
+    expression, expression_total = group_weights("expression", a.expressions)
+    articulation, articulation_total = group_weights("articulation", a.articulations)
+    dynamic, dynamic_total = group_weights("dynamic", a.dynamics)
+    fret_position = tables["fret_position"].values[a.fret_position]
+    duration = weights.durations(a.duration)
+    shift = tables["shifting"].values[a.shift]
+    time_sig = tables["time_sig"].values[a.time_sig][a.note_measure]
+    tempo = weights.tempo_weights(a.tempo)[a.note_measure]
+    key_sig = tables["key_sig"].values[a.key_sig][a.note_measure]
+
+    note_complexity = (
+        fret_position
+        * technique
+        * expression
+        * articulation
+        * dynamic
+        * duration
+        * time_sig
+        * tempo
+    )
+    unadorned_note_complexity = fret_position * duration * time_sig * tempo
+
+    # interval weights:
+    interval = tables["interval"].values[a.interval]
+    interval_duration = weights.durations(a.interval_duration)
+    interval_key_sig = tables["key_sig"].values[a.key_sig][a.interval_measure]
+    interval_dynamic = tables["dynamic"].values[a.interval_dynamic]
+    interval_shift = shift[a.interval_note]
+    interval_fret_position = tables["fret_position"].values[a.interval_fret_position]
+    interval_expression = tables["expression"].values[a.interval_expression]
+
+    interval_complexity = (
+        interval
+        * interval_duration
+        * interval_key_sig
+        * interval_dynamic
+        * interval_shift
+        * interval_fret_position
+        * interval_expression
+    )
+    unadorned_interval_complexity = (
+        interval
+        * interval_duration
+        * interval_key_sig
+        * interval_shift
+        * interval_fret_position
+    )
+
+    # calculate_playing_complexity keeps the complexity of the last
+    # interval in a measure in the complexity vector:
+    last_interval_complexity = np.zeros(measure_count, dtype=np.float64)
+    if len(a.interval_measure) > 0:
+        last = np.append(a.interval_measure[1:] != a.interval_measure[:-1], True)
+        last_interval_complexity[a.interval_measure[last]] = interval_complexity[last]
+
+    note_count = note_sums(np.ones(len(a.note_measure)))
+    interval_count = interval_sums(np.ones(len(a.interval_measure)))
+
+    shared = {
+        "duration": note_sums(duration),
+        "tempo": note_sums(tempo),
+        "key_sig": note_sums(key_sig),
+        "time_sig": note_sums(time_sig),
+        "fret_position": note_sums(fret_position),
+        "interval": last_interval_complexity,
+        "interval_duration": interval_sums(interval_duration),
+        "shift": note_sums(shift),
+    }
+
+    def complexity_vector(
+        technique,
+        expression,
+        articulation,
+        dynamic,
+        interval_dynamic,
+        interval_expression,
+    ):
+        return np.column_stack(
+            [
+                technique,
+                shared["duration"],
+                shared["tempo"],
+                shared["key_sig"],
+                shared["time_sig"],
+                expression,
+                articulation,
+                dynamic,
+                shared["fret_position"],
+                shared["interval"],
+                shared["interval_duration"],
+                shared["shift"],
+                interval_dynamic,
+                interval_expression,
+            ]
+        )
+
+    vector = complexity_vector(
+        note_sums(technique_total),
+        note_sums(expression_total),
+        note_sums(articulation_total),
+        note_sums(dynamic_total),
+        interval_sums(interval_dynamic),
+        interval_sums(interval_expression),
+    )
+    unadorned_vector = complexity_vector(
+        note_count,
+        note_count,
+        note_count,
+        note_count,
+        interval_count,
+        interval_count,
+    )
+
+    return MeasureComplexityArrays(
+        BGM=np.column_stack(
+            [note_sums(note_complexity), interval_sums(interval_complexity)]
+        ),
+        EVC=vector,
+        unadorned_BGM=np.column_stack(
+            [
+                note_sums(unadorned_note_complexity),
+                interval_sums(unadorned_interval_complexity),
+            ]
+        ),
+        unadorned_EVC=unadorned_vector,
+    )
+
+
+def euclidean_complexities(vectors):
+    """
+    The euclidean complexity of each row of complexity vectors,
+    as calculate_euclidean_complexity.
+    """
+    return np.sqrt(np.cumsum(vectors * vectors, axis=1)[:, -1])
+
+
+def calculate_playing_complexity_for_measures(
+    input_data,
+    song=None,
+    measure_numbers=None,
+    weight_set="GMS",
+    raw_values=False,
+    unadorned_value=False,
+    use_product=True,
+):
+    """
+    Calculate the BGM and EVC complexity of many measures at once.
+
+    The measures are calculated on their own, the same as
+    calculate_playing_complexity with by_bar=[measure_number]
+    and calculation_type='both'.
+
+    Parameters
+    ---------
+    input_data : Song, list of note lists or list of Measures
+        - a Song, the complexity is calculated for its measures
+        - the note list of each measure in song
+            (see calculate_bars_from_note_list)
+        - a list of Measures, e.g. candidate measures
+
+    song : Song
+        the song the note lists are from
+
+    measure_numbers : list of int, optional
+        the measure indexes to calculate for a Song or note lists,
+        as by_bar, default is all of them.
+
+    weight_set : str or musiplectics.WeightSet
+        the complexity weight set to use
+
+    raw_values, unadorned_value, use_product :
+        as calculate_playing_complexity
+
+    Returns
+    -------
+    dict or list
+        For a Song or note lists, a dict of the Complexity for each
+        measure number that can be calculated. For a list of Measures,
+        the Complexity of each measure, None when it can't be calculated.
+        With unadorned_value the Complexities are OutputComplexities of
+        the adorned and unadorned values.
+    """
+    weights = musiplectics.load_weight_set(weight_set)
+
+    # a list of Measures or the note lists for song:
+    measure_list = isinstance(input_data, list) and (
+        input_data == [] or isinstance(input_data[0], Measure)
+    )
+
+    measures = []
+    if measure_list:
+        for measure in input_data:
+            measures.append(
+                (
+                    measure.meta_data,
+                    calculate.calculate_grace_note_possitions(
+                        calculate.calculate_tied_note_durations(measure)
+                    ),
+                )
+            )
+        keys = list(range(len(input_data)))
+    else:
+        if isinstance(input_data, Song):
+            song = input_data
+            note_lists = calculate.calculate_bars_from_note_list(
+                calculate.calculate_tied_note_durations(song), song
+            )
+        else:
+            note_lists = input_data
+
+        assert isinstance(song, Song), "song must be a Song for the note lists"
+
+        if measure_numbers is None:
+            measure_numbers = list(range(len(note_lists)))
+
+        keys = []
+        for measure_number in measure_numbers:
+            keys.append(measure_number + 1)
+            measures.append(
+                (
+                    song.measures[measure_number].meta_data,
+                    calculate.calculate_grace_note_possitions(
+                        note_lists[measure_number]
+                    ),
+                )
+            )
+
+    # skip measures that are not monophonic or
+    # don't have a time signature weight:
+    calculated = [
+        meta_data.monophonic is not False
+        and meta_data.time_signature in weights.time_sig
+        for meta_data, note_list in measures
+    ]
+
+    arrays = calculate_measure_complexity_arrays(
+        encode_measures(
+            [measure for measure, valid in zip(measures, calculated) if valid], weights
+        ),
+        use_product=use_product,
+    )
+
+    def complexities(bgm, evc):
+        if raw_values:
+            return [
+                Complexity(list(b), list(v)) for b, v in zip(bgm.tolist(), evc.tolist())
+            ]
+        return [
+            Complexity(float(b), float(v))
+            for b, v in zip(bgm[:, 0] + bgm[:, 1], euclidean_complexities(evc))
+        ]
+
+    adorned = complexities(arrays.BGM, arrays.EVC)
+    if unadorned_value:
+        unadorned = complexities(arrays.unadorned_BGM, arrays.unadorned_EVC)
+        adorned = [OutputComplexities(a, u) for a, u in zip(adorned, unadorned)]
+
+    if measure_list:
+        output = [None] * len(keys)
+        for key, complexity in zip(
+            [key for key, valid in zip(keys, calculated) if valid], adorned
+        ):
+            output[key] = complexity
+        return output
+
+    output = dict(zip([key for key, valid in zip(keys, calculated) if valid], adorned))
+    if unadorned_value:
+        return OutputComplexities(
+            {key: complexity.adorned for key, complexity in output.items()},
+            {key: complexity.unadorned for key, complexity in output.items()},
+        )
+    return output
@@ -0,0 +1,242 @@
+"""
+Memoisation of the complexity calculations.
+
+The complexities are cached with a key made from a stable hash of the
+contents of the notes (AdornedNote tuples) and measure meta data
+(tempo, time signature and key signature), the weight set and the
+calculation options. So a measure that has the same notes as one
+that has been calculated before is not calculated again, even if
+it is a different Measure object. The cache is a LRU cache in memory
+and can be backed by a file on disk so it can be used between runs.
+"""
+
+# Standard library imports
+import dbm
+import json
+import hashlib
+from collections import namedtuple, OrderedDict
+
+# Local application imports
+from .datatypes import Song, Measure
+from . import calculate_functions as calculate
+from ...evaluation import musiplectics
+
+CacheInfo = namedtuple(
+    "CacheInfo", ["hits", "disk_hits", "misses", "maxsize", "currsize"]
+)
+
+# namedtuple types made when loading cached values:
+cached_types = {}
+
+
+def canonical(value):
+    """
+    Return value as nested tuples of its contents, dicts are sorted
+    so that the same contents always give the same result.
+    """
+    if isinstance(value, tuple) and hasattr(value, "_fields"):
+        return (type(value).__name__,) + tuple(canonical(v) for v in value)
+    if isinstance(value, (list, tuple)):
+        return tuple(canonical(v) for v in value)
+    if isinstance(value, dict):
+        return (
+            "dict",
+            tuple(sorted((repr(k), canonical(v)) for k, v in value.items())),
+        )
+    if isinstance(value, musiplectics.WeightSet):
+        return ("WeightSet", value.name)
+    return value
+
+
+def structure_key(*values):
+    """
+    A stable hash of the contents of values, it is the same
+    between runs so it can be used as a key for the disk cache.
+    """
+    return hashlib.sha1(repr(canonical(values)).encode("utf-8")).hexdigest()
+
+
+def to_plain(value):
+    """
+    Convert value to lists and dicts that can be saved as json,
+    namedtuples and dict keys are kept so they can be remade.
+    """
+    if isinstance(value, tuple) and hasattr(value, "_fields"):
+        return {
+            "namedtuple": type(value).__name__,
+            "fields": list(value._fields),
+            "values": [to_plain(v) for v in value],
+        }
+    if isinstance(value, tuple):
+        return {"tuple": [to_plain(v) for v in value]}
+    if isinstance(value, list):
+        return [to_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {"dict": [[to_plain(k), to_plain(v)] for k, v in value.items()]}
+    assert value is None or isinstance(
+        value, (bool, int, float, str)
+    ), "can't cache values of type " + str(type(value))
+    return value
+
+
+def from_plain(value):
+    """
+    Remake a value from to_plain.
+    """
+    if isinstance(value, list):
+        return [from_plain(v) for v in value]
+    if isinstance(value, dict):
+        if "namedtuple" in value:
+            type_key = (value["namedtuple"], tuple(value["fields"]))
+            if type_key not in cached_types:
+                cached_types[type_key] = namedtuple(*type_key)
+            return cached_types[type_key](*[from_plain(v) for v in value["values"]])
+        if "tuple" in value:
+            return tuple(from_plain(v) for v in value["tuple"])
+        return {from_plain(k): from_plain(v) for k, v in value["dict"]}
+    return value
+
+
+class ComplexityCache(object):
+    """
+    A LRU cache of calculated values, optionally backed by a file.
+
+    Parameters
+    ---------
+    maxsize : int
+        the number of values to keep in memory
+
+    cache_file : str, optional
+        the file to save the values to, values that are not in memory
+        are looked for in the file before they are calculated.
+
+    Attributes
+    ----------
+    hits, disk_hits, misses : int
+        the number of values found in memory, found in the
+        cache file and calculated.
+    """
+
+    def __init__(self, maxsize=4096, cache_file=None):
+        self.maxsize = maxsize
+        self.cache_file = cache_file
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.disk = None
+        if cache_file is not None:
+            self.disk = dbm.open(cache_file, "c")
+
+    def cached(self, key, function, *args, **kwargs):
+        """
+        Return the cached value for key, or calculate it with
+        function(*args, **kwargs) and cache it.
+        """
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return from_plain(self.entries[key])
+
+        plain = None
+        if self.disk is not None and key in self.disk:
+            self.disk_hits += 1
+            plain = json.loads(self.disk[key])
+        else:
+            self.misses += 1
+            plain = to_plain(function(*args, **kwargs))
+            if self.disk is not None:
+                self.disk[key] = json.dumps(plain)
+
+        self.entries[key] = plain
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+        return from_plain(plain)
+
+    def info(self):
+        """The hit and miss counts and size of the cache as a CacheInfo."""
+        return CacheInfo(
+            self.hits, self.disk_hits, self.misses, self.maxsize, len(self.entries)
+        )
+
+    def clear(self):
+        """Empty the cache in memory and reset the counts."""
+        self.entries.clear()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def close(self):
+        """Close the cache file."""
+        if self.disk is not None:
+            self.disk.close()
+            self.disk = None
+
+
+# The cache used when no cache is given:
+default_cache = ComplexityCache()
+
+
+def cached_playing_complexity(
+    input_data,
+    song=None,
+    by_bar=True,
+    calculation_type="both",
+    weight_set="GMS",
+    raw_values=False,
+    unadorned_value=False,
+    use_product=True,
+    cache=None,
+):
+    """
+    calculate_playing_complexity with the result cached.
+
+    The key is made from the notes in input_data, the meta data of
+    the measures in song that are used, the weight set and the other
+    arguments.
+
+    Parameters
+    ---------
+    cache : ComplexityCache, optional
+        the cache to use, default_cache if None.
+
+    See calculate_playing_complexity for the rest of the parameters.
+    """
+    if cache is None:
+        cache = default_cache
+
+    # only the meta data of the song measures is used
+    # when the input data is a list of notes:
+    song_meta_data = None
+    if song is not None and not isinstance(input_data, (Song, Measure)):
+        if isinstance(by_bar, list):
+            song_meta_data = [song.measures[number].meta_data for number in by_bar]
+        else:
+            song_meta_data = [measure.meta_data for measure in song.measures]
+
+    key = structure_key(
+        "calculate_playing_complexity",
+        input_data,
+        song_meta_data,
+        by_bar,
+        calculation_type,
+        musiplectics.load_weight_set(weight_set).name,
+        raw_values,
+        unadorned_value,
+        use_product,
+    )
+
+    return cache.cached(
+        key,
+        calculate.calculate_playing_complexity,
+        input_data,
+        song=song,
+        by_bar=by_bar,
+        calculation_type=calculation_type,
+        weight_set=weight_set,
+        raw_values=raw_values,
+        unadorned_value=unadorned_value,
+        use_product=use_product,
+    )
@@ -0,0 +1,519 @@
+"""
+Incremental version of calculate_playing_complexity for a Measure.
+
+The complexity weights of every note and interval in a measure are
+kept, so when the notes of the measure change (e.g. the adornment of
+a note is changed) only the weights of the notes and intervals that
+have changed are worked out again. The complexities are then added up
+from the kept weights in the same order as calculate_playing_complexity,
+so the values are the same.
+"""
+
+# Standard library imports
+from collections import namedtuple
+from functools import reduce
+from operator import mul, add
+
+# Local application imports
+from .datatypes import Slide
+from . import calculate_functions as calculate
+from .complexity_arrays import Complexity, OutputComplexities
+from . import complexity_cache
+from .. import utilities
+from ...evaluation import musiplectics
+
+# The complexity weights of a note, the technique, expression,
+# articulation and dynamic weights are lists of the weights
+# for each one the note has:
+NoteWeights = namedtuple(
+    "NoteWeights",
+    [
+        "technique",
+        "duration",
+        "expression",
+        "articulation",
+        "dynamic",
+        "fret_position",
+    ],
+)
+
+# The complexity weights of an interval between two notes:
+IntervalWeights = namedtuple(
+    "IntervalWeights",
+    ["interval", "duration", "dynamic", "expression", "fret_position"],
+)
+
+
+def calculate_dynamic_weights(adorned_note, weights):
+    """
+    The list of dynamic weights for the adorned_note,
+    as calculate_playing_complexity.
+    """
+    dynamic = calculate.calculate_musiplectic_dynamic(adorned_note)
+    dynamic_score = []
+    if len(dynamic) == 2:
+        dynamic_score.append(weights.dynamic.get(dynamic[0]))
+        if dynamic[1] is not None:
+            dynamic_score.append(weights.dynamic.get(dynamic[1]))
+    return dynamic_score
+
+
+def calculate_note_weights(adorned_note, bpm, weights, playing_techniques=None):
+    """
+    Calculate the complexity weights of a note.
+
+    Parameters
+    ---------
+    adorned_note : AdornedNote
+        the note, grace notes need to be their own notes already
+        (see calculate_grace_note_possitions)
+
+    bpm : number
+        the tempo of the measure the note is in
+
+    weights : musiplectics.WeightSet
+        the weights to use
+
+    playing_techniques : list, optional
+        the musiplectic techniques of the note, if
+        None they are calculated from adorned_note
+
+    Returns
+    -------
+    NoteWeights
+    """
+    if playing_techniques is None:
+        playing_techniques = calculate.calculate_musiplectic_techniques(adorned_note)
+
+    articulations_accents = calculate.calculate_musiplectic_articulations(adorned_note)
+    if articulations_accents == []:
+        articulations_accents = [None]
+
+    return NoteWeights(
+        technique=[weights.technique.get(t) for t in playing_techniques],
+        duration=weights.duration(
+            calculate.calculate_realtime_duration(adorned_note.note.duration, bpm)
+        ),
+        expression=[
+            weights.expression.get(e)
+            for e in calculate.calculate_musiplectic_expression(adorned_note)
+        ],
+        articulation=[weights.articulation.get(a) for a in articulations_accents],
+        dynamic=calculate_dynamic_weights(adorned_note, weights),
+        fret_position=weights.fret_position.get(
+            calculate.calculate_musiplectic_fret_possition(adorned_note)
+        ),
+    )
+
+
+def cached_note_weights(
+    adorned_note, bpm, weight_set="GMS", playing_techniques=None, cache=None
+):
+    """
+    calculate_note_weights with the result cached, the key is made
+    from the adorned_note, bpm and weight set.
+
+    Parameters
+    ---------
+    cache : complexity_cache.ComplexityCache, optional
+        the cache to use, complexity_cache.default_cache if None.
+    """
+    if cache is None:
+        cache = complexity_cache.default_cache
+
+    weights = musiplectics.load_weight_set(weight_set)
+    key = complexity_cache.structure_key(
+        "calculate_note_weights", adorned_note, bpm, weights.name, playing_techniques
+    )
+
+    return cache.cached(
+        key, calculate_note_weights, adorned_note, bpm, weights, playing_techniques
+    )
+
+
+def calculate_interval_weights(adorned_note, previous_note, bpm, weights):
+    """
+    Calculate the complexity weights of the interval
+    from previous_note to adorned_note.
+
+    Returns
+    -------
+    IntervalWeights
+    """
+    interval = calculate.calculate_pitch_interval(adorned_note, previous_note)
+    if interval >= 21:
+        interval = 21
+
+    interval_ioi = adorned_note.note.start_time - previous_note.note.start_time
+
+    # default no dynamic change so it is the same as the adorned note,
+    # otherwise it is a cressendo or diminuendo:
+    dynamic_change = utilities.dynamics_inv.get(
+        adorned_note.note.dynamic.value
+    ) - utilities.dynamics_inv.get(previous_note.note.dynamic.value)
+    interval_dynamic = calculate.calculate_musiplectic_dynamic(adorned_note)[0]
+    if dynamic_change > 0:
+        interval_dynamic = "cresc"
+    if dynamic_change < 0:
+        interval_dynamic = "dim"
+
+    interval_expression = "none"
+    if isinstance(previous_note.adornment.fretting.modulation, Slide):
+        interval_expression = "slide"
+
+    # the fret position of the interval is the greater fret position:
+    if adorned_note.note.fret_number >= previous_note.note.fret_number:
+        interval_fret_position = calculate.calculate_musiplectic_fret_possition(
+            adorned_note
+        )
+    else:
+        interval_fret_position = calculate.calculate_musiplectic_fret_possition(
+            previous_note
+        )
+
+    return IntervalWeights(
+        interval=weights.interval.get(interval),
+        duration=weights.duration(
+            calculate.calculate_realtime_duration(interval_ioi, bpm)
+        ),
+        dynamic=weights.dynamic.get(interval_dynamic),
+        expression=weights.expression.get(interval_expression),
+        fret_position=weights.fret_position.get(interval_fret_position),
+    )
+
+
+class IncrementalComplexity(object):
+    """
+    The complexity of a measure that is kept up to date as its notes
+    change, giving the same values as calculate_playing_complexity
+    with a Measure and calculation_type='both'.
+
+    Parameters
+    ---------
+    measure : Measure
+        the measure to calculate the complexity of
+
+    weight_set : str or musiplectics.WeightSet
+        the complexity weight set to use
+
+    use_product : boolean
+        as calculate_playing_complexity
+
+    cache : complexity_cache.ComplexityCache, optional
+        if given the note weights are cached in it,
+        so they can be reused between measures.
+
+    Attributes
+    ----------
+    calculated_notes, calculated_intervals : int
+        the number of note and interval weights that have been
+        calculated, the rest have been reused.
+    """
+
+    def __init__(self, measure, weight_set="GMS", use_product=True, cache=None):
+        self.weights = musiplectics.load_weight_set(weight_set)
+        self.use_product = use_product
+        self.cache = cache
+        self.measure = None
+        self.calculated_notes = 0
+        self.calculated_intervals = 0
+
+        # the notes in the measure with their weights and shift weight,
+        # and the intervals as (note index, previous note, weights):
+        self.notes = []
+        self.note_weights = []
+        self.shift_weights = []
+        self.intervals = []
+
+        self.update(measure)
+
+    def replace_note(self, note_index, adorned_note):
+        """
+        Replace the note at note_index in the measure notes with
+        adorned_note, e.g. to change the adornment of the note.
+        """
+        notes = list(self.measure.notes)
+        notes[note_index] = adorned_note
+        self.update(self.measure._replace(notes=notes))
+
+    def update(self, measure):
+        """
+        Change the measure to measure, only the weights of the notes
+        and intervals that are different to the current measure are
+        calculated.
+        """
+        weights = self.weights
+        meta_data = measure.meta_data
+
+        # the weights depend on the tempo so
+        # none of them can be reused:
+        if self.measure is None or self.measure.meta_data != meta_data:
+            self.notes = []
+            self.note_weights = []
+            self.shift_weights = []
+            self.intervals = []
+        self.measure = measure
+
+        # skip non-monophonic measures and measures with a
+        # time signature that doesn't have a complexity weight:
+        self.calculated = (
+            meta_data.monophonic is not False
+            and meta_data.time_signature in weights.time_sig
+        )
+        if not self.calculated:
+            return
+
+        bpm = meta_data.tempo
+        self.time_sig_score = weights.time_sig.get(meta_data.time_signature)
+        self.bpm_score = weights.tempo_weight(bpm)
+        self.key_sig_score = weights.key_sig.get(
+            "KeySignature." + meta_data.key_signature
+        )
+
+        notelist = calculate.calculate_grace_note_possitions(
+            calculate.calculate_tied_note_durations(measure)
+        )
+
+        # the old notes are matched by their position from the start,
+        # and from the end for when a grace note has been added or removed:
+        old_notes = self.notes
+        old_note_weights = self.note_weights
+        old_intervals = {
+            note_index: (previous_note, interval_weights)
+            for note_index, previous_note, interval_weights in self.intervals
+        }
+        offset = len(old_notes) - len(notelist)
+
+        def old_index(index, adorned_note):
+            for i in [index, index + offset]:
+                if 0 <= i < len(old_notes) and old_notes[i] == adorned_note:
+                    return i
+            return None
+
+        note_weights = []
+        shift_weights = []
+        intervals = []
+        position_window = []
+        previous_note = None
+
+        for index, adorned_note in enumerate(notelist):
+            i = old_index(index, adorned_note)
+            if i is None:
+                if self.cache is None:
+                    note_weights.append(
+                        calculate_note_weights(adorned_note, bpm, weights)
+                    )
+                else:
+                    note_weights.append(
+                        cached_note_weights(
+                            adorned_note, bpm, weights, cache=self.cache
+                        )
+                    )
+                self.calculated_notes += 1
+            else:
+                note_weights.append(old_note_weights[i])
+
+            # Playing postion shift is only the fretting hand:
+            if adorned_note.adornment.plucking.technique != "tap":
+                shift_distance, position_window = calculate.calculate_playing_shift(
+                    adorned_note.note.fret_number, position_window
+                )
+            else:
+                shift_distance = 0
+            if shift_distance >= 13:
+                shift_weights.append(weights.shifting.get("13+"))
+            else:
+                shift_weights.append(weights.shifting.get(str(shift_distance)))
+
+            # the intervals are between notes where the previous
+            # note has finished before the adorned note starts:
+            if previous_note is None:
+                previous_note = adorned_note
+                continue
+            if (
+                previous_note.note.start_time + previous_note.note.duration
+                > adorned_note.note.start_time
+            ):
+                continue
+
+            old_interval = old_intervals.get(i) if i is not None else None
+            if old_interval is not None and old_interval[0] == previous_note:
+                interval_weights = old_interval[1]
+            else:
+                interval_weights = calculate_interval_weights(
+                    adorned_note, previous_note, bpm, weights
+                )
+                self.calculated_intervals += 1
+            intervals.append((index, previous_note, interval_weights))
+
+            previous_note = adorned_note
+
+        self.notes = notelist
+        self.note_weights = note_weights
+        self.shift_weights = shift_weights
+        self.intervals = intervals
+
+    def complexity(self, raw_values=False, unadorned_value=False):
+        """
+        The complexity of the measure.
+
+        Parameters
+        ---------
+        raw_values, unadorned_value :
+            as calculate_playing_complexity
+
+        Returns
+        -------
+        Complexity or OutputComplexities
+            the same as calculate_playing_complexity, None if
+            the measure complexity can't be calculated
+        """
+        if not self.calculated:
+            return None
+
+        group = mul if self.use_product else add
+        time_sig_score = self.time_sig_score
+        bpm_score = self.bpm_score
+        key_sig_score = self.key_sig_score
+
+        playing_technique_complexity = 0
+        duration_tempo_complexity = 0
+        bpm_complexity = 0
+        key_sig_complexity = 0
+        time_sig_complexity = 0
+        expressive_techniques_complexity = 0
+        articulations_accents_complexity = 0
+        dynamics_complexity = 0
+        fret_playing_postion_complexity = 0
+        shift_distance_complexity = 0
+        note_count = 0
+        note_playing_complexities = []
+        note_playing_complexities_unadorned = []
+
+        for weights, shift_distance_score in zip(self.note_weights, self.shift_weights):
+            playing_technique_complexity += reduce(group, weights.technique)
+            duration_tempo_complexity += weights.duration
+            time_sig_complexity += time_sig_score
+            bpm_complexity += bpm_score
+            expressive_techniques_complexity += reduce(group, weights.expression)
+            articulations_accents_complexity += reduce(group, weights.articulation)
+            dynamics_complexity += reduce(group, weights.dynamic)
+            key_sig_complexity += key_sig_score
+            fret_playing_postion_complexity += weights.fret_position
+            shift_distance_complexity += shift_distance_score
+            note_count += 1
+
+            note_playing_complexities.append(
+                weights.fret_position
+                * reduce(mul, weights.technique)
+                * reduce(mul, weights.expression)
+                * reduce(mul, weights.articulation)
+                * reduce(mul, weights.dynamic)
+                * weights.duration
+                * time_sig_score
+                * bpm_score
+            )
+            note_playing_complexities_unadorned.append(
+                weights.fret_position * weights.duration * time_sig_score * bpm_score
+            )
+
+        interval_complexity = 0
+        interval_ioi_complexity = 0
+        interval_dynamic_complexity = 0
+        interval_expression_complexity = 0
+        interval_count = 0
+        note_interval_complexities = []
+        note_interval_complexities_unadorned = []
+
+        for note_index, previous_note, weights in self.intervals:
+            shift_distance_score = self.shift_weights[note_index]
+            interval_ioi_complexity += weights.duration
+            interval_dynamic_complexity += weights.dynamic
+            interval_expression_complexity += weights.expression
+            interval_count += 1
+
+            # calculate_playing_complexity keeps the
+            # complexity of the last interval:
+            interval_complexity = (
+                weights.interval
+                * weights.duration
+                * key_sig_score
+                * weights.dynamic
+                * shift_distance_score
+                * weights.fret_position
+                * weights.expression
+            )
+            note_interval_complexities.append(interval_complexity)
+            note_interval_complexities_unadorned.append(
+                weights.interval
+                * weights.duration
+                * key_sig_score
+                * shift_distance_score
+                * weights.fret_position
+            )
+
+        def output(
+            technique,
+            expression,
+            articulation,
+            dynamic,
+            interval_dynamic,
+            interval_expression,
+            note_complexities,
+            interval_complexities,
+        ):
+            playing_complexity_vector = [
+                technique,
+                duration_tempo_complexity,
+                bpm_complexity,
+                key_sig_complexity,
+                time_sig_complexity,
+                expression,
+                articulation,
+                dynamic,
+                fret_playing_postion_complexity,
+                interval_complexity,
+                interval_ioi_complexity,
+                shift_distance_complexity,
+                interval_dynamic,
+                interval_expression,
+            ]
+            musiplectics_playing_complexity = [
+                sum(note_complexities),
+                sum(interval_complexities),
+            ]
+            if raw_values:
+                return Complexity(
+                    musiplectics_playing_complexity, playing_complexity_vector
+                )
+            return Complexity(
+                sum(musiplectics_playing_complexity),
+                calculate.calculate_euclidean_complexity(playing_complexity_vector),
+            )
+
+        adorned = output(
+            playing_technique_complexity,
+            expressive_techniques_complexity,
+            articulations_accents_complexity,
+            dynamics_complexity,
+            interval_dynamic_complexity,
+            interval_expression_complexity,
+            note_playing_complexities,
+            note_interval_complexities,
+        )
+        if not unadorned_value:
+            return adorned
+
+        return OutputComplexities(
+            adorned,
+            output(
+                note_count,
+                note_count,
+                note_count,
+                note_count,
+                interval_count,
+                interval_count,
+                note_playing_complexities_unadorned,
+                note_interval_complexities_unadorned,
+            ),
+        )
@@ -0,0 +1,385 @@
+"""
+A columnar NoteTable of the notes and rests in a Song.
+
+Every event in the song is a row of the table and each field of the
+AdornedNote/Rest namedtuples is a column (a NumPy array):
+integers are stored as int64 arrays, the Fraction start times and
+durations as int64 numerator and denominator arrays, and the
+adornments and other values are coded as integers that index a list
+of the different values in the column. So analysis can be done on the
+arrays without making the AdornedNote tuples, and the Song can be
+made again from the table (song_from_note_table) with the same values.
+"""
+
+# Standard library imports
+from fractions import Fraction
+from collections import namedtuple
+
+# 3rd party imports
+import numpy as np
+
+# Local application imports
+from .datatypes import *
+
+# The columns of the table with integer values, the values are 0 for rests:
+integer_columns = ["note_number", "pitch", "fret_number", "string_number"]
+
+# The columns of Fractions, stored as <column>_numerator
+# and <column>_denominator arrays:
+rational_columns = ["start_time", "duration"]
+
+# The columns coded as indexes into NoteTable.categories[column],
+# the code is -1 for rests (and for notes without a bend for bend_type
+# and bend_value). bend_point_vibrato is coded the same way:
+category_columns = [
+    "notated_duration",
+    "string_tuning",
+    "dynamic",
+    "cres_dim",
+    "plucking_technique",
+    "palm_mute",
+    "artificial_harmonic",
+    "plucking_accent",
+    "fretting_technique",
+    "fretting_modification",
+    "let_ring",
+    "fretting_accent",
+    "bend_type",
+    "bend_value",
+    "vibrato",
+    "trill",
+    "slide",
+    "grace_note",
+    "ghost_note",
+]
+
+# The events of the song are the rows of columns, the events of
+# measure i are rows measure_offsets[i] to measure_offsets[i + 1].
+# The points of the bend of row j are bend_point_offsets[j] to
+# bend_point_offsets[j + 1] in the bend_point_* columns.
+NoteTable = namedtuple(
+    "NoteTable",
+    [
+        "meta_data",
+        "measure_meta_data",
+        "measure_start_time_numerator",
+        "measure_start_time_denominator",
+        "measure_offsets",
+        "columns",
+        "categories",
+    ],
+)
+
+
+class CategoryCoder(object):
+    """
+    Give each different value added to a column an integer code.
+
+    The values are compared by their type as well, so that
+    True and 1 (which are equal) get different codes.
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value):
+        key = (type(value), value)
+        if key not in self.codes:
+            self.codes[key] = len(self.values)
+            self.values.append(value)
+        return self.codes[key]
+
+
+def rational_arrays(values):
+    """
+    The numerator and denominator arrays of a list of Fractions (or ints).
+    """
+    fractions = [Fraction(value) for value in values]
+    return (
+        np.array([value.numerator for value in fractions], dtype=np.int64),
+        np.array([value.denominator for value in fractions], dtype=np.int64),
+    )
+
+
+def calculate_note_table(song):
+    """
+    Make a NoteTable of the notes and rests in the song.
+
+    Parameters
+    ---------
+    song : Song
+
+    Returns
+    -------
+    NoteTable
+    """
+    assert isinstance(song, Song), "%s is not a Song datatype" % (type(song))
+
+    coders = {
+        column: CategoryCoder() for column in category_columns + ["bend_point_vibrato"]
+    }
+
+    def code(column, value):
+        return coders[column].code(value)
+
+    values = {
+        column: []
+        for column in integer_columns
+        + rational_columns
+        + category_columns
+        + [
+            "is_rest",
+            "bend_point_offsets",
+            "bend_point_position",
+            "bend_point_value",
+            "bend_point_vibrato",
+        ]
+    }
+    values["bend_point_offsets"].append(0)
+
+    measure_offsets = [0]
+    for measure in song.measures:
+        for event in measure.notes:
+            row = {column: -1 for column in category_columns}
+            row.update({column: 0 for column in integer_columns})
+            bend_points = []
+
+            if isinstance(event, Rest):
+                row["is_rest"] = True
+                row["note_number"] = event.note_number
+                row["start_time"] = event.start_time
+                row["duration"] = event.duration
+                row["notated_duration"] = code(
+                    "notated_duration", event.notated_duration
+                )
+            else:
+                assert isinstance(
+                    event, AdornedNote
+                ), "%s is not a Rest or AdornedNote datatype" % (type(event))
+                note = event.note
+                plucking = event.adornment.plucking
+                fretting = event.adornment.fretting
+                modulation = fretting.modulation
+
+                row["is_rest"] = False
+                row["note_number"] = note.note_number
+                row["pitch"] = note.pitch
+                row["fret_number"] = note.fret_number
+                row["string_number"] = note.string_number
+                row["start_time"] = note.start_time
+                row["duration"] = note.duration
+                row["notated_duration"] = code(
+                    "notated_duration", note.notated_duration
+                )
+                # the tuning dictionaries are coded by their items:
+                row["string_tuning"] = code(
+                    "string_tuning", tuple(note.string_tuning.items())
+                )
+                row["dynamic"] = code("dynamic", note.dynamic.value)
+                row["cres_dim"] = code("cres_dim", note.dynamic.cres_dim)
+
+                row["plucking_technique"] = code(
+                    "plucking_technique", plucking.technique
+                )
+                row["palm_mute"] = code("palm_mute", plucking.modification.palm_mute)
+                row["artificial_harmonic"] = code(
+                    "artificial_harmonic", plucking.modification.artificial_harmonic
+                )
+                row["plucking_accent"] = code("plucking_accent", plucking.accent)
+
+                row["fretting_technique"] = code(
+                    "fretting_technique", fretting.technique
+                )
+                row["fretting_modification"] = code(
+                    "fretting_modification", fretting.modification.type
+                )
+                row["let_ring"] = code("let_ring", fretting.modification.let_ring)
+                row["fretting_accent"] = code("fretting_accent", fretting.accent)
+
+                if modulation.bend is not None:
+                    row["bend_type"] = code("bend_type", modulation.bend.type)
+                    row["bend_value"] = code("bend_value", modulation.bend.value)
+                    bend_points = modulation.bend.points
+                row["vibrato"] = code("vibrato", modulation.vibrato)
+                row["trill"] = code("trill", modulation.trill)
+                row["slide"] = code("slide", modulation.slide)
+
+                row["grace_note"] = code("grace_note", event.adornment.grace_note)
+                row["ghost_note"] = code("ghost_note", event.adornment.ghost_note)
+
+            for bend_point in bend_points:
+                values["bend_point_position"].append(bend_point.position)
+                values["bend_point_value"].append(bend_point.value)
+                values["bend_point_vibrato"].append(
+                    code("bend_point_vibrato", bend_point.vibrato)
+                )
+            values["bend_point_offsets"].append(
+                values["bend_point_offsets"][-1] + len(bend_points)
+            )
+
+            for column in integer_columns + rational_columns + category_columns:
+                values[column].append(row[column])
+            values["is_rest"].append(row["is_rest"])
+
+        measure_offsets.append(len(values["is_rest"]))
+
+    columns = {}
+    for column in integer_columns + [
+        "bend_point_offsets",
+        "bend_point_position",
+        "bend_point_value",
+    ]:
+        columns[column] = np.array(values[column], dtype=np.int64)
+    for column in category_columns + ["bend_point_vibrato"]:
+        columns[column] = np.array(values[column], dtype=np.int32)
+    for column in rational_columns:
+        (
+            columns[column + "_numerator"],
+            columns[column + "_denominator"],
+        ) = rational_arrays(values[column])
+    columns["is_rest"] = np.array(values["is_rest"], dtype=bool)
+
+    measure_start_time_numerator, measure_start_time_denominator = rational_arrays(
+        [measure.start_time for measure in song.measures]
+    )
+
+    return NoteTable(
+        song.meta_data,
+        [measure.meta_data for measure in song.measures],
+        measure_start_time_numerator,
+        measure_start_time_denominator,
+        np.array(measure_offsets, dtype=np.int64),
+        columns,
+        {column: coder.values for column, coder in coders.items()},
+    )
+
+
+def category_code(note_table, column, value):
+    """
+    The code of value in a category column of the note_table,
+    or -1 if no row has the value.
+    """
+    for code, column_value in enumerate(note_table.categories[column]):
+        if type(column_value) is type(value) and column_value == value:
+            return code
+    return -1
+
+
+def category_values(note_table, column):
+    """
+    The values of a category column for each row, None for the rows
+    coded -1 (rests, and notes without a bend for the bend columns).
+    """
+    categories = note_table.categories[column]
+    return [
+        None if code < 0 else categories[code] for code in note_table.columns[column]
+    ]
+
+
+def rational_values(note_table, column):
+    """
+    The values of a rational column (start_time or duration) as floats.
+    """
+    return (
+        note_table.columns[column + "_numerator"]
+        / note_table.columns[column + "_denominator"]
+    )
+
+
+def event_from_note_table(note_table, row):
+    """
+    Make the AdornedNote or Rest in a row of the note_table.
+    """
+    columns = note_table.columns
+
+    def category(column):
+        return note_table.categories[column][columns[column][row]]
+
+    def rational(column):
+        return Fraction(
+            int(columns[column + "_numerator"][row]),
+            int(columns[column + "_denominator"][row]),
+        )
+
+    if columns["is_rest"][row]:
+        return Rest(
+            int(columns["note_number"][row]),
+            rational("start_time"),
+            rational("duration"),
+            category("notated_duration"),
+        )
+
+    bend = None
+    if columns["bend_type"][row] >= 0:
+        first = columns["bend_point_offsets"][row]
+        last = columns["bend_point_offsets"][row + 1]
+        bend = Bend(
+            category("bend_type"),
+            category("bend_value"),
+            [
+                BendPoint(
+                    int(columns["bend_point_position"][point]),
+                    int(columns["bend_point_value"][point]),
+                    note_table.categories["bend_point_vibrato"][
+                        columns["bend_point_vibrato"][point]
+                    ],
+                )
+                for point in range(first, last)
+            ],
+        )
+
+    note = Note(
+        int(columns["note_number"][row]),
+        int(columns["pitch"][row]),
+        int(columns["fret_number"][row]),
+        int(columns["string_number"][row]),
+        dict(category("string_tuning")),
+        rational("start_time"),
+        rational("duration"),
+        category("notated_duration"),
+        Dynamic(category("dynamic"), category("cres_dim")),
+    )
+
+    adornment = Adornment(
+        PluckingAdornment(
+            category("plucking_technique"),
+            PluckingModification(
+                category("palm_mute"), category("artificial_harmonic")
+            ),
+            category("plucking_accent"),
+        ),
+        FrettingAdornment(
+            category("fretting_technique"),
+            FrettingModification(
+                category("fretting_modification"), category("let_ring")
+            ),
+            category("fretting_accent"),
+            Modulation(bend, category("vibrato"), category("trill"), category("slide")),
+        ),
+        category("grace_note"),
+        category("ghost_note"),
+    )
+
+    return AdornedNote(note, adornment)
+
+
+def song_from_note_table(note_table):
+    """
+    Make the Song that the note_table was made from.
+    """
+    measures = []
+    for index, meta_data in enumerate(note_table.measure_meta_data):
+        start_time = Fraction(
+            int(note_table.measure_start_time_numerator[index]),
+            int(note_table.measure_start_time_denominator[index]),
+        )
+        notes = [
+            event_from_note_table(note_table, row)
+            for row in range(
+                note_table.measure_offsets[index], note_table.measure_offsets[index + 1]
+            )
+        ]
+        measures.append(Measure(meta_data, start_time, notes))
+
+    return Song(note_table.meta_data, measures)
@@ -0,0 +1,65 @@
+import os
+import glob
+import shutil
+import tempfile
+
+import guitarpro
+
+from parser.API.get_functions import get_song_data
+import parser.API.calculate_functions as calculate
+from feature_analysis import adornment_features
+
+gp5_files = sorted(glob.glob("./gp5files/Listening-test-mono/*.gp5"))
+
+feature_table = adornment_features.calculate_corpus_feature_table(
+    gp5_files + ["./gp5files/not_a_file.gp5"])
+
+assert feature_table.failed == ["./gp5files/not_a_file.gp5"]
+assert feature_table.columns == adornment_features.feature_table_header[1:]
+assert feature_table.values.shape == (len(gp5_files),
+                                      len(feature_table.columns))
+
+# the rates and densities are the counts of the notes with
+# each feature over the number of notes and song duration:
+song = get_song_data(guitarpro.parse(gp5_files[0]))[0]
+note_list = calculate.calculate_tied_note_durations(song)
+song_duration = float(calculate.calculate_song_duration(song))
+row = feature_table.values[feature_table.file_ids.index(
+    os.path.splitext(os.path.basename(gp5_files[0]))[0])]
+for feature in adornment_features.adornment_feature_names:
+    count = len([
+        adorned_note for adorned_note in note_list if feature in
+        adornment_features.note_features(adorned_note)
+    ])
+    assert row[feature_table.columns.index(feature +
+                                           '_rate')] == count / len(note_list)
+    assert row[feature_table.columns.index(feature +
+                                           '_density')] == count / song_duration
+
+# notes with a group's techniques are counted for the group as well:
+assert adornment_features.note_features(
+    note_list[0]) >= set([
+        adornment_features.feature_groups[feature]
+        for feature in calculate.calculate_musiplectic_techniques(note_list[0])
+        if feature in adornment_features.feature_groups
+    ])
+
+# the parallel table is the same and it can be saved and loaded:
+table_folder = tempfile.mkdtemp()
+parallel_feature_table = adornment_features.calculate_corpus_feature_table(
+    "./gp5files/Listening-test-mono",
+    output_file=os.path.join(table_folder, "features.npz"),
+    workers=2)
+assert parallel_feature_table.file_ids == feature_table.file_ids
+assert (parallel_feature_table.values == feature_table.values).all()
+
+loaded_feature_table = adornment_features.load_feature_table(
+    os.path.join(table_folder, "features.npz"))
+assert loaded_feature_table.file_ids == feature_table.file_ids
+assert loaded_feature_table.columns == feature_table.columns
+assert (loaded_feature_table.values == feature_table.values).all()
+shutil.rmtree(table_folder)
+
+rows = adornment_features.feature_table_rows(feature_table)
+assert rows[0] == adornment_features.feature_table_header
+assert len(rows) == len(gp5_files) + 1
@@ -1,7 +1,17 @@
 import test_api_calculate_functions
 import test_api_to_dict
+import test_note_table
+import test_complexity_arrays
+import test_incremental_complexity
+import test_complexity_cache
+import test_bar_notes
+import test_ticks
+import test_weight_sets
+import test_tied_note_cache
 import test_cbr
 import test_database
+import test_fantastic
+import test_adornment_features
 import test_feature_analysis
 import test_natural_harmonic_pitches
 import test_reporter
@@ -0,0 +1,25 @@
+import guitarpro
+
+from parser.API.get_functions import get_song_data
+from parser.API.calculate_functions import (calculate_tied_note_durations,
+                                            calculate_bars_from_note_list,
+                                            calcuate_note_is_in_measure)
+
+# The notes in each bar are the same as checking
+# every note against every measure:
+for gp5_file in [
+        "./gp5files/test_scores/calculate_playing_complexity_test.gp5",
+        "./gp5files/Listening-test-mono/tol.gp5",
+        "./gp5files/Listening-test-mono/sd.gp5",
+]:
+    bar_song = get_song_data(guitarpro.parse(gp5_file))[0]
+    bar_note_list = calculate_tied_note_durations(bar_song)
+    shuffled_note_list = list(reversed(bar_note_list))
+    for notes in [bar_note_list, shuffled_note_list]:
+        assert calculate_bars_from_note_list(notes, bar_song) == [[
+            adorned_note for adorned_note in notes
+            if calcuate_note_is_in_measure(adorned_note, measure)
+        ] for measure in bar_song.measures]
+assert calculate_bars_from_note_list([], bar_song) == [
+    [] for measure in bar_song.measures
+]
@@ -0,0 +1,73 @@
+import glob
+
+import guitarpro
+
+from parser.API.get_functions import get_song_data
+import parser.API.calculate_functions as calculate
+from parser.API import complexity_arrays
+from evaluation import musiplectics
+
+gp5_files = [
+    "./gp5files/test_scores/calculate_playing_complexity_test.gp5",
+    "./gp5files/Listening-test-mono/tol.gp5",
+    "./gp5files/Listening-test-mono/sd.gp5",
+] + sorted(glob.glob("./gp5files/test_scores/*bend*.gp5"))
+
+for gp5_file in gp5_files:
+    song = get_song_data(guitarpro.parse(gp5_file))[0]
+    notes_in_measure = calculate.calculate_bars_from_note_list(
+        calculate.calculate_tied_note_durations(song), song)
+
+    for weight_set in musiplectics.weight_set_flags:
+        for use_product in [True, False]:
+            for raw_values in [True, False]:
+                # the batch complexities are the same as
+                # calculating each measure on its own:
+                batch_complexities = complexity_arrays.calculate_playing_complexity_for_measures(
+                    notes_in_measure,
+                    song,
+                    weight_set=weight_set,
+                    raw_values=raw_values,
+                    unadorned_value=True,
+                    use_product=use_product)
+
+                for measure_index in range(len(song.measures)):
+                    measure_complexities = calculate.calculate_playing_complexity(
+                        calculate.calculate_grace_note_possitions(
+                            notes_in_measure[measure_index]),
+                        song,
+                        by_bar=[measure_index],
+                        weight_set=weight_set,
+                        raw_values=raw_values,
+                        unadorned_value=True,
+                        use_product=use_product)
+                    assert batch_complexities.adorned.get(
+                        measure_index + 1) == measure_complexities.adorned.get(
+                            measure_index + 1), (gp5_file, weight_set,
+                                                 measure_index)
+                    assert batch_complexities.unadorned.get(
+                        measure_index +
+                        1) == measure_complexities.unadorned.get(
+                            measure_index + 1), (gp5_file, weight_set,
+                                                 measure_index)
+
+                # and for a list of measures:
+                batch_complexities = complexity_arrays.calculate_playing_complexity_for_measures(
+                    song.measures,
+                    weight_set=weight_set,
+                    raw_values=raw_values,
+                    use_product=use_product)
+                for measure, batch_complexity in zip(song.measures,
+                                                     batch_complexities):
+                    assert batch_complexity == calculate.calculate_playing_complexity(
+                        measure,
+                        by_bar=False,
+                        weight_set=weight_set,
+                        raw_values=raw_values,
+                        use_product=use_product), (gp5_file, weight_set)
+
+# only some of the measures:
+batch_complexities = complexity_arrays.calculate_playing_complexity_for_measures(
+    song, measure_numbers=[0, 2], weight_set="RD")
+assert sorted(batch_complexities.keys()) == [1, 3]
+assert complexity_arrays.calculate_playing_complexity_for_measures([]) == []
@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+
+import guitarpro
+
+from parser.API.get_functions import get_song_data
+from parser.API.datatypes import AdornedNote
+import parser.API.calculate_functions as calculate
+from parser.API import complexity_cache
+from parser.API.incremental_complexity import (calculate_note_weights,
+                                               cached_note_weights)
+from evaluation import musiplectics
+
+song = get_song_data(
+    guitarpro.parse("./gp5files/Listening-test-mono/tol.gp5"))[0]
+notes_in_measure = calculate.calculate_bars_from_note_list(
+    calculate.calculate_tied_note_durations(song), song)
+
+# the key is the same for the same contents:
+measure = song.measures[1]
+assert complexity_cache.structure_key(
+    measure, 'RD') == complexity_cache.structure_key(
+        measure._replace(notes=list(measure.notes)), 'RD')
+assert complexity_cache.structure_key(
+    measure, 'RD') != complexity_cache.structure_key(measure, 'GMS')
+assert complexity_cache.structure_key(
+    measure, 'RD') != complexity_cache.structure_key(
+        measure._replace(
+            meta_data=measure.meta_data._replace(
+                tempo=measure.meta_data.tempo + 1)), 'RD')
+
+cache = complexity_cache.ComplexityCache(maxsize=8)
+for repeat in range(2):
+    for measure in song.measures:
+        for raw_values in [True, False]:
+            assert complexity_cache.cached_playing_complexity(
+                measure,
+                by_bar=False,
+                weight_set='RD',
+                raw_values=raw_values,
+                unadorned_value=True,
+                cache=cache) == calculate.calculate_playing_complexity(
+                    measure,
+                    by_bar=False,
+                    weight_set='RD',
+                    raw_values=raw_values,
+                    unadorned_value=True)
+
+# only the last 8 measure complexities are kept:
+assert cache.info().currsize == 8
+assert cache.info().hits + cache.info().misses == 4 * len(song.measures)
+
+# measures with the same notes are only calculated once:
+cache.clear()
+for repeat in range(3):
+    complexity = complexity_cache.cached_playing_complexity(song.measures[2],
+                                                            by_bar=False,
+                                                            weight_set='GMS',
+                                                            cache=cache)
+    assert complexity.BGM == calculate.calculate_playing_complexity(
+        song.measures[2], by_bar=False, weight_set='GMS').BGM
+assert cache.info().hits == 2
+assert cache.info().misses == 1
+
+# note lists of a song by bar:
+for measure_index in range(len(song.measures)):
+    note_list = calculate.calculate_grace_note_possitions(
+        notes_in_measure[measure_index])
+    for repeat in range(2):
+        assert complexity_cache.cached_playing_complexity(
+            note_list,
+            song,
+            by_bar=[measure_index],
+            weight_set='RD',
+            unadorned_value=True,
+            cache=cache) == calculate.calculate_playing_complexity(
+                note_list,
+                song,
+                by_bar=[measure_index],
+                weight_set='RD',
+                unadorned_value=True)
+
+# the note weights:
+adorned_note = [
+    note for note in song.measures[1].notes if isinstance(note, AdornedNote)
+][0]
+for repeat in range(2):
+    assert cached_note_weights(
+        adorned_note, 120, 'GMS', cache=cache) == calculate_note_weights(
+            adorned_note, 120, musiplectics.load_weight_set('GMS'))
+
+# the disk cache is used between caches:
+cache_folder = tempfile.mkdtemp()
+cache = complexity_cache.ComplexityCache(
+    cache_file=os.path.join(cache_folder, "complexity_cache"))
+first_complexities = [
+    complexity_cache.cached_playing_complexity(measure,
+                                               by_bar=False,
+                                               weight_set='RD',
+                                               raw_values=True,
+                                               cache=cache)
+    for measure in song.measures
+]
+cache.close()
+
+cache = complexity_cache.ComplexityCache(
+    cache_file=os.path.join(cache_folder, "complexity_cache"))
+assert [
+    complexity_cache.cached_playing_complexity(measure,
+                                               by_bar=False,
+                                               weight_set='RD',
+                                               raw_values=True,
+                                               cache=cache)
+    for measure in song.measures
+] == first_complexities
+assert cache.info().misses == 0
+assert cache.info().disk_hits == len(song.measures)
+cache.close()
+shutil.rmtree(cache_folder)
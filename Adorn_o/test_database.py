@@ -1,10 +1,13 @@
 
 
 import os.path
+from fractions import Fraction
 import os
+import shutil
 
 # 3rd party imports
 import guitarpro
+import numpy as np
 
 import cbr
 import parser
@@ -47,6 +50,21 @@ sorted_data = test_database.sort(
     complexity_weight=1, difficulty_weight=1, save=True)
 assert len(sorted_file_ids) == len(set(sorted_file_ids))
 
+# sorting doesn't re-write the database, the order is cached:
+assert test_database.load_data_as_lists() == data
+# the parsed table is cached, changing the returned rows doesn't change it:
+test_database.load_data_as_lists()[1][0] = 'changed'
+assert test_database.load_data_as_lists() == data
+assert test_database.storage.row_count() == len(data) - 1
+assert os.path.isfile(test_database.save_folder +
+                      "/sort_orders/True_1.0_1.0.npy")
+sorted_scores = [
+    float(d[test_database.header.index("complexity")]) +
+    float(d[test_database.header.index("perceived.difficulty")])
+    for d in sorted_data
+]
+assert sorted_scores == sorted(sorted_scores, reverse=True)
+
 # reload the database:
 test_database.load()
 assert len(list(test_database.data.keys())) == 23
@@ -61,6 +79,19 @@ test_database.add_entries_from_gp5_file(
 # reload the database:
 test_database.load()
 assert len(list(test_database.data.keys())) == 23 + 4
+assert os.path.isfile(test_database.save_folder + "/duplicate_index.txt")
+
+# adding the same file again doesn't add any duplicates,
+# even with a fresh database object using the saved index:
+test_database = cbr.Database('test_database')
+test_database.add_entries_from_gp5_file(
+    "./gp5files/one_note.gp5",
+    move_tabs=False,
+    remove_duplicates=True,
+    save_feature_files=False,
+    artist_and_title_from_file_name=False)
+test_database.load()
+assert len(list(test_database.data.keys())) == 23 + 4
 
 # Read in the file:
 gp5_file = "./gp5files/one_note.gp5"
@@ -84,6 +115,34 @@ assert test_database.retrieve_entry_data(
         start_time=test_song.measures[0].start_time,
         notes=test_song_notes_in_bar[0])
 
+# a bar of 32 notes has features, so it can be retrieved with the
+# rest of the song:
+long_bar_song = parser.API.get_functions.get_song_data(
+    guitarpro.parse("./gp5files/test_scores/reuse_test.gp5"))[0]
+long_bar_measure = long_bar_song.measures[0]
+first_note = parser.API.calculate_functions.calculate_tied_note_durations(
+    long_bar_measure)[0]
+long_bar_notes = [
+    first_note._replace(note=first_note.note._replace(
+        note_number=i + 1,
+        pitch=first_note.note.pitch + i % 5,
+        start_time=long_bar_measure.start_time + Fraction(i, 32),
+        duration=Fraction(1, 32))) for i in range(32)
+]
+long_bar_measure = parser.API.datatypes.Measure(long_bar_measure.meta_data,
+                                                long_bar_measure.start_time,
+                                                long_bar_notes)
+measure_id, features = test_database.get_similarity_features_for_measure(
+    long_bar_measure, long_bar_notes)
+assert features is not False
+candidate_sets = test_database.find_most_similar_many(
+    [long_bar_measure, test_song.measures[0]],
+    [long_bar_notes, []],
+    similarity_threshold=0)
+assert len(candidate_sets) == 2 and len(candidate_sets[0]) > 0
+assert candidate_sets[1] == test_database.find_most_similar(
+    test_song.measures[0], similarity_threshold=0)
+
 print("virtuosity_threshold:")
 test_database.virtuosity_threshold(
     measure=test_song.measures[0],
@@ -127,6 +186,35 @@ sorted_most_sim = test_database.sort_candidate_set(
 assert test_database.data[sorted_most_sim[0].id][
     0] == './gp5files/test_scores/two_note_db_test.gp5'
 
+# the similarity index finds the same best match:
+indexed_test_database = cbr.Database(
+    'test_database', similarity_index={
+        "min_size": 0,
+        "neighbours": 10
+    })
+indexed_most_sim = indexed_test_database.find_most_similar(
+    test_song.measures[0])
+assert sorted_most_sim[0].id in indexed_most_sim
+assert os.path.isdir(test_database.save_folder + "/similarity_index")
+
+# a wide threshold, or a small subset, gives the whole exact candidate set:
+for subset_parameters in [{
+        "similarity_threshold": 0
+}, {
+        "similarity_threshold": 0,
+        "files": ['./gp5files/test_scores/two_note_db_test.gp5']
+}, {
+        "similarity_threshold": 90,
+        "files": ['./gp5files/test_scores/two_note_db_test.gp5']
+}]:
+    assert indexed_test_database.find_most_similar(
+        test_song.measures[0], **
+        subset_parameters) == test_database.find_most_similar(
+            test_song.measures[0], **subset_parameters)
+assert len(
+    indexed_test_database.find_most_similar(
+        test_song.measures[0], similarity_threshold=0)) > 10
+
 if os.path.isfile(test_database.save_folder + "/" + "sorted.txt"):
     os.remove(test_database.save_folder + "/" + "sorted.txt")
 
@@ -167,3 +255,135 @@ for fname in [
         "./test_database_json/json/wdytiw.json"
 ]:
     os.remove(fname)
+
+# Columnar storage of the database:
+columnar_test_database = cbr.Database(
+    'test_database_columnar', True, storage='columnar')
+columnar_test_database.load()
+assert len(list(columnar_test_database.data.keys())) == 0
+
+test_database.export_csv('test_database_export.csv')
+columnar_test_database.import_csv('test_database_export.csv')
+os.remove('test_database_export.csv')
+
+columnar_test_database.load()
+test_database.load()
+assert len(columnar_test_database.data) == len(test_database.data)
+for entry_id in test_database.data:
+    assert columnar_test_database.data[entry_id] == test_database.data[entry_id]
+assert columnar_test_database.load_data_as_lists(
+) == test_database.load_data_as_lists()
+
+# a reloaded database uses the saved columns:
+columnar_test_database = cbr.Database(
+    'test_database_columnar', storage='columnar')
+columnar_test_database.load()
+assert len(columnar_test_database.data) == len(test_database.data)
+
+# rows added to the columnar database are appended to the columns:
+appended_rows = test_database.load_data_as_lists()[1:4]
+columnar_test_database.storage.append_rows(appended_rows)
+assert columnar_test_database.load_data_as_lists(
+) == test_database.load_data_as_lists() + appended_rows
+columnar_test_database.load()
+assert len(columnar_test_database.data) == len(test_database.data) + 3
+for entry_id in test_database.data:
+    assert columnar_test_database.data[entry_id] == test_database.data[entry_id]
+
+# Parallel ingestion adds the same entries with the same ids:
+listening_test_files = [
+    "./gp5files/Listening-test-mono/c.gp5",
+    "./gp5files/Listening-test-mono/r.gp5",
+    "./gp5files/Listening-test-mono/h-official.gp5",
+    "./gp5files/Listening-test-mono/tol.gp5",
+]
+built_databases = []
+for folder, workers in [('test_database_serial', 1),
+                        ('test_database_parallel', 2)]:
+    if os.path.isdir(folder + '/json'):
+        shutil.rmtree(folder + '/json')
+    database = cbr.Database(folder, True)
+    database.add_entries_from_list_of_gp5_files(
+        listening_test_files,
+        move_tabs=False,
+        artist_and_title_from_file_name=False,
+        workers=workers)
+    assert database.last_processed_file == listening_test_files[-1]
+    built_databases.append(database.load_data_as_lists())
+
+assert len(built_databases[0]) > 1
+assert built_databases[0] == built_databases[1]
+
+# Tabs moved into the database by a parallel build are only
+# moved once their worker has loaded them:
+if os.path.isdir('test_database_moved'):
+    shutil.rmtree('test_database_moved')
+os.makedirs('test_database_moved_tabs', exist_ok=True)
+moved_test_files = []
+for gp5_file in listening_test_files:
+    moved_test_files.append('test_database_moved_tabs/' +
+                            os.path.basename(gp5_file))
+    shutil.copy(gp5_file, moved_test_files[-1])
+
+moved_database = cbr.Database('test_database_moved', True)
+moved_database.add_entries_from_list_of_gp5_files(
+    moved_test_files,
+    move_tabs=True,
+    artist_and_title_from_file_name=False,
+    workers=2)
+for gp5_file in moved_test_files:
+    assert moved_database.build_manifest.record(
+        gp5_file)['status'] == 'complete'
+    assert not os.path.isfile(gp5_file)
+    assert os.path.isfile('test_database_moved/gpfiles/' +
+                          os.path.basename(gp5_file))
+assert not os.path.isdir('test_database_moved/failed') or os.listdir(
+    'test_database_moved/failed') == []
+assert len(moved_database.load_data_as_lists()) == len(built_databases[0])
+shutil.rmtree('test_database_moved_tabs')
+
+# Re-running a build skips the files that have been added,
+# files that can't be added are quarantined with their error:
+with open('not_a_tab.gp5', 'w') as not_a_tab:
+    not_a_tab.write('not a tab')
+
+parallel_database = cbr.Database('test_database_parallel')
+parallel_database.add_entries_from_list_of_gp5_files(
+    listening_test_files + ['not_a_tab.gp5'],
+    move_tabs=False,
+    artist_and_title_from_file_name=False,
+    workers=2)
+assert parallel_database.load_data_as_lists() == built_databases[1]
+
+manifest = parallel_database.build_manifest
+assert manifest.is_done(listening_test_files[0])
+assert manifest.record(listening_test_files[0])['status'] == 'complete'
+assert manifest.record(listening_test_files[-1])['rows'][1] == len(
+    built_databases[1]) - 1
+assert manifest.record('not_a_tab.gp5')['status'] == 'failed'
+assert os.path.isfile('test_database_parallel/failed/not_a_tab.gp5')
+assert manifest.is_done('not_a_tab.gp5')
+assert not manifest.is_done('not_a_tab.gp5', retry_failed=True)
+os.remove('not_a_tab.gp5')
+
+# The chunk features of the measures are saved when they are added,
+# the same for serial and parallel builds:
+chunk_feature_files = []
+for folder in ['test_database_serial', 'test_database_parallel']:
+    with open(folder + '/chunk_features.jsonl') as chunk_feature_file:
+        chunk_feature_files.append(chunk_feature_file.readlines())
+assert len(chunk_feature_files[0]) > 0
+assert chunk_feature_files[0] == chunk_feature_files[1]
+
+# and the features of a retrieved measure are the saved ones:
+parallel_database.load()
+retrieved_measure = parallel_database.retrieve_data_from_multiple_entries(
+    [built_databases[1][1][0]])[0]
+saved_chunk_features = parallel_database.chunk_features.get(retrieved_measure)
+assert saved_chunk_features is not None
+for chunk_size, features in cbr.chunk_features.calculate_measure_chunk_features(
+        retrieved_measure).items():
+    assert saved_chunk_features[chunk_size].chunk_indexes == features.chunk_indexes
+    assert np.array_equal(saved_chunk_features[chunk_size].values,
+                          features.values,
+                          equal_nan=True)
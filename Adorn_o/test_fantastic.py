@@ -0,0 +1,64 @@
+import csv
+
+import numpy as np
+
+from feature_analysis import fantastic
+
+# The features computed with FANTASTIC in R for the validation study:
+feature_folder = "../validation-study/feature_files/"
+with open(feature_folder + "feature_computation.txt", "r") as feature_file:
+    r_features = list(csv.reader(feature_file, delimiter="\t"))
+
+assert r_features[0] == ["file.id"] + fantastic.feature_names
+
+for r_row in r_features[1:]:
+    note_table = fantastic.read_mcsv(feature_folder + r_row[0] + ".csv")
+    features = fantastic.compute_features(note_table)
+    assert features is not None, r_row[0]
+    assert list(features.keys()) == fantastic.feature_names
+
+    for name, r_value, value in zip(fantastic.feature_names, r_row[1:],
+                                    features.values()):
+        if name in fantastic.factor_feature_names:
+            assert value == r_value, (r_row[0], name, r_value, value)
+        else:
+            assert np.isclose(value, float(r_value), rtol=1e-9,
+                              atol=1e-12), (r_row[0], name, r_value, value)
+
+# the same rows from the files:
+rows = fantastic.compute_features_for_files(
+    [feature_folder + r_row[0] + ".csv" for r_row in r_features[1:3]])
+assert [row[0] for row in rows] == [r_row[0] for r_row in r_features[1:3]]
+
+# melodies without a phrase of 3 to 23 notes can't be analysed:
+note_table = fantastic.read_mcsv(feature_folder + r_features[1][0] + ".csv")
+assert fantastic.compute_features(note_table[:2]) is None
+assert fantastic.compute_features(note_table[::-1]) is None
+
+# measures with more than 23 notes are split into phrases,
+# so they can be analysed, e.g. a bar of 32 notes:
+import guitarpro
+from fractions import Fraction
+from parser.API.get_functions import get_song_data
+from parser.API import calculate_functions as calculate
+
+test_song = get_song_data(
+    guitarpro.parse("./gp5files/test_scores/reuse_test.gp5"))[0]
+test_measure = test_song.measures[0]
+first_note = calculate.calculate_tied_note_durations(test_measure)[0]
+for note_count in [23, 24, 32]:
+    long_bar_notes = [
+        first_note._replace(note=first_note.note._replace(
+            note_number=i + 1,
+            pitch=first_note.note.pitch + i % 5,
+            start_time=test_measure.start_time + Fraction(i, 32),
+            duration=Fraction(1, 32))) for i in range(note_count)
+    ]
+    note_table = calculate.calculate_note_table_for_measure_note_list(
+        long_bar_notes, test_measure)
+    boundaries = [row[13] for row in note_table]
+    if note_count <= 23:
+        assert boundaries == [0] * note_count
+    else:
+        assert sum(boundaries) == 2 and boundaries[-1] == 1
+    assert fantastic.compute_features(note_table) is not None
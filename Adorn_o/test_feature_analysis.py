@@ -1,5 +1,7 @@
 import os
 
+import numpy as np
+
 import rpy2.robjects as robjects
 
 import guitarpro
@@ -127,6 +129,145 @@ unadorned_chunk_SynPy_features = feature_analysis.synpy_interface.compute_featur
 print(unadorned_chunk_FANTASTIC_features)
 print(unadorned_chunk_SynPy_features)
 
+# NumPy candidate sets match the R get.candidate.set:
+feature_analysis.fantastic_interface.load()
+get_candidate_set = robjects.r(
+    """
+        get.candidate.set <- function(measure.database.df, eucl.stand=TRUE, percent.match=1){
+
+            if(eucl.stand==TRUE){measure.database.df <- ztransform(measure.database.df)}
+
+            features<-colnames(measure.database.df[,c(-1)])
+            rows <- measure.database.df$file.id[c(-1)]
+
+            database.df <- measure.database.df[c(-1),features]
+            rownames(database.df) <- rows
+            colnames(database.df) <- features
+
+            measure.df <- measure.database.df[1,features]
+            rownames(measure.df) <-  measure.database.df[1,1]
+
+            sim <- apply(database.df, 1, function(x)exp(-dist(rbind(x, measure.df))/length(features)))
+
+            sim.df <- data.frame(sim)
+            sim.df$file.id <- rownames(sim.df)
+
+            similarity.range <- max(sim.df$sim) - min(sim.df$sim)
+            as.character(sim.df$file.id[which(sim.df$sim >= max(sim.df$sim)-percent.match*similarity.range/100)])
+            }
+    """
+)
+test_ids = ["query"] + ["entry_%d" % i for i in range(20)]
+test_features = [[(i * 7 + j * 3) % 11 + 0.5 * j for j in range(4)]
+                 for i in range(21)]
+test_df = robjects.DataFrame({
+    "file.id":
+    robjects.StrVector(test_ids),
+    "f1":
+    robjects.FloatVector([f[0] for f in test_features]),
+    "f2":
+    robjects.FloatVector([f[1] for f in test_features]),
+    "f3":
+    robjects.FloatVector([f[2] for f in test_features]),
+    "f4":
+    robjects.FloatVector([f[3] for f in test_features]),
+})
+for percent_match in [0, 10, 50, 100]:
+    r_candidates = list(get_candidate_set(test_df, True, percent_match))
+    numpy_candidates = feature_analysis.vector_similarity.get_candidate_set(
+        test_ids[1:],
+        test_features[0],
+        test_features[1:],
+        eucl_stand=True,
+        percent_match=percent_match)
+    assert r_candidates == numpy_candidates
+
+# and with text columns, which aren't standardised and are NA to dist:
+test_modes = ["major", "minor"]
+test_contours = ["asc", "desc", "asc-desc"]
+text_test_df = robjects.DataFrame({
+    "file.id":
+    robjects.StrVector(test_ids),
+    "f1":
+    robjects.FloatVector([f[0] for f in test_features]),
+    "f2":
+    robjects.FloatVector([f[1] for f in test_features]),
+    "f3":
+    robjects.FloatVector([f[2] for f in test_features]),
+    "f4":
+    robjects.FloatVector([f[3] for f in test_features]),
+    "mode":
+    robjects.StrVector([test_modes[i % 2] for i in range(21)]),
+    "h.contour":
+    robjects.StrVector([test_contours[i % 3] for i in range(21)]),
+})
+names, query_vector, query_text = feature_analysis.features_from_dataframe(
+    feature_analysis.feature_dataframe(
+        ["file.id", "f1", "f2", "f3", "f4", "mode", "h.contour"],
+        [[test_ids[0]] + test_features[0] + [test_modes[0], test_contours[0]]]))
+assert names == ["file.id", "f1", "f2", "f3", "f4", "mode", "h.contour"]
+assert list(query_text) == [True, False, False, False, False, True, True]
+assert list(query_vector[1:5]) == test_features[0]
+text_test_features = [f + [np.nan, np.nan] for f in test_features]
+for percent_match in [0, 10, 50, 100]:
+    r_candidates = list(get_candidate_set(text_test_df, True, percent_match))
+    numpy_candidates = feature_analysis.vector_similarity.get_candidate_set(
+        test_ids[1:],
+        query_vector[1:],
+        text_test_features[1:],
+        eucl_stand=True,
+        percent_match=percent_match,
+        numeric_columns=~query_text[1:])
+    assert r_candidates == numpy_candidates
+
+# The similarity matrix of several queries has the same
+# similarities as comparing each query on its own:
+test_queries = np.array(test_features[:3])
+test_queries[1, 2] = np.nan
+similarity_matrix = feature_analysis.vector_similarity.similarity_matrix(
+    test_queries, test_features[3:])
+for query, query_similarities, matches in zip(
+        test_queries, similarity_matrix,
+        feature_analysis.vector_similarity.most_similar_rows(
+            similarity_matrix, percent_match=10)):
+    assert np.array_equal(
+        query_similarities,
+        feature_analysis.vector_similarity.similarities(
+            query, test_features[3:]))
+    assert [test_ids[3 + i] for i in matches
+            ] == feature_analysis.vector_similarity.get_candidate_set(
+                test_ids[3:], query, test_features[3:], percent_match=10)
+
+# In memory rhy lines and note tables match the files:
+rhy_lines = calculate.calculate_rhy_lines_for_measure(unadorned_measure)
+with open(chunk_rhy, "r") as rhy_file:
+    assert rhy_file.readlines() == rhy_lines
+assert feature_analysis.synpy_interface.compute_features_for_rhy_lines(
+    rhy_lines, "unadorned_chunk"
+) == feature_analysis.synpy_interface.compute_features(chunk_rhy)
+
+note_table = calculate.calculate_note_table_for_measure_note_list(
+    measure_note_lists[1], test_song.measures[1]
+)
+midi_file = calculate.calculate_midi_file_for_measure_note_list(
+    measure_note_lists[1], test_song.measures[1], "measure"
+)
+mcsv_file = utilities.run_melconv(midi_file, "measure.csv")
+with open("measure.csv", "r") as mcsv:
+    mcsv_rows = [row.strip().split(";") for row in mcsv.readlines()[2:]]
+assert len(mcsv_rows) == len(note_table)
+for mcsv_row, note_table_row in zip(mcsv_rows, note_table):
+    assert [float(value.replace(",", ".")) for value in mcsv_row[:9]
+            ] == [float(value) for value in note_table_row[:9]]
+
+feature_analysis.fantastic_interface.load()
+note_table_features = feature_analysis.merge_synpy_and_fantastic_features_for_measures(
+    [note_table], [rhy_lines], ["measure"])
+assert note_table_features is not False
+assert len(note_table_features) == 1
+if os.path.isfile("measure.csv"):
+    os.remove("measure.csv")
+
 
 # Clear files:
 if os.path.isfile(chunk_rhy):
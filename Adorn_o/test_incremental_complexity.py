@@ -0,0 +1,68 @@
+import glob
+
+import guitarpro
+
+from parser.API.get_functions import get_song_data
+from parser.API.datatypes import AdornedNote, GraceNote, Dynamic
+import parser.API.calculate_functions as calculate
+from parser.API.incremental_complexity import IncrementalComplexity
+from evaluation import musiplectics
+
+gp5_files = [
+    "./gp5files/test_scores/calculate_playing_complexity_test.gp5",
+    "./gp5files/Listening-test-mono/tol.gp5",
+] + sorted(glob.glob("./gp5files/test_scores/*bend*.gp5"))
+
+grace_note = GraceNote(3, 0.0625, Dynamic('p', None), False, False, 'hammer')
+
+for gp5_file in gp5_files:
+    song = get_song_data(guitarpro.parse(gp5_file))[0]
+    adornments = [
+        note.adornment for measure in song.measures for note in measure.notes
+        if isinstance(note, AdornedNote)
+    ]
+
+    for weight_set in musiplectics.weight_set_flags:
+        for use_product in [True, False]:
+            for measure in song.measures:
+                measure_complexity = IncrementalComplexity(
+                    measure, weight_set=weight_set, use_product=use_product)
+
+                # change the adornment of each note in turn, and add
+                # a grace note, the complexity is the same as
+                # calculating the complexity of the whole measure:
+                for note_index, note in enumerate(measure.notes):
+                    if not isinstance(note, AdornedNote):
+                        continue
+                    for adornment in [
+                            adornments[note_index % len(adornments)],
+                            note.adornment._replace(grace_note=grace_note)
+                    ]:
+                        calculated_notes = measure_complexity.calculated_notes
+                        measure_complexity.replace_note(
+                            note_index, note._replace(adornment=adornment))
+
+                        # only the changed note and the notes
+                        # around it are calculated again:
+                        assert measure_complexity.calculated_notes - calculated_notes <= 3
+
+                        for raw_values in [True, False]:
+                            assert measure_complexity.complexity(
+                                raw_values=raw_values, unadorned_value=True
+                            ) == calculate.calculate_playing_complexity(
+                                measure_complexity.measure,
+                                by_bar=False,
+                                weight_set=weight_set,
+                                raw_values=raw_values,
+                                unadorned_value=True,
+                                use_product=use_product), (gp5_file,
+                                                           weight_set)
+
+                # and back to the original measure:
+                measure_complexity.update(measure)
+                assert measure_complexity.complexity(
+                ) == calculate.calculate_playing_complexity(
+                    measure,
+                    by_bar=False,
+                    weight_set=weight_set,
+                    use_product=use_product)
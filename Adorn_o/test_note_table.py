@@ -0,0 +1,69 @@
+import glob
+from fractions import Fraction
+
+import guitarpro
+
+from parser.API.get_functions import get_song_data
+from parser.API.datatypes import AdornedNote, Rest
+from parser.API import note_table
+
+gp5_files = [
+    "./gp5files/test_scores/calculate_playing_complexity_test.gp5",
+    "./gp5files/Listening-test-mono/tol.gp5",
+    "./gp5files/Listening-test-mono/sd.gp5",
+] + sorted(glob.glob("./gp5files/test_scores/*bend*.gp5"))
+
+for gp5_file in gp5_files:
+    song = get_song_data(guitarpro.parse(gp5_file))[0]
+    table = note_table.calculate_note_table(song)
+
+    # the song made from the table is the same:
+    table_song = note_table.song_from_note_table(table)
+    assert table_song == song, gp5_file
+    for measure, table_measure in zip(song.measures, table_song.measures):
+        assert measure.start_time == table_measure.start_time
+        for event, table_event in zip(measure.notes, table_measure.notes):
+            assert repr(event) == repr(table_event), gp5_file
+
+    # and the columns have the values of each event:
+    events = [event for measure in song.measures for event in measure.notes]
+    assert len(table.columns["is_rest"]) == len(events)
+    assert list(table.columns["is_rest"]) == [
+        isinstance(event, Rest) for event in events
+    ]
+    assert list(note_table.rational_values(table, "duration")) == [
+        float(event.note.duration)
+        if isinstance(event, AdornedNote) else float(event.duration)
+        for event in events
+    ]
+    assert note_table.category_values(table, "plucking_technique") == [
+        event.adornment.plucking.technique
+        if isinstance(event, AdornedNote) else None for event in events
+    ]
+    for row, event in enumerate(events):
+        assert note_table.event_from_note_table(table, row) == event
+        if isinstance(event, AdornedNote):
+            assert table.columns["pitch"][row] == event.note.pitch
+            assert table.columns["start_time_numerator"][row] == Fraction(
+                event.note.start_time).numerator
+
+# the codes of the values can be used to select rows:
+bend_song = get_song_data(
+    guitarpro.parse("./gp5files/test_scores/bend_parsing.gp5"))[0]
+table = note_table.calculate_note_table(bend_song)
+bends = [
+    event.adornment.fretting.modulation.bend for measure in bend_song.measures
+    for event in measure.notes if isinstance(event, AdornedNote)
+    and event.adornment.fretting.modulation.bend is not None
+]
+assert (table.columns["bend_type"] >= 0).sum() == len(bends)
+assert len(table.columns["bend_point_position"]) == sum(
+    [len(bend.points) for bend in bends])
+assert (table.columns["plucking_technique"] == note_table.category_code(
+    table, "plucking_technique", "finger")).sum() == len([
+        event for measure in bend_song.measures for event in measure.notes
+        if isinstance(event, AdornedNote)
+        and event.adornment.plucking.technique == "finger"
+    ])
+assert note_table.category_code(table, "plucking_technique",
+                                "not_a_technique") == -1
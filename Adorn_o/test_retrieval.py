@@ -66,6 +66,24 @@ assert consolidated_test == [
     cbr.candidate(complexity=3, difficulty=3, id=['id5'])
 ]
 
+# candidates with the same heuristic are in reverse order:
+assert cbr.sort_candidates(["id1", "id2", "id3", "id4"], [1, 3, 2, 3],
+                           [1, 3, 5, 3], 1, 1) == [
+                               cbr.candidate(2, 5, "id3"),
+                               cbr.candidate(3, 3, "id4"),
+                               cbr.candidate(3, 3, "id2"),
+                               cbr.candidate(1, 1, "id1")
+                           ]
+
+# scores that round to the same value are ordered by
+# calculate_heuristic, as the insertion sort did:
+assert cbr.sort_candidates(["id1", "id2"], [0.1, 0.1], [0.1 + 0.2, 0.3], 1,
+                           1) == [
+                               cbr.candidate(0.1, 0.1 + 0.2, "id1"),
+                               cbr.candidate(0.1, 0.3, "id2")
+                           ]
+assert cbr.consolidate_sorted_candidates([], [], []) == []
+
 sorted_test_set_2 = [
     cbr.candidate(5, 5, "id1"),
     cbr.candidate(4, 4, "id2"),
@@ -194,6 +212,59 @@ for complexity_weight, difficulty_weight in [[1, 1], [0, 0], [-1, -1], [1, -1],
     if complexity_weight != 0 and difficulty_weight != 0:
         assert retrieved_measures[0].id == sorted_candidate_test_set[0].id
 
+# Retrieving all the measures of a song together gives the same
+# candidates as retrieving each measure on its own:
+test_notes = parser.API.calculate_functions.calculate_bars_from_note_list(
+    parser.API.calculate_functions.calculate_tied_note_durations(test_song),
+    test_song)
+test_measures = test_song.measures[:8]
+test_measure_notes = test_notes[:8]
+for similarity_threshold in [100, 50, 0]:
+    candidate_sets = database.find_most_similar_many(
+        test_measures,
+        test_measure_notes,
+        complexity_weight=1,
+        difficulty_weight=1,
+        similarity_threshold=similarity_threshold)
+    assert len(candidate_sets) == len(test_measures)
+    for measure, notes, candidate_set in zip(test_measures,
+                                             test_measure_notes,
+                                             candidate_sets):
+        assert candidate_set == database.find_most_similar(
+            measure,
+            notes_in_measure=notes,
+            complexity_weight=1,
+            difficulty_weight=1,
+            similarity_threshold=similarity_threshold)
+
+    retrieved = database.retrieve_many(
+        test_measures,
+        test_measure_notes,
+        1,
+        1,
+        similarity_threshold=similarity_threshold,
+        method=2)
+    for measure, notes, retrieved_measures in zip(test_measures,
+                                                  test_measure_notes,
+                                                  retrieved):
+        assert retrieved_measures == cbr.retrieval(
+            measure,
+            notes,
+            database,
+            1,
+            1,
+            similarity_threshold=similarity_threshold,
+            method=2)
+
+# the database is only loaded once for the whole batch:
+database_loads = []
+database_load = database.load
+database.load = lambda: database_loads.append(1) or database_load()
+database.retrieve_many(test_measures, test_measure_notes, 1, 1, method=2)
+database.virtuosity_thresholds(1, 1, test_measures, test_measure_notes)
+assert len(database_loads) == 2
+del database.load
+
 database.load()
 list(database.data.keys())
 #database.retrieve_entry_data()
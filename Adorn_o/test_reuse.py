@@ -1,6 +1,8 @@
 
 
+import os
 from fractions import Fraction
+from functools import partial
 
 import guitarpro
 
@@ -1022,6 +1024,46 @@ for note, ans in zip(
     #print(ans[1])
     assert [us.note.note_number for us in note.adorned_notes] == ans[1], "adorned notes consolidated wrong"
 
+# Matching chunks with the chunk features (without R),
+# a measure will match the chunks to itself:
+unadorned_chunks, matched = cbr.reuse_module.match_up_unadorned_measure_chunks_with_adorned_chunk_features(
+    unadorned_measure,
+    unadorned_measure_notes,
+    unadorned_measure,
+    chunk_size=3)
+
+assert len(unadorned_chunks) == 3
+for ua_chunk, matched_chunks in zip(unadorned_chunks, matched):
+    assert [matched_chunk == ua_chunk for matched_chunk in matched_chunks] == [True]
+
+# looking up the saved features gives the same matches
+# as calculating them:
+adorned_chunk_features = cbr.chunk_features.calculate_measure_chunk_features(
+    adorned_measure)
+assert cbr.reuse_module.match_up_unadorned_measure_chunks_with_adorned_chunk_features(
+    unadorned_measure,
+    unadorned_measure_notes,
+    adorned_measure,
+    adorned_chunk_features=adorned_chunk_features,
+    chunk_size=3
+) == cbr.reuse_module.match_up_unadorned_measure_chunks_with_adorned_chunk_features(
+    unadorned_measure, unadorned_measure_notes, adorned_measure, chunk_size=3)
+
+chunk_feature_store = cbr.chunk_features.ChunkFeatureStore('.')
+chunk_feature_store.clear()
+chunk_feature_store.add({
+    cbr.chunk_features.measure_key(adorned_measure):
+    adorned_chunk_features
+})
+saved_chunk_features = cbr.chunk_features.ChunkFeatureStore('.').get(
+    adorned_measure)
+assert sorted(saved_chunk_features.keys()) == [2, 3]
+for chunk_size in [2, 3]:
+    assert saved_chunk_features[
+        chunk_size].chunk_indexes == adorned_chunk_features[
+            chunk_size].chunk_indexes
+chunk_feature_store.clear()
+
 # Testing the full reuse function:
 test_full_functions = False
 # test_full_functions = True
@@ -1154,6 +1196,58 @@ print(best_note)
 assert best_note.adornment.plucking.modification.palm_mute
 assert best_note.adornment.fretting.modification.type == 'natural-harmonic'
 
+# the adornments can be generated lazily, each adornment is only
+# generated once even when the lists have it more than once:
+harm_mute_arguments = [
+    out.plucking_accents * 2, out.fretting_accents,
+    out.plucking_techniques * 3, out.plucking_modifications_ah,
+    out.plucking_modifications_palm_mute, out.fretting_techniques,
+    out.fretting_modifications_type, out.fretting_modifications_let_ring,
+    out.fretting_modulations_bend, out.fretting_modulations_trill,
+    out.fretting_modulations_vib, out.fretting_modulations_slide,
+    out.grace_notes * 2, out.ghost_notes, 1, 1, True
+]
+assert list(
+    cbr.reuse_module.generate_possible_adornments(
+        *harm_mute_arguments)) == harm_mute
+assert cbr.reuse_module.make_all_possible_adornments(
+    *harm_mute_arguments) == harm_mute
+assert cbr.reuse_module.remove_duplicate_adornments(
+    [None, 'dead-note', None, False, 0, 'dead-note']) == [
+        None, 'dead-note', False, 0
+    ]
+
+# and the best note is the same when the adornments are generated,
+# when the dynamics of some of the adornments can't be selected and
+# when the adornments that can't be selected aren't generated:
+dynamics = [
+    Dynamic('ppp', None),
+    Dynamic('fff', None),
+    Dynamic('mf', 'cresc'),
+    Dynamic('p', 'dim')
+]
+for complexity_weight, difficulty_weight in [(1, 1), (-1, -1), (1, -1),
+                                             (-1, 1), (0, 0)]:
+    best_notes = [
+        cbr.reuse_module.select_best_adornment_for_unadorned_note(
+            unadorned_note,
+            possible_adornments,
+            dynamics,
+            unadorned_measure,
+            complexity_weight,
+            difficulty_weight,
+            weight_set='RD') for possible_adornments in [
+                harm_mute,
+                cbr.reuse_module.generate_possible_adornments(
+                    *harm_mute_arguments),
+                partial(cbr.reuse_module.generate_possible_adornments,
+                        *harm_mute_arguments)
+            ]
+    ]
+    assert best_notes[0] == best_notes[1] == best_notes[2]
+    assert best_notes[0].adornment in harm_mute
+    assert best_notes[0].note.dynamic in dynamics
+
 tol_gp5_file = "./gp5files/Listening-test-mono/tol.gp5"
 tol_gp5song = guitarpro.parse(tol_gp5_file)
 api_song = parser.API.get_functions.get_song_data(tol_gp5song)
@@ -1213,6 +1307,36 @@ for measure in new_measures:
     for note, note_number in zip(measure.notes, [1, 2, 3, 4]):
         assert note.note.note_number == note_number
         print('\n', note)
+
+# The measures made by a pool of worker processes are the
+# same and in the same order as the ones made in one process,
+# and the workers don't write any (midi, rhy or csv) files:
+files_before_reuse = set(os.listdir('.'))
+assert cbr.reuse_module.reuse_measures(
+    unadorned_measure=unadorned_measure,
+    unadorned_measure_notes=parser.API.calculate_functions.
+    calculate_tied_note_durations(unadorned_measure),
+    adorned_measures=adorned_measures,
+    complexity_weight=1,
+    difficulty_weight=1,
+    weight_set='RD',
+    workers=2) == new_measures
+assert set(os.listdir('.')) == files_before_reuse
+
+# so the same measure is selected:
+for complexity_weight, difficulty_weight in [(1, 1), (1, -1), (0, 0)]:
+    selected_measures = [
+        cbr.reuse(
+            unadorned_measure,
+            parser.API.calculate_functions.calculate_tied_note_durations(
+                unadorned_measure),
+            adorned_measures,
+            complexity_weight,
+            difficulty_weight,
+            weight_set='RD',
+            workers=workers) for workers in [1, 2]
+    ]
+    assert selected_measures[0] == selected_measures[1]
 """
 new_measure = cbr.reuse(
     unadorned_measure,
@@ -0,0 +1,41 @@
+from fractions import Fraction
+
+import guitarpro
+
+from parser.API.get_functions import get_song_data
+from parser.API.datatypes import AdornedNote
+from parser.API.calculate_functions import (
+    calculate_ticks_per_beat, default_ticks_per_beat, calculate_ticks,
+    calculate_time_from_ticks, calculate_measure_endtime,
+    calculate_duration_for_notes_in_measure)
+
+# The tick timebase has a whole number of ticks for every time:
+assert calculate_ticks_per_beat([]) == default_ticks_per_beat
+assert calculate_ticks_per_beat([Fraction(1, 12),
+                                 Fraction(3, 64)]) == default_ticks_per_beat
+ticks_per_beat = calculate_ticks_per_beat(
+    [Fraction(1, 28), Fraction(5, 9), 2])
+assert ticks_per_beat == 3840 * 7 * 3
+for time in [Fraction(1, 28), Fraction(5, 9), 2, Fraction(-1, 4)]:
+    ticks = calculate_ticks(time, ticks_per_beat)
+    assert isinstance(ticks, int)
+    assert calculate_time_from_ticks(ticks, ticks_per_beat) == time
+
+# and the note durations calculated with ticks are the
+# time to the next event in the measure:
+for gp5_file in [
+        "./gp5files/test_scores/calculate_playing_complexity_test.gp5",
+        "./gp5files/Listening-test-mono/sd.gp5",
+]:
+    for measure in get_song_data(guitarpro.parse(gp5_file))[0].measures:
+        event_times = sorted(
+            set([
+                event.note.start_time
+                if isinstance(event, AdornedNote) else event.start_time
+                for event in measure.notes
+            ])) + [calculate_measure_endtime(measure)]
+        for event in calculate_duration_for_notes_in_measure(measure).notes:
+            if isinstance(event, AdornedNote):
+                event = event.note
+            assert event.duration == event_times[event_times.index(
+                event.start_time) + 1] - event.start_time
@@ -0,0 +1,47 @@
+from fractions import Fraction
+
+import guitarpro
+import parser
+
+calculate_functions = parser.API.calculate_functions
+
+gp5_file = "./gp5files/test_scores/tied_hammer-ons.gp5"
+gp5song = guitarpro.parse(gp5_file)
+api_song = parser.API.get_functions.get_song_data(gp5song)
+test_song = api_song[0]
+
+# the tied notes are cached for the song, the cached list
+# is the same as calculating it and can't be changed by callers:
+for song_data in [test_song] + test_song.measures:
+    tied_notes = calculate_functions.calculate_tied_note_durations(song_data)
+    assert tied_notes == calculate_functions.calculate_tied_note_list(
+        song_data)
+    tied_notes.pop()
+    assert calculate_functions.calculate_tied_note_durations(
+        song_data) == calculate_functions.calculate_tied_note_list(song_data)
+
+# the notes are tied together:
+tied_notes = calculate_functions.calculate_tied_note_durations(test_song)
+assert len(tied_notes) < len([
+    event for measure in test_song.measures for event in measure.notes
+    if isinstance(event, parser.API.datatypes.AdornedNote)
+])
+
+# changing a note in a measure of the song updates its tied notes:
+measure = test_song.measures[-1]
+tied_note_index = max([
+    index for index, event in enumerate(measure.notes)
+    if isinstance(event, parser.API.datatypes.AdornedNote)
+])
+tied_note = measure.notes[tied_note_index]
+measure.notes[tied_note_index] = tied_note._replace(
+    note=tied_note.note._replace(
+        duration=tied_note.note.duration + Fraction(1, 64)))
+changed_tied_notes = calculate_functions.calculate_tied_note_durations(
+    test_song)
+assert changed_tied_notes == calculate_functions.calculate_tied_note_list(
+    test_song)
+assert changed_tied_notes != tied_notes
+measure.notes[tied_note_index] = tied_note
+assert calculate_functions.calculate_tied_note_durations(
+    test_song) == tied_notes
@@ -0,0 +1,73 @@
+from fractions import Fraction
+
+import guitarpro
+
+from parser.API.get_functions import get_song_data
+from parser.API.calculate_functions import (calculate_playing_complexity,
+                                            calculate_realtime_duration,
+                                            calculate_closest_value)
+from evaluation import musiplectics
+
+song = get_song_data(
+    guitarpro.parse(
+        "./gp5files/test_scores/calculate_playing_complexity_test.gp5"))[0]
+
+# Weight sets are loaded once and match the weight functions:
+for weight_set, flags in musiplectics.weight_set_flags.items():
+    weights = musiplectics.load_weight_set(weight_set)
+    assert musiplectics.load_weight_set(weight_set) is weights
+    assert musiplectics.load_weight_set(weights) is weights
+
+    use_geometric_mean, use_total_playing_time, log_scale_values = flags
+    flags = dict(
+        use_geometric_mean=use_geometric_mean,
+        use_total_playing_time=use_total_playing_time,
+        log_scale_values=log_scale_values)
+    assert weights.technique == musiplectics.technique_weights(**flags)
+    assert weights.time_sig == musiplectics.time_sig_weights(**flags)
+    assert weights.tempo == musiplectics.tempo_weights(**flags)[0]
+    assert weights.dynamic == musiplectics.dynamic_weights(**flags)
+    assert weights.interval == musiplectics.interval_weights(**flags)
+    rt_duration = calculate_realtime_duration(Fraction(1, 4), 85)
+    assert weights.duration(
+        rt_duration) == musiplectics.duration_complexity_polynomial(
+            rt_duration, **flags)
+
+# and give the same complexity as the weight set name:
+assert calculate_playing_complexity(
+    song,
+    song=song,
+    by_bar=False,
+    calculation_type='both',
+    weight_set=musiplectics.load_weight_set('RD'),
+    raw_values=False,
+    use_product=True) == calculate_playing_complexity(
+        song,
+        song=song,
+        by_bar=False,
+        calculation_type='both',
+        weight_set='RD',
+        raw_values=False,
+        use_product=True)
+
+# The closest tempo weights and the duration complexities
+# of arrays are the same as for single values:
+rt_durations = [
+    calculate_realtime_duration(duration, bpm)
+    for duration in [Fraction(1, 32), Fraction(1, 12), Fraction(1, 4), 1.5]
+    for bpm in [40, 85, 120.5, 200]
+]
+for weight_set in musiplectics.weight_set_flags:
+    weights = musiplectics.load_weight_set(weight_set)
+
+    bpms = [0, 30, 36, 37.5, 41, 60, 85, 120.5, 160, 299, 400]
+    bpms += [(a + b) / 2 for a, b in zip(weights.tempo_list,
+                                          weights.tempo_list[1:])]
+    for bpm, tempo_weight in zip(bpms, weights.tempo_weights(bpms)):
+        assert weights.tempo_weight(bpm) == tempo_weight
+        assert weights.tempo_weight(bpm) == weights.tempo.get(
+            int(calculate_closest_value(weights.tempo_list, bpm)))
+
+    assert list(weights.durations(rt_durations)) == [
+        weights.duration(rt_duration) for rt_duration in rt_durations
+    ]